@@ -15,6 +15,7 @@ BASE_DIR = "~/pymnt"
 CONFIG_DIR = "cfg"
 SIMULATIONS_DIR = "simulations"
 REPORTS_DIR = "reports"
+CACHE_DIR = "cache"
 DEFAULT_LOG_FILE = "logs/app.log"
 TEMP_TEST_DATA_DIR = "__TEMP_DATA__"
 REQUIREMENTS_FILE_PATH = "requirements.txt"
@@ -1,7 +1,13 @@
+import re
 import requests
 import json
+import threading
 from datetime import datetime
 from http import HTTPStatus
+from random import uniform
+from time import sleep, perf_counter
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
 
 from Constants import (
     TEZOS_RPC_PORT,
@@ -10,14 +16,28 @@ from Constants import (
     CURRENT_TESTNET,
     PRIVATE_SIGNER_URL,
 )
+from cli.head_monitor import HeadMonitor
+from cli.inclusion_tracker import InclusionTracker
 from exception.client import ClientException
 from log_config import main_logger, verbose_logger
 from util.exit_program import exit_program, ExitCode
+from util.lazy_logging import LazyPayload
 
 logger = main_logger
 
 COMM_BOOTSTRAP = "{}/monitor/bootstrapped"
-MAX_NB_TRIES = 3
+MAX_NB_TRIES = 5
+RETRY_BACKOFF_SECONDS = 0.5  # wait before the second try, doubled for each next one
+RETRY_MAX_BACKOFF_SECONDS = 8.0
+CONNECTION_POOL_SIZE = 10
+# (connect, read) timeouts in seconds used when the caller gives none
+NODE_TIMEOUT = (5, 60)
+# no read timeout, signing may wait for a confirmation on a Ledger or an HSM
+SIGNER_TIMEOUT = (5, None)
+# path segments replaced when grouping latencies by RPC, e.g. addresses or levels
+RPC_PATH_PARAMETER = re.compile(
+    r"^([0-9]+|(tz[1-4]|KT1|B|o|sr1)[1-9A-HJ-NP-Za-km-z]{30,})$"
+)
 PUBLIC_NODE_URLS = [
     PUBLIC_NODE_URL[CURRENT_TESTNET],
     PUBLIC_NODE_URL["MAINNET"],
@@ -43,12 +63,61 @@ class ClientManager:
             if self.node_endpoint not in PUBLIC_NODE_URLS:
                 self.node_endpoint += f":{TEZOS_RPC_PORT}"
         self.signer_endpoint = signer_endpoint
+        self.node_session = self._create_session()
+        self.signer_session = self._create_session()
+        self._rpc_stats = {}
+        self._rpc_stats_lock = threading.Lock()
+        self._head_monitor = None
+        self._inclusion_tracker = None
+        self._monitor_lock = threading.Lock()
+
+    @staticmethod
+    def _create_session():
+        """
+        Build a keep-alive session, one is kept for the node and one for the
+        signer so that signing does not wait for a free node connection.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=CONNECTION_POOL_SIZE, pool_maxsize=CONNECTION_POOL_SIZE
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        if self._head_monitor is not None:
+            self._head_monitor.stop()
+        self.node_session.close()
+        self.signer_session.close()
+
+    def get_head_monitor(self, level_in_cycle=None) -> HeadMonitor:
+        """
+        Returns the head monitor of the node, started on the first call and
+        shared by the producer and the consumers.
+        :param level_in_cycle: enables cycle events if the monitor has none yet
+        """
+        with self._monitor_lock:
+            if self._head_monitor is None:
+                self._head_monitor = HeadMonitor(self.get_node_url())
+                self._head_monitor.start()
+            if self._head_monitor.level_in_cycle is None:
+                self._head_monitor.level_in_cycle = level_in_cycle
+            return self._head_monitor
+
+    def get_inclusion_tracker(self) -> InclusionTracker:
+        """Returns the tracker of all operations injected through this node."""
+        head_monitor = self.get_head_monitor()
+        with self._monitor_lock:
+            if self._inclusion_tracker is None:
+                self._inclusion_tracker = InclusionTracker(self, head_monitor)
+            return self._inclusion_tracker
 
     def get_node_url(self) -> str:
         return self.node_endpoint
 
     def request_url(self, cmd, timeout=None):
-        verbose_logger.debug("--> Verbose : Command is |{}|".format(cmd))
+        verbose_logger.debug("--> Verbose : Command is |%s|", cmd)
 
         url = self.get_node_url() + cmd
         response = self._do_request(method="GET", url=url, timeout=timeout)
@@ -59,12 +128,14 @@ class ClientManager:
             return response.status_code, "Code" + str(response.status_code)
 
         output = response.json()
-        verbose_logger.debug("<-- Verbose : Answer is |{}|".format(output))
+        verbose_logger.debug("<-- Verbose : Answer is |%s|", LazyPayload(output))
         return response.status_code, output
 
     def request_url_post(self, cmd, json_params, timeout=None):
         verbose_logger.debug(
-            "--> Verbose : Command is |{}|, Params are |{}|".format(cmd, json_params)
+            "--> Verbose : Command is |%s|, Params are |%s|",
+            cmd,
+            LazyPayload(json_params),
         )
 
         url = self.get_node_url() + cmd
@@ -84,7 +155,7 @@ class ClientManager:
             return response.status_code, "Code" + str(response.status_code)
 
         output = response.json()
-        verbose_logger.debug("<-- Verbose : Answer is |{}|".format(output))
+        verbose_logger.debug("<-- Verbose : Answer is |%s|", LazyPayload(output))
         return response.status_code, output
 
     def sign(self, bytes, key_name, timeout=None):
@@ -99,6 +170,8 @@ class ClientManager:
             json_params=json_params,
             headers=headers,
             timeout=timeout,
+            signer=True,
+            idempotent=False,
         )
 
         if response is None:
@@ -130,7 +203,9 @@ class ClientManager:
         )
 
         try:
-            response = self._do_request(method="GET", url=url, timeout=timeout)
+            response = self._do_request(
+                method="GET", url=url, timeout=timeout, signer=True
+            )
         except Exception as e:
             exit_program(ExitCode.SIGNER_ERROR, f"{e}\n{signer_exception}")
 
@@ -157,7 +232,9 @@ class ClientManager:
         )
 
         try:
-            response = self._do_request(method="GET", url=url, timeout=timeout)
+            response = self._do_request(
+                method="GET", url=url, timeout=timeout, signer=True
+            )
         except Exception as e:
             exit_program(ExitCode.SIGNER_ERROR, f"Exception: {e}\n{signer_exception}")
         if response.status_code != HTTPStatus.OK:
@@ -174,7 +251,7 @@ class ClientManager:
         boot_resp = {}
 
         try:
-            response = requests.get(
+            response = self.node_session.get(
                 COMM_BOOTSTRAP.format(self.get_node_url()), timeout=5, stream=True
             )
             for line in response.iter_lines(chunk_size=256):
@@ -197,13 +274,40 @@ class ClientManager:
         # Return unix epoch if cannot determine
         return datetime.min
 
-    def _do_request(self, method, url, json_params=None, headers=None, timeout=None):
-        try_i = 0
+    def _do_request(
+        self,
+        method,
+        url,
+        json_params=None,
+        headers=None,
+        timeout=None,
+        signer=False,
+        idempotent=True,
+    ):
+        """
+        Send the request on the node or signer session. Requests raising an
+        error, e.g. a timeout, are tried again up to MAX_NB_TRIES times after
+        an exponentially growing, randomized wait.
+        :param timeout: seconds or (connect, read) tuple, defaults to
+        NODE_TIMEOUT or SIGNER_TIMEOUT
+        :param idempotent: if False, e.g. for signing, the request is tried
+        again only when it could not reach the server
+        """
+        if signer:
+            session, default_timeout = self.signer_session, SIGNER_TIMEOUT
+        else:
+            session, default_timeout = self.node_session, NODE_TIMEOUT
+        if timeout is None:
+            timeout = default_timeout
+        rpc = self._get_rpc_name(method, url)
+
         response = None
-        while response is None and try_i < MAX_NB_TRIES:
+        for try_i in range(MAX_NB_TRIES):
+            if try_i > 0:
+                self._backoff(try_i)
+            start = perf_counter()
             try:
-                try_i += 1
-                response = requests.request(
+                response = session.request(
                     method=method,
                     url=url,
                     data=json_params,
@@ -211,13 +315,24 @@ class ClientManager:
                     timeout=timeout,
                 )
             except Exception as e:
+                self._record_rpc(rpc, perf_counter() - start, failed=True)
                 logger.error(
                     f"Error, request ->{url}<-, params ->{json_params}<-,\n---\n"
                     f"Error, exception ->{e}<-"
                 )
                 # If all MAX_NB_TRIES tries were not successful
-                if try_i == MAX_NB_TRIES - 1:
+                if try_i == MAX_NB_TRIES - 1 or not (
+                    idempotent or self._is_not_sent(e)
+                ):
                     exit_program(ExitCode.SIGNER_ERROR, str(e))
+                continue
+            self._record_rpc(
+                rpc,
+                perf_counter() - start,
+                failed=response.status_code != HTTPStatus.OK,
+            )
+            break
+
         if response is None:
             return
         # If request returns failed code
@@ -227,3 +342,92 @@ class ClientManager:
                 f"Error, response ->{response.text}<-"
             )
         return response
+
+    @staticmethod
+    def _is_not_sent(exception):
+        """
+        True if the request failed before reaching the server, i.e. the
+        connection could not be established.
+        """
+        if isinstance(exception, requests.exceptions.ConnectTimeout):
+            return True
+        if not isinstance(exception, requests.exceptions.ConnectionError):
+            return False
+        reason = getattr(exception.args[0], "reason", None) if exception.args else None
+        return isinstance(reason, ConnectTimeoutError)
+
+    @staticmethod
+    def _backoff(try_i):
+        backoff = min(
+            RETRY_BACKOFF_SECONDS * 2 ** (try_i - 1), RETRY_MAX_BACKOFF_SECONDS
+        )
+        # jitter keeps the threads of a pool from retrying all at once
+        backoff = uniform(backoff / 2, backoff)
+        logger.debug(
+            "Wait for {:.2f} seconds before try {}/{}".format(
+                backoff, try_i + 1, MAX_NB_TRIES
+            )
+        )
+        sleep(backoff)
+
+    def _get_rpc_name(self, method, url):
+        """
+        Name requests by their path without the endpoint, query, addresses,
+        hashes and levels, e.g. GET /chains/main/blocks/*/operation_hashes
+        """
+        for endpoint in (self.node_endpoint, self.signer_endpoint):
+            if endpoint and url.startswith(endpoint):
+                url = url[len(endpoint) :]
+                break
+        path = url.split("?", 1)[0]
+        segments = [
+            "*" if RPC_PATH_PARAMETER.match(segment) else segment
+            for segment in path.split("/")
+        ]
+        return "{} {}".format(method, "/".join(segments))
+
+    def _record_rpc(self, rpc, seconds, failed=False):
+        with self._rpc_stats_lock:
+            stats = self._rpc_stats.get(rpc)
+            if stats is None:
+                stats = self._rpc_stats[rpc] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                }
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def get_rpc_stats(self) -> dict:
+        """
+        Returns the latency counters of every node and signer RPC called.
+        :return: {
+            "GET /chains/main/blocks/head": {
+                "calls": 0,
+                "errors": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "mean_seconds": 0.0
+            }
+        }
+        """
+        with self._rpc_stats_lock:
+            return {
+                rpc: dict(stats, mean_seconds=stats["total_seconds"] / stats["calls"])
+                for rpc, stats in self._rpc_stats.items()
+            }
+
+    def log_rpc_stats(self):
+        for rpc, stats in sorted(self.get_rpc_stats().items()):
+            logger.debug(
+                "RPC {}: {} calls, {} errors, mean {:.3f}s, max {:.3f}s".format(
+                    rpc,
+                    stats["calls"],
+                    stats["errors"],
+                    stats["mean_seconds"],
+                    stats["max_seconds"],
+                )
+            )
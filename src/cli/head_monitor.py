@@ -0,0 +1,140 @@
+import json
+import threading
+import requests
+from random import uniform
+
+from log_config import main_logger
+
+logger = main_logger.getChild("head_monitor")
+
+COMM_MONITOR_HEADS = "{}/monitor/heads/main"
+HEAD_CONNECT_TIMEOUT = 5
+# without a new head for this many seconds the stream is considered stale
+HEAD_STALL_TIMEOUT = 120
+RECONNECT_BACKOFF_SECONDS = 1.0
+RECONNECT_MAX_BACKOFF_SECONDS = 60.0
+
+HEAD_EVENT_LEVEL = "level"
+HEAD_EVENT_CYCLE = "cycle"
+
+
+class HeadMonitor(threading.Thread):
+    """
+    Follows the heads the node streams on /monitor/heads/main in a daemon
+    thread and publishes their levels.
+
+    Subscribers are called with (HEAD_EVENT_LEVEL, level) for every new head
+    and, if level_in_cycle is given, with (HEAD_EVENT_CYCLE, level) when a
+    head starts a new cycle. The stream is reopened after a randomized,
+    exponentially growing wait whenever it fails or stalls.
+    """
+
+    def __init__(self, node_url, level_in_cycle=None, stall_timeout=HEAD_STALL_TIMEOUT):
+        super(HeadMonitor, self).__init__(name="head_monitor", daemon=True)
+        self.node_url = node_url
+        self.level_in_cycle = level_in_cycle
+        self.stall_timeout = stall_timeout
+        self.level = None
+        self.head = None
+        self.streaming = False
+        self.session = requests.Session()
+        self._subscribers = []
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._response = None
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def is_streaming(self):
+        return self.streaming and not self._stopped.is_set()
+
+    def stop(self):
+        self._stopped.set()
+        response = self._response
+        if response is not None:
+            response.close()
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait_for_level(self, level, timeout=None) -> bool:
+        """
+        Blocks until a head at level or above is seen, the monitor stops or
+        the timeout expires. Returns True if the level was reached.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._reached(level) or self._stopped.is_set(), timeout
+            )
+            return self._reached(level)
+
+    def _reached(self, level):
+        return self.level is not None and self.level >= level
+
+    def run(self):
+        logger.debug("Head monitor for {} started".format(self.node_url))
+        backoff = RECONNECT_BACKOFF_SECONDS
+        while not self._stopped.is_set():
+            try:
+                if self._follow_stream():
+                    backoff = RECONNECT_BACKOFF_SECONDS
+            except Exception as e:
+                logger.debug("Head stream of {} failed: {}".format(self.node_url, e))
+            finally:
+                self.streaming = False
+                self._response = None
+
+            if self._stopped.is_set():
+                break
+            wait = uniform(backoff / 2, backoff)
+            logger.debug("Reconnecting to the head stream in {:.1f}s".format(wait))
+            self._stopped.wait(wait)
+            backoff = min(backoff * 2, RECONNECT_MAX_BACKOFF_SECONDS)
+        self.session.close()
+
+    def _follow_stream(self):
+        """Publishes the heads of one stream, returns True if any was received."""
+        received = False
+        self._response = self.session.get(
+            COMM_MONITOR_HEADS.format(self.node_url),
+            timeout=(HEAD_CONNECT_TIMEOUT, self.stall_timeout),
+            stream=True,
+        )
+        with self._response as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if self._stopped.is_set():
+                    break
+                if not line:
+                    continue
+                self.streaming = True
+                received = True
+                self._publish(json.loads(line))
+        return received
+
+    def _publish(self, head):
+        level = int(head["level"])
+        with self._condition:
+            previous_level = self.level
+            if previous_level is not None and level <= previous_level:
+                # a reorganization at the same height or a replayed head
+                return
+            self.level = level
+            self.head = head
+            self._condition.notify_all()
+
+        events = [(HEAD_EVENT_LEVEL, level)]
+        if self.level_in_cycle is not None and previous_level is not None:
+            # the first level of the cycle of this head came after the previous head
+            if level - self.level_in_cycle(level) > previous_level:
+                events.append((HEAD_EVENT_CYCLE, level))
+
+        for event, event_level in events:
+            for callback in self._subscribers:
+                try:
+                    callback(event, event_level)
+                except Exception:
+                    logger.error(
+                        "Head subscriber failed on {} {}".format(event, event_level),
+                        exc_info=True,
+                    )
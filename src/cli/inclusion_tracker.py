@@ -0,0 +1,220 @@
+import threading
+from enum import Enum
+from http import HTTPStatus
+
+from cli.head_monitor import HEAD_EVENT_LEVEL
+from log_config import main_logger
+
+logger = main_logger.getChild("inclusion_tracker")
+
+COMM_HEAD_HEADER = "/chains/main/blocks/head/header"
+COMM_OPERATION_HASHES = "/chains/main/blocks/{}/operation_hashes"
+COMM_PENDING_OPERATIONS = "/chains/main/mempool/pending_operations"
+MAX_BLOCKS_TO_CHECK = 5
+
+
+class InclusionStatus(Enum):
+    PENDING = 0
+    INCLUDED = 1
+    REFUSED = 2
+    BRANCH_DELAYED = 3
+    TIMED_OUT = 4
+
+    def is_resolved(self):
+        return self != InclusionStatus.PENDING
+
+
+# classifications of the mempool of the node, from most to least definitive.
+# Operations refused on the current branch may still be included after a
+# change of head, they are not failed.
+MEMPOOL_CLASSIFICATIONS = {
+    "refused": InclusionStatus.REFUSED,
+    "outdated": InclusionStatus.REFUSED,
+    "branch_refused": InclusionStatus.BRANCH_DELAYED,
+    "branch_delayed": InclusionStatus.BRANCH_DELAYED,
+}
+
+
+class _TrackedOperation:
+    def __init__(self, injection_level):
+        self.injection_level = injection_level
+        self.status = InclusionStatus.PENDING
+        self.level = None
+        self.errors = None
+
+
+class InclusionTracker:
+    """
+    Tracks injected operations until they are included in a block, refused
+    by the node or not seen within max_blocks levels after injection.
+
+    Any number of operation hashes can be outstanding. Each new level is
+    checked once for all of them, followed by one look at the mempool
+    classification of the node for those still pending. Checks run on every
+    head of the head monitor, or when check() is called while the head
+    stream is unavailable.
+    """
+
+    def __init__(self, client_manager, head_monitor=None, max_blocks=None):
+        self.client_manager = client_manager
+        self.head_monitor = head_monitor
+        self.max_blocks = max_blocks if max_blocks is not None else MAX_BLOCKS_TO_CHECK
+        self._operations = {}
+        self._checked_level = None
+        self._condition = threading.Condition()
+        # serializes checks, the node is asked about every level only once
+        self._check_lock = threading.Lock()
+        if head_monitor is not None:
+            head_monitor.subscribe(self._on_head_event)
+
+    def is_streaming(self):
+        return self.head_monitor is not None and self.head_monitor.is_streaming()
+
+    def track(self, operation_hash, injection_level):
+        """
+        :param injection_level: level of the head when the operation was
+        injected, the operation is looked for in the levels after it
+        """
+        with self._condition:
+            self._operations[operation_hash] = _TrackedOperation(injection_level)
+            if self._checked_level is None or self._checked_level > injection_level:
+                self._checked_level = injection_level
+
+    def forget(self, operation_hash):
+        with self._condition:
+            self._operations.pop(operation_hash, None)
+            if not self._operations:
+                self._checked_level = None
+
+    def get_status(self, operation_hash) -> InclusionStatus:
+        with self._condition:
+            return self._operations[operation_hash].status
+
+    def get_errors(self, operation_hash):
+        with self._condition:
+            return self._operations[operation_hash].errors
+
+    def get_level(self, operation_hash):
+        with self._condition:
+            return self._operations[operation_hash].level
+
+    def wait(self, operation_hash, timeout=None) -> InclusionStatus:
+        """Blocks until the operation is resolved or the timeout expires."""
+        with self._condition:
+            operation = self._operations[operation_hash]
+            self._condition.wait_for(lambda: operation.status.is_resolved(), timeout)
+            return operation.status
+
+    def _on_head_event(self, event, level):
+        if event == HEAD_EVENT_LEVEL:
+            self.check(level)
+
+    def _pending(self):
+        with self._condition:
+            return {
+                operation_hash: operation
+                for operation_hash, operation in self._operations.items()
+                if operation.status == InclusionStatus.PENDING
+            }
+
+    def check(self, head_level=None):
+        """
+        Looks for the pending operations in the levels up to head_level, the
+        level of the current head if not given, then in the mempool.
+        :return: False if the head or a level could not be queried
+        """
+        with self._check_lock:
+            if not self._pending():
+                return True
+            if head_level is None:
+                status, header = self.client_manager.request_url(COMM_HEAD_HEADER)
+                if status != HTTPStatus.OK:
+                    return False
+                head_level = header["level"]
+
+            queried = self._check_blocks(head_level)
+            self._check_mempool()
+            self._check_timeouts()
+            return queried
+
+    def _check_blocks(self, head_level):
+        while True:
+            with self._condition:
+                if self._checked_level is None or self._checked_level >= head_level:
+                    return True
+                level = self._checked_level + 1
+
+            status, list_op_hash = self.client_manager.request_url(
+                COMM_OPERATION_HASHES.format(level)
+            )
+            if status != HTTPStatus.OK:
+                logger.warning(
+                    "Level {} could not be queried about operation hashes".format(level)
+                )
+                return False
+
+            included = {
+                operation_hash
+                for op_hashes in list_op_hash
+                for operation_hash in op_hashes
+            }
+            with self._condition:
+                for operation_hash, operation in self._operations.items():
+                    if (
+                        operation.status == InclusionStatus.PENDING
+                        and operation_hash in included
+                    ):
+                        operation.status = InclusionStatus.INCLUDED
+                        operation.level = level
+                        logger.info(
+                            "Operation {} is included at level {}".format(
+                                operation_hash, level
+                            )
+                        )
+                self._checked_level = level
+                self._condition.notify_all()
+
+    def _check_mempool(self):
+        pending = self._pending()
+        if not pending:
+            return
+        status, mempool = self.client_manager.request_url(COMM_PENDING_OPERATIONS)
+        if status != HTTPStatus.OK or not isinstance(mempool, dict):
+            return
+
+        classified = {}
+        for classification, inclusion_status in MEMPOOL_CLASSIFICATIONS.items():
+            for entry in mempool.get(classification, []):
+                # [hash, operation] before protocol Lima, {"hash": ...} since
+                if isinstance(entry, dict):
+                    operation_hash, errors = entry.get("hash"), entry.get("error")
+                else:
+                    operation_hash, errors = entry[0], entry[1].get("error")
+                if operation_hash in pending and operation_hash not in classified:
+                    classified[operation_hash] = (inclusion_status, errors)
+
+        with self._condition:
+            for operation_hash, (inclusion_status, errors) in classified.items():
+                operation = self._operations.get(operation_hash)
+                if operation is None or operation.status.is_resolved():
+                    continue
+                operation.status = inclusion_status
+                operation.errors = errors
+                logger.warning(
+                    "Operation {} is {} by the node".format(
+                        operation_hash, inclusion_status.name.lower()
+                    )
+                )
+            self._condition.notify_all()
+
+    def _check_timeouts(self):
+        with self._condition:
+            for operation in self._operations.values():
+                if (
+                    operation.status == InclusionStatus.PENDING
+                    and self._checked_level is not None
+                    and self._checked_level
+                    >= operation.injection_level + self.max_blocks
+                ):
+                    operation.status = InclusionStatus.TIMED_OUT
+            self._condition.notify_all()
@@ -14,6 +14,7 @@ from model.baking_conf import (
     FULL_SUPPORTERS_SET,
     MIN_DELEGATION_AMT,
     PAYMENT_ADDRESS,
+    PAYMENT_ADDRESSES,
     SPECIALS_MAP,
     DELEGATOR_PAYS_XFER_FEE,
     REACTIVATE_ZEROED,
@@ -74,6 +75,7 @@ class BakingYamlConfParser(YamlConfParser):
         conf_obj = self.get_conf_obj()
         self.validate_baking_address(conf_obj)
         self.validate_payment_address(conf_obj)
+        self.validate_payment_addresses(conf_obj)
         self.validate_share_map(conf_obj, FOUNDERS_MAP)
         self.validate_share_map(conf_obj, OWNERS_MAP)
         self.validate_service_fee(conf_obj)
@@ -249,6 +251,42 @@ class BakingYamlConfParser(YamlConfParser):
                 "its corresponding secret key to the signer. ".format(pymnt_addr)
             )
 
+    def validate_payment_addresses(self, conf_obj):
+        pymnt_addrs = conf_obj.get(PAYMENT_ADDRESSES)
+        if not pymnt_addrs or (
+            isinstance(pymnt_addrs, str) and pymnt_addrs.lower() == "none"
+        ):
+            pymnt_addrs = []
+        if isinstance(pymnt_addrs, str) or not isinstance(pymnt_addrs, list):
+            raise ConfigurationException(
+                "{} must be a list of tz addresses".format(PAYMENT_ADDRESSES)
+            )
+
+        dry_run_no_signer = self.dry_run and self.dry_run == DryRun.NO_SIGNER
+
+        # the payment address is the first source, the others are added in order
+        sources = [conf_obj[PAYMENT_ADDRESS]]
+        for pymnt_addr in pymnt_addrs:
+            if not (
+                isinstance(pymnt_addr, str)
+                and len(pymnt_addr) == PKH_LENGHT
+                and pymnt_addr.startswith("tz")
+            ):
+                raise ConfigurationException(
+                    "Payment Address ({}) in {} cannot be translated into a PKH. "
+                    "Make sure it is a tz1 address and to first import "
+                    "its corresponding secret key to the signer. ".format(
+                        pymnt_addr, PAYMENT_ADDRESSES
+                    )
+                )
+            if pymnt_addr in sources:
+                continue
+            if not dry_run_no_signer:
+                self.clnt_mngr.check_pkh_known_by_signer(pymnt_addr)
+            sources.append(pymnt_addr)
+
+        conf_obj[PAYMENT_ADDRESSES] = sources
+
     def validate_baking_address(self, conf_obj):
         baking_address = conf_obj.get(BAKING_ADDRESS)
         if not baking_address:
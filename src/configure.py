@@ -52,6 +52,8 @@ from model.baking_conf import (
 from util.address_validator import AddressValidator
 from util.fee_validator import FeeValidator
 from util.exit_program import exit_program, ExitCode
+from util.dir_utils import get_cache_root
+from tzkt.tzkt_cache import init_split_cache
 
 
 logger = main_logger
@@ -434,6 +436,8 @@ def main(args):
     if config_dir and not os.path.exists(config_dir):
         os.makedirs(config_dir)
 
+    init_split_cache(get_cache_root(args.base_directory, create=True))
+
     # 2. get network config
     global client_manager
     client_manager = ClientManager(
@@ -12,6 +12,7 @@ EXCLUDED_MAP = "excluded_map"
 RULES_MAP = "rules_map"
 SUPPORTERS_SET = "supporters_set"
 PAYMENT_ADDRESS = "payment_address"
+PAYMENT_ADDRESSES = "payment_addresses"
 MIN_DELEGATION_AMT = "min_delegation_amt"
 REACTIVATE_ZEROED = "reactivate_zeroed"
 DELEGATOR_PAYS_XFER_FEE = "delegator_pays_xfer_fee"
@@ -59,6 +60,9 @@ class BakingConf:
     def get_payment_address(self):
         return self.get_attribute(PAYMENT_ADDRESS)
 
+    def get_payment_addresses(self):
+        return self.get_attribute(PAYMENT_ADDRESSES, [self.get_payment_address()])
+
     def get_service_fee(self):
         return self.get_attribute(SERVICE_FEE)
 
@@ -3,6 +3,8 @@ from util.dir_utils import (
     get_calculations_root,
     get_successful_payments_dir,
     get_failed_payments_dir,
+    get_payment_plans_dir,
+    get_cache_root,
 )
 import os
 from Constants import REPORTS_DIR, SIMULATIONS_DIR
@@ -18,6 +20,9 @@ from Constants import REPORTS_DIR, SIMULATIONS_DIR
 #    │   └── app_verbose.gz
 #    └── app.log
 #    └── app_verbose.log
+# └──cache
+#    └── objects
+#    └── refs
 # └──simulations
 #    └── tz1xxx
 #       ├── calculations
@@ -25,8 +30,10 @@ from Constants import REPORTS_DIR, SIMULATIONS_DIR
 #       └── payments
 #           ├── done
 #           │   └── 449.csv
-#           └── failed
-#               └── 449.csv
+#           ├── failed
+#           │   └── 449.csv
+#           └── plans
+#               └── 449_tz1yyy.json
 # └──reports
 #    └── tz1xxx
 #       ├── calculations
@@ -34,8 +41,10 @@ from Constants import REPORTS_DIR, SIMULATIONS_DIR
 #       └── payments
 #           ├── done
 #           │   └── 449.csv
-#           └── failed
-#               └── 449.csv
+#           ├── failed
+#           │   └── 449.csv
+#           └── plans
+#               └── 449_tz1yyy.json
 class BakingDirs:
     def __init__(self, args, baking_address) -> None:
         super().__init__()
@@ -64,3 +73,5 @@ class BakingDirs:
         self.failed_payments_dir = get_failed_payments_dir(
             self.payments_root, create=True
         )
+        self.payment_plans_dir = get_payment_plans_dir(self.payments_root, create=True)
+        self.cache_root = get_cache_root(args.base_directory, create=True)
@@ -52,9 +52,12 @@ class RewardLog:
         self.adjustment = int(0)
         self.delegate_transaction_fee = int(0)
         self.delegator_transaction_fee = int(0)
+        self.fee_breakdown = None
         self.parents = None
         self.paid = PaymentStatus.UNDEFINED
         self.hash = None
+        # payment address the payout is sent from
+        self.source = None
         self.payable = True
 
     def skip(self, desc, phase):
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from time import sleep
 import base58
@@ -9,22 +10,45 @@ from Constants import PaymentStatus
 
 from pay.utils import (
     calculate_required_fee,
+    calculate_minimal_fee,
+    FeeBreakdown,
     calculate_tx_fee,
     log_and_fail,
-    build_runops_json_params,
     calculate_consumed_gas,
     calculate_consumed_storage,
     init_payment_logs,
     calculate_estimated_amount_to_pay,
     sort_and_chunk_payment_items,
     calculate_future_payable_cycles,
+    HARD_GAS_LIMIT_PER_BLOCK,
+    HARD_GAS_LIMIT_PER_OPERATION,
+    HARD_STORAGE_LIMIT_PER_OPERATION,
+    MINIMUM_FEE_MUTEZ,
+    MUTEZ_PER_BYTE,
+    MUTEZ_PER_GAS_UNIT,
+    SIGNATURE_BYTES_SIZE,
 )
 
 from util.wait_random import wait_random
 
 from util.address_validator import AddressValidator
 
+from util.dir_utils import get_payment_plan_file_path
 from util.exit_program import ExitCode
+from util.lazy_logging import LazyPayload
+from cli.inclusion_tracker import InclusionStatus
+from pay.estimate_cache import get_estimate_cache
+from pay.payment_plan import PaymentPlan, PlannedBatch
+from pay.operation_group import OperationGroup, Transaction
+from pay.forge import (
+    calculate_operation_hash,
+    forge_operation_group,
+    forged_content_size,
+    forged_size,
+    is_forge_check_enabled,
+    nat_size,
+    BRANCH_SIZE,
+)
 
 logger = main_logger
 
@@ -34,39 +58,32 @@ logger = main_logger
 # Other KT accounts with higher fee requirements will be skipped
 # TODO: define set of known contract formats and make this fee for unknown contracts configurable
 KT1_FEE_SAFETY_CHECK = True
+# Simulate the payouts to contracts of a batch in one operation group
+GROUP_SIMULATION = True
 FEE_LIMIT_CONTRACTS = 100000
 ZERO_THRESHOLD = 1  # too less to payout in mutez
 
 # For simulation
-# https://rpc.tzkt.io/mainnet/chains/main/blocks/head/context/constants
-HARD_GAS_LIMIT_PER_OPERATION = 1040000
-HARD_STORAGE_LIMIT_PER_OPERATION = 60000
 COST_PER_BYTE = 250
-MINIMUM_FEE_MUTEZ = 100
-MUTEZ_PER_GAS_UNIT = 0.1
-MUTEZ_PER_BYTE = 1
 
 PKH_LENGTH = 36
-SIGNATURE_BYTES_SIZE = 64
 MAX_NUM_TRIALS_PER_BLOCK = 2
 MAX_BLOCKS_TO_CHECK_AFTER_INJECTION = 5
 MAX_BATCH_PAYMENT_ATTEMPTS = 3
+# counter assumed when estimating the size of operations, larger than any in use
+PACKING_COUNTER = 2**35 - 1
+# simulations of contract payouts run in parallel, kept below the node connection pool
+MAX_SIMULATION_WORKERS = 8
 
 COMM_DELEGATE_BALANCE = "/chains/main/blocks/{}/context/contracts/{}/balance"
 COMM_PAYMENT_HEAD = "/chains/main/blocks/head~10"
 COMM_HEAD = "/chains/main/blocks/head"
 COMM_COUNTER = "/chains/main/blocks/head/context/contracts/{}/counter"
-CONTENT = '{"kind":"transaction","source":"%SOURCE%","destination":"%DESTINATION%","fee":"%fee%","counter":"%COUNTER%","gas_limit":"%gas_limit%","storage_limit":"%storage_limit%","amount":"%AMOUNT%"}'
-FORGE_JSON = '{"branch": "%BRANCH%","contents":[%CONTENT%]}'
-RUNOPS_JSON = '{"branch": "%BRANCH%","contents":[%CONTENT%], "signature":"edsigtXomBKi5CTRf5cjATJWSyaRvhfYNHqSUGrn4SdbYRcGwQrUGjzEfQDTuqHhuA8b2d8NarZjz8TRf65WkpQmo423BtomS8Q"}'
-PREAPPLY_JSON = '[{"protocol":"%PROTOCOL%","branch":"%BRANCH%","contents":[%CONTENT%],"signature":"%SIGNATURE%"}]'
-JSON_WRAP = '{"operation": %JSON%,"chain_id":"%chain_id%"}'
 
 COMM_RUNOPS = "/chains/main/blocks/head/helpers/scripts/run_operation"
 COMM_FORGE = "/chains/main/blocks/head/helpers/forge/operations"
 COMM_PREAPPLY = "/chains/main/blocks/head/helpers/preapply/operations"
 COMM_INJECT = "/injection/operation"
-COMM_WAIT = "/chains/main/blocks/%BLOCK_HASH%/operation_hashes"
 
 # Lima
 # Non-allocated:
@@ -97,13 +114,11 @@ TX_FEES = {
     },
 }
 
-# TODO: We need to refactor the whole class and all its functions.
-# Procedure needs to be transitioned to:
-# 1) Calculate all payments
-# 2) Simulate all fees
-# 3) Sort and exclude payments due to e.g. too high fees or too small payment amount
-# 4) Create batches
-# 5) Inject payments
+
+# Payments are done in two phases:
+# 1) Plan: calculate and simulate the fees of all payments, exclude payments due to
+#    e.g. too high fees or too small payment amount, create the batches and save the plan
+# 2) Execute: inject the batches of the plan, a saved plan can be resumed
 
 
 class BatchPayer:
@@ -117,6 +132,7 @@ class BatchPayer:
         network_config,
         plugins_manager,
         dry_run,
+        plans_dir=None,
     ):
         self.pymnt_addr = pymnt_addr
         self.node_url = node_url
@@ -125,6 +141,8 @@ class BatchPayer:
         self.default_zero_threshold = int(ZERO_THRESHOLD)
         self.plugins_manager = plugins_manager
         self.dry_run = dry_run
+        self.plans_dir = plans_dir
+        self.estimate_cache = get_estimate_cache()
 
         # Default tz1 to tz1 transaction fees
         self.default_gas_limit = int(TX_FEES["TZ1_TO_ALLOCATED_TZ1"]["GAS_LIMIT"])
@@ -179,9 +197,12 @@ class BatchPayer:
         self.comm_forge = COMM_FORGE
         self.comm_preapply = COMM_PREAPPLY
         self.comm_inject = COMM_INJECT
-        self.comm_wait = COMM_WAIT
 
-    def pay(self, payment_items_in, dry_run=None):
+    def pay(self, payment_items_in, dry_run=None, payment_cycle=None):
+        """
+        :param payment_cycle: the plan of the payments is saved for the cycle
+        if plans_dir is set, and resumed if it was saved for the same items
+        """
         # initialize the result list with already paid items
         logger.info("{} payment items to process".format(len(payment_items_in)))
         payment_logs = init_payment_logs(payment_items_in)
@@ -258,7 +279,8 @@ class BatchPayer:
 
         if len(payment_items) == 0:
             logger.info("No payment items found, returning...")
-            return payment_logs, 0, 0, 0, None
+            # nothing to pay, the payable cycles are not estimated
+            return payment_logs, 0, 0, None, None
 
         # This is an estimate to predict if the payment account holds enough funds to payout this cycle and the number of future cycles
         estimated_amount_to_pay = calculate_estimated_amount_to_pay(
@@ -269,12 +291,13 @@ class BatchPayer:
             self.delegator_pays_ra_fee,
         )
 
-        # split payments into lists of MAX_TX_PER_BLOCK or less size
-        # [list_of_size_MAX_TX_PER_BLOCK,list_of_size_MAX_TX_PER_BLOCK,list_of_size_MAX_TX_PER_BLOCK,...]
-
-        payment_items_chunks = sort_and_chunk_payment_items(payment_items)
+        # split payments into batches filled up to the gas and size limits
+        payment_items_chunks = sort_and_chunk_payment_items(
+            payment_items, self.estimate_operation_limits
+        )
 
-        payment_address_balance = int(self.get_payment_address_balance())
+        payment_address_balance = self.get_payment_address_balance()
+        number_future_payable_cycles = None
 
         logger.info(
             "Total estimated amount to pay out is {:<,d} mutez.".format(
@@ -339,26 +362,29 @@ class BatchPayer:
                     )
                 )
 
-        total_attempts = 0
-        op_counter = OpCounter()
+        plan_file = self.get_plan_file(payment_cycle)
+        plan = self.plan_payments(payment_items_chunks, plan_file)
+
+        if dry_run:
+            # a dry run stops at the payment plan, planning a batch counts as
+            # its attempt so that the dry run is reported like a payment
+            total_attempts = len(plan.batches)
+            for batch in plan.batches:
+                for payment_item in plan.get_batch_items(batch):
+                    if batch.contents is None:
+                        payment_item.paid = PaymentStatus.FAIL
+                        payment_item.desc += "Batch could not be planned. "
+                    elif payment_item.paid.is_undefined():
+                        payment_item.paid = PaymentStatus.DONE
+        else:
+            total_attempts = self.execute_plan(plan, plan_file)
 
         # Calculate actual payment amount after previous estimate for each chunk in chunks iteratively
         amount_to_pay = delegator_transaction_fees = delegate_transaction_fees = 0
 
-        for i_batch, payment_items_chunk in enumerate(payment_items_chunks):
-            logger.info("Payment of batch {} started".format(i_batch + 1))
-            status = PaymentStatus.UNDEFINED
-            attempt, status = self.pay_single_batch(
-                payment_items_chunk, dry_run=dry_run, op_counter=op_counter
-            )
-
-            logger.info(
-                "Payment of batch {} {} in {} attempt(s)".format(
-                    i_batch + 1, "failed" if status.is_fail() else "succeeded", attempt
-                )
-            )
-
+        for payment_items_chunk in payment_items_chunks:
             for payment_item in payment_items_chunk:
+                payment_item.source = self.source
                 if (
                     payment_item.paid.is_paid()
                     or payment_item.paid.is_injected()
@@ -369,7 +395,6 @@ class BatchPayer:
                     delegate_transaction_fees += payment_item.delegate_transaction_fee
 
             payment_logs.extend(payment_items_chunk)
-            total_attempts += attempt
 
         amount_to_pay = (
             amount_to_pay - delegator_transaction_fees + delegate_transaction_fees
@@ -380,6 +405,7 @@ class BatchPayer:
                 amount_to_pay, total_attempts, len(payment_items_chunks)
             )
         )
+        self.clnt_mngr.log_rpc_stats()
 
         return (
             payment_logs,
@@ -389,7 +415,272 @@ class BatchPayer:
             None,
         )
 
-    def pay_single_batch(self, payment_items, op_counter, dry_run=None):
+    def estimate_operation_limits(self, payment_item):
+        """
+        Estimated gas and forged size of a payout, for packing the batches.
+        Contracts are estimated from the estimate cache, their gas is None if
+        they were never simulated.
+        """
+        gas_limit, storage_limit, tx_fee = (
+            self.default_gas_limit,
+            self.default_storage_limit,
+            self.default_fee,
+        )
+        if payment_item.paymentaddress.startswith("KT"):
+            estimate = None
+            if self.estimate_cache is not None:
+                estimate = self.estimate_cache.peek(payment_item.paymentaddress)
+            if estimate is None:
+                gas_limit, storage_limit, tx_fee = None, 0, calculate_tx_fee(tx_fee)
+            else:
+                gas_limit, storage_limit, tx_fee = (
+                    estimate["gas"],
+                    estimate["storage"],
+                    estimate["fee"],
+                )
+        elif payment_item.needs_activation:
+            gas_limit = TX_FEES["TZ1_TO_NON_ALLOCATED_TZ1"]["GAS_LIMIT"]
+            storage_limit = TX_FEES["TZ1_TO_NON_ALLOCATED_TZ1"]["STORAGE_LIMIT"]
+            tx_fee = TX_FEES["TZ1_TO_NON_ALLOCATED_TZ1"]["FEE"]
+
+        content = {
+            "kind": "transaction",
+            "source": self.source,
+            "destination": payment_item.paymentaddress,
+            "fee": tx_fee,
+            "counter": PACKING_COUNTER,
+            "gas_limit": gas_limit or HARD_GAS_LIMIT_PER_OPERATION,
+            "storage_limit": storage_limit,
+            "amount": payment_item.adjusted_amount,
+        }
+        return gas_limit, forged_content_size(content)
+
+    def get_plan_file(self, payment_cycle):
+        if self.plans_dir is None or payment_cycle is None:
+            return None
+        return get_payment_plan_file_path(self.plans_dir, payment_cycle, self.source)
+
+    def get_counter(self):
+        status, counter = self.clnt_mngr.request_url(self.comm_counter)
+        if status != HTTPStatus.OK:
+            raise Exception(
+                "Received response code {} for request '{}'".format(
+                    status, self.comm_counter
+                )
+            )
+        return int(counter)
+
+    def plan_payments(self, payment_items_chunks, plan_file=None):
+        """
+        Simulates and prices the payouts of all the batches and sets their
+        counters, then saves the plan before anything is injected. A plan saved
+        for the same payment items is resumed instead.
+        A batch whose preparation fails is planned without contents and
+        prepared again when it is executed.
+        """
+        payment_items = [pi for chunk in payment_items_chunks for pi in chunk]
+        if plan_file is not None:
+            plan = PaymentPlan.load(plan_file, self.source, payment_items)
+            if plan is not None:
+                logger.info("Resuming the payment plan {}".format(plan_file))
+                return plan
+
+        item_indexes = {id(pi): index for index, pi in enumerate(payment_items)}
+        plan = PaymentPlan(self.source, None, payment_items, [])
+        op_counter = OpCounter()
+        counter = None
+        for i_batch, payment_items_chunk in enumerate(payment_items_chunks):
+            logger.info("Planning batch {}".format(i_batch + 1))
+            try:
+                prepared_batch = self.prepare_batch(payment_items_chunk, op_counter)
+                if counter is None:
+                    counter = op_counter.get()
+                    plan.protocol = prepared_batch.protocol
+                batch_items = prepared_batch.batch_items
+                if not batch_items:
+                    continue
+                contents = prepared_batch.contents
+                for content in contents:
+                    counter += 1
+                    content.set_counter(counter)
+                total_tx_fees, _ = self.adjust_batch_fee(
+                    contents,
+                    batch_items,
+                    prepared_batch.total_gas,
+                    prepared_batch.total_tx_fees,
+                )
+                self.set_fee_breakdowns(batch_items, contents)
+                planned_batch = PlannedBatch(
+                    [item_indexes[id(pi)] for pi in batch_items],
+                    [content.to_dict() for content in contents],
+                    prepared_batch.total_gas,
+                    total_tx_fees,
+                )
+            except Exception:
+                logger.error(
+                    "Planning of batch {} failed, it is prepared again on payment".format(
+                        i_batch + 1
+                    ),
+                    exc_info=True,
+                )
+                planned_batch = PlannedBatch(
+                    [item_indexes[id(pi)] for pi in payment_items_chunk],
+                    None,
+                    0,
+                    0,
+                )
+            plan.batches.append(planned_batch)
+
+        self.save_plan(plan, plan_file)
+        logger.info(
+            "Payment plan has {} batches{}".format(
+                len(plan.batches),
+                ", it is saved to {}".format(plan_file) if plan_file else "",
+            )
+        )
+        return plan
+
+    @staticmethod
+    def save_plan(plan, plan_file):
+        if plan_file is None:
+            return
+        try:
+            plan.save(plan_file)
+        except OSError:
+            logger.error(
+                "Payment plan could not be saved to {}".format(plan_file),
+                exc_info=True,
+            )
+
+    def execute_plan(self, plan, plan_file=None):
+        """
+        Pays the batches of the plan in order, the plan is saved after each
+        step. The counter of the source is saved before a batch is submitted.
+        If the submission is interrupted, the batch is submitted again only if
+        the counter did not move: both operations then have the same counters
+        and at most one of them can be included.
+        :return: number of attempts
+        """
+        total_attempts = 0
+        op_counter = OpCounter()
+        for i_batch, batch in enumerate(plan.batches):
+            batch_items = plan.get_batch_items(batch)
+            if batch.status.is_undefined() and batch.submission_counter is not None:
+                self.resolve_interrupted_batch(batch, batch_items)
+                self.save_plan(plan, plan_file)
+            if not batch.status.is_undefined():
+                logger.info(
+                    "Payment of batch {} is already {}".format(
+                        i_batch + 1, batch.status.name.lower()
+                    )
+                )
+                continue
+
+            logger.info("Payment of batch {} started".format(i_batch + 1))
+            try:
+                batch.submission_counter = self.get_counter()
+            except Exception as e:
+                logger.error("Payment of batch {} failed: {}".format(i_batch + 1, e))
+                for payment_item in batch_items:
+                    payment_item.paid = PaymentStatus.FAIL
+                    payment_item.desc += "Counter of the payment address is not known. "
+                batch.status = PaymentStatus.FAIL
+                self.save_plan(plan, plan_file)
+                continue
+            op_counter.set(batch.submission_counter)
+            self.save_plan(plan, plan_file)
+
+            attempt, status = self.pay_single_batch(
+                batch_items,
+                op_counter,
+                prepared_batch=self.get_planned_batch(plan, batch),
+            )
+
+            logger.info(
+                "Payment of batch {} {} in {} attempt(s)".format(
+                    i_batch + 1, "failed" if status.is_fail() else "succeeded", attempt
+                )
+            )
+            batch.status = status
+            batch.operation_hash = next(
+                (pi.hash for pi in batch_items if pi.hash is not None), None
+            )
+            self.save_plan(plan, plan_file)
+            total_attempts += attempt
+
+        return total_attempts
+
+    def resolve_interrupted_batch(self, batch, batch_items):
+        counter = self.get_counter()
+        if counter == batch.submission_counter:
+            logger.info(
+                "Counter {} did not move since the submission was interrupted, submitting the batch again".format(
+                    counter
+                )
+            )
+            return
+        # included operations use their counters, whether they are applied or not
+        logger.warning(
+            "Counter moved from {} to {} since the submission was interrupted, the batch was injected".format(
+                batch.submission_counter, counter
+            )
+        )
+        batch.status = PaymentStatus.INJECTED
+        for payment_item in batch_items:
+            if payment_item.paid.is_undefined():
+                payment_item.paid = PaymentStatus.INJECTED
+                payment_item.desc += "Submission was interrupted and the counter of the payment address moved. Investigate on https://tzkt.io. "
+
+    def get_planned_batch(self, plan, batch):
+        """
+        Contents of the planned batch with a recent branch, None if it was
+        not prepared or the protocol changed since it was planned.
+        """
+        if batch.contents is None:
+            return None
+        status, head = self.clnt_mngr.request_url(self.comm_payment_head)
+        if status != HTTPStatus.OK:
+            logger.warning("Head could not be read, preparing the batch again")
+            return None
+        protocol = head["metadata"]["protocol"]
+        if protocol != plan.protocol:
+            logger.warning(
+                "Protocol changed to {} since the payments were planned, preparing the batch again".format(
+                    protocol
+                )
+            )
+            return None
+        contents = [
+            Transaction.from_dict(dict(content, counter=None))
+            for content in batch.contents
+        ]
+        batch_items = plan.get_batch_items(batch)
+        return PreparedBatch(
+            head["hash"],
+            head["chain_id"],
+            protocol,
+            batch_items,
+            contents,
+            batch.total_gas,
+            batch.total_tx_fees,
+            # the contracts are priced from the estimates made for the plan
+            estimated_items=[
+                payment_item
+                for payment_item in batch_items
+                if payment_item.paymentaddress.startswith("KT")
+            ],
+        )
+
+    def pay_single_batch(
+        self, payment_items, op_counter, dry_run=None, prepared_batch=None
+    ):
+        """
+        Pays the items in one batch, in up to MAX_BATCH_PAYMENT_ATTEMPTS
+        attempts. A failed attempt is tried again after a while. Items left out
+        of a successful attempt for an outdated estimate are simulated and paid
+        by the next attempt.
+        :param prepared_batch: batch prepared ahead, used by the first attempt only
+        """
         max_try = MAX_BATCH_PAYMENT_ATTEMPTS
         status = PaymentStatus.UNDEFINED
         error_message = ""
@@ -398,10 +689,19 @@ class BatchPayer:
 
         # for failed operations, trying after some time should be OK
         for attempt in range(max_try):
+            # payouts failed or avoided by a previous attempt are not paid again
+            attempt_items = [pi for pi in payment_items if pi.paid.is_undefined()]
+            if not attempt_items:
+                break
+            batch = prepared_batch if attempt == 0 else None
+            deferred_items = []
             try:
-                status, operation_hash, error_message = self.attempt_single_batch(
-                    payment_items, op_counter, dry_run=dry_run
+                if batch is None:
+                    batch = self.prepare_batch(attempt_items, op_counter)
+                status, operation_hash, error_message = self.submit_batch(
+                    batch, op_counter, dry_run=dry_run
                 )
+                deferred_items = batch.deferred_items
             except Exception:
                 logger.error(
                     "Batch payment attempt {}/{} for current batch failed with error".format(
@@ -423,6 +723,24 @@ class BatchPayer:
 
             logger.debug("Payment attempt {}/{} failed".format(attempt + 1, max_try))
 
+            if not status.is_fail() and deferred_items:
+                for payment_item in attempt_items:
+                    if payment_item.paid.is_undefined() and not any(
+                        payment_item is deferred for deferred in deferred_items
+                    ):
+                        payment_item.paid = status
+                        if operation_hash is not None:
+                            payment_item.hash = operation_hash
+                        payment_item.desc += error_message
+                settled = status.is_paid() or status.is_done()
+                status, operation_hash = PaymentStatus.FAIL, None
+                error_message = "Payment failed with an outdated estimate. "
+                # an injected batch may still be included with the counters
+                # the next attempt would use
+                if not settled:
+                    break
+                continue
+
             # if not fail, do not try anymore
             if not status.is_fail():
                 break
@@ -435,7 +753,8 @@ class BatchPayer:
         for payment_item in payment_items:
             if payment_item.paid.is_undefined():
                 payment_item.paid = status
-                payment_item.hash = operation_hash
+                if operation_hash is not None:
+                    payment_item.hash = operation_hash
                 payment_item.desc += error_message
 
         return attempt_count, status
@@ -445,17 +764,17 @@ class BatchPayer:
         gas_limit = HARD_GAS_LIMIT_PER_OPERATION
         storage_limit = HARD_STORAGE_LIMIT_PER_OPERATION
         tx_fee = calculate_tx_fee(self.default_fee)
-        content = (
-            CONTENT.replace("%SOURCE%", str(self.source))
-            .replace("%DESTINATION%", str(payment_item.paymentaddress))
-            .replace("%AMOUNT%", str(pymnt_amnt))
-            .replace("%COUNTER%", str(self.base_counter + 1))
-            .replace("%fee%", str(tx_fee))
-            .replace("%gas_limit%", str(gas_limit))
-            .replace("%storage_limit%", str(storage_limit))
+        content = Transaction(
+            self.source,
+            payment_item.paymentaddress,
+            pymnt_amnt,
+            tx_fee,
+            gas_limit,
+            storage_limit,
+            self.base_counter + 1,
         )
 
-        runops_json = build_runops_json_params(branch, content, chain_id)
+        runops_json = OperationGroup(branch, [content]).run_operation_json(chain_id)
         status, run_ops_parsed = self.clnt_mngr.request_url_post(
             cmd=self.comm_runops, json_params=runops_json
         )
@@ -466,75 +785,418 @@ class BatchPayer:
 
         status = op["metadata"]["operation_result"]["status"]
         if status == "applied":
-            # Calculate actual consumed gas amount
-            consumed_gas = (
-                calculate_consumed_gas(
-                    consumed_milligas=op["metadata"]["operation_result"][
-                        "consumed_milligas"
-                    ],
-                    metadata=op["metadata"],
-                )
-                + 100
-            )
-            # Calculate actual used storage
-            consumed_storage = calculate_consumed_storage(op["metadata"])
+            consumed_gas, consumed_storage = self.calculate_consumed_limits(
+                op["metadata"]
+            )
         else:
             return log_and_fail(op["metadata"]["operation_result"])
 
-        # Calculate needed fee for the transaction, for that we need the size of the forged transaction in bytes
-        tx_fee += math.ceil(consumed_gas * MUTEZ_PER_GAS_UNIT)
-        content = (
-            CONTENT.replace("%SOURCE%", str(self.source))
-            .replace("%DESTINATION%", str(payment_item.paymentaddress))
-            .replace("%AMOUNT%", str(pymnt_amnt))
-            .replace("%COUNTER%", str(self.base_counter + 1))
-            .replace("%fee%", str(tx_fee))
-            .replace("%gas_limit%", str(consumed_gas))
-            .replace("%storage_limit%", str(consumed_storage))
-        )
-        forge_json = FORGE_JSON.replace("%BRANCH%", branch).replace(
-            "%CONTENT%", content
-        )
-        status, bytes = self.clnt_mngr.request_url_post(self.comm_forge, forge_json)
-        if status != HTTPStatus.OK:
-            logger.error("Error in forge operation")
-            return PaymentStatus.FAIL, []
-        # Now that we have the size of the transaction, compute the required fee
-        size = SIGNATURE_BYTES_SIZE + len(bytes) / 2
-        required_fee = calculate_required_fee(consumed_gas, size)
-        # Check if the pre-computed tx_fee is higher or equal than the minimal required fee
-        while tx_fee < required_fee:
-            # Re-adjust according to the new fee
-            tx_fee = required_fee
-            tx = json.loads(content)
-            tx["fee"] = str(tx_fee)
-            content = json.dumps(tx)
-            forge_json = FORGE_JSON.replace("%BRANCH%", branch).replace(
-                "%CONTENT%", content
-            )
-            status, bytes = self.clnt_mngr.request_url_post(self.comm_forge, forge_json)
-            if status != HTTPStatus.OK:
-                logger.error("Error in forge operation")
-                return PaymentStatus.FAIL, []
-
-            # Compute the new required fee. It is possible that the size of the transaction in bytes is now higher
-            # because of the increase in the fee of the first transaction
-            size = SIGNATURE_BYTES_SIZE + len(bytes) / 2
-            required_fee = calculate_required_fee(consumed_gas, size)
+        tx_fee = self.calculate_contract_fee(
+            payment_item, pymnt_amnt, consumed_gas, consumed_storage
+        )
         simulation_results = consumed_gas, tx_fee, consumed_storage
         return PaymentStatus.DONE, simulation_results
 
-    def attempt_single_batch(self, payment_items, op_counter, dry_run=None):
-        if not op_counter.get():
-            status, counter = self.clnt_mngr.request_url(self.comm_counter)
-            if status != HTTPStatus.OK:
-                raise Exception(
-                    "Received response code {} for request '{}'".format(
-                        status, self.comm_counter
+    @staticmethod
+    def calculate_consumed_limits(metadata):
+        # Calculate actual consumed gas amount
+        consumed_gas = (
+            calculate_consumed_gas(
+                consumed_milligas=metadata["operation_result"]["consumed_milligas"],
+                metadata=metadata,
+            )
+            + 100
+        )
+        # Calculate actual used storage
+        consumed_storage = calculate_consumed_storage(metadata)
+        return consumed_gas, consumed_storage
+
+    def calculate_contract_fee(self, payment_item, pymnt_amnt, gas, storage):
+        """Fee of a payout to a contract from its gas and storage limits."""
+        # Calculate needed fee for the transaction from the size of the forged transaction in bytes
+        tx_fee = calculate_tx_fee(self.default_fee) + math.ceil(
+            gas * MUTEZ_PER_GAS_UNIT
+        )
+        tx = Transaction(
+            self.source,
+            payment_item.paymentaddress,
+            pymnt_amnt,
+            tx_fee,
+            gas,
+            storage,
+            self.base_counter + 1,
+        )
+        size = SIGNATURE_BYTES_SIZE + forged_size([tx.to_dict()]) - nat_size(tx.fee)
+        return calculate_minimal_fee(gas, size, fee=tx_fee)
+
+    def run_operation_group(self, payment_items, branch, chain_id):
+        """
+        Simulates the payouts in one run_operation, each with its share of the
+        gas limit of a block.
+        :return: simulation results of every payout or None if any of them
+        is not applied
+        """
+        gas_limit = min(
+            HARD_GAS_LIMIT_PER_OPERATION, HARD_GAS_LIMIT_PER_BLOCK // len(payment_items)
+        )
+        tx_fee = calculate_tx_fee(self.default_fee)
+        contents = [
+            Transaction(
+                self.source,
+                payment_item.paymentaddress,
+                payment_item.adjusted_amount,
+                tx_fee,
+                gas_limit,
+                HARD_STORAGE_LIMIT_PER_OPERATION,
+                self.base_counter + 1 + i,
+            )
+            for i, payment_item in enumerate(payment_items)
+        ]
+        runops_json = OperationGroup(branch, contents).run_operation_json(chain_id)
+        status, run_ops_parsed = self.clnt_mngr.request_url_post(
+            cmd=self.comm_runops, json_params=runops_json
+        )
+        if status != HTTPStatus.OK:
+            logger.debug(
+                "Simulation of {} payouts failed with status {}".format(
+                    len(payment_items), status
+                )
+            )
+            return None
+
+        simulation_results = []
+        for payment_item, op in zip(payment_items, run_ops_parsed["contents"]):
+            if op["metadata"]["operation_result"]["status"] != "applied":
+                return None
+            consumed_gas, consumed_storage = self.calculate_consumed_limits(
+                op["metadata"]
+            )
+            tx_fee = self.calculate_contract_fee(
+                payment_item,
+                payment_item.adjusted_amount,
+                consumed_gas,
+                consumed_storage,
+            )
+            simulation_results.append((consumed_gas, tx_fee, consumed_storage))
+        return simulation_results
+
+    def simulate_operation_group(self, payment_items, branch, chain_id):
+        """
+        Simulates the payouts together. A group with a payout which is not
+        applied is split in halves until the failing payouts are isolated,
+        which are left to simulate_single_operation.
+        :return: simulation results of the payouts applied in a group by their
+        position in payment_items, and the positions of the isolated payouts
+        """
+        simulated, isolated = {}, []
+        groups = [list(range(len(payment_items)))]
+        while groups:
+            group = groups.pop()
+            if len(group) == 1:
+                isolated.extend(group)
+                continue
+            try:
+                simulation_results = self.run_operation_group(
+                    [payment_items[i] for i in group], branch, chain_id
+                )
+            except Exception as e:
+                logger.debug(
+                    "Simulation of {} payouts failed with error: {}: {}".format(
+                        len(group), type(e).__name__, str(e)
                     )
                 )
-            counter = int(counter)
-            self.base_counter = int(counter)
+                simulation_results = None
+            if simulation_results is None:
+                half = len(group) // 2
+                groups += [group[half:], group[:half]]
+            else:
+                simulated.update(zip(group, simulation_results))
+        return simulated, sorted(isolated)
+
+    def get_cached_estimate(self, payment_item, protocol):
+        if self.estimate_cache is None:
+            return None
+        destination = payment_item.paymentaddress
+        estimate = self.estimate_cache.get(protocol, destination)
+        if estimate is None:
+            return None
+        logger.debug("Using cached gas estimate for {}".format(destination))
+        gas, storage = estimate["gas"], estimate["storage"]
+        tx_fee = self.calculate_contract_fee(
+            payment_item, payment_item.adjusted_amount, gas, storage
+        )
+        return PaymentStatus.DONE, (gas, tx_fee, storage)
+
+    def simulate_operations(self, payment_items, branch, chain_id, protocol):
+        """
+        Simulates the payouts to contracts of the batch. Destinations with an
+        estimate in the cache are not simulated. The others are simulated in
+        operation groups if GROUP_SIMULATION is set, then those left one by one
+        concurrently, with at most MAX_SIMULATION_WORKERS simulations in flight.
+        New estimates are stored in the cache.
+        :return: list aligned with payment_items, holding the simulation status
+        and results of every KT address, or the error raised by its simulation,
+        and None for the other addresses, and the positions of the addresses
+        whose results come from the cache
+        """
+        simulations = [None] * len(payment_items)
+        simulated, cached = [], []
+        for i, payment_item in enumerate(payment_items):
+            if not payment_item.paymentaddress.startswith("KT"):
+                continue
+            try:
+                simulations[i] = self.get_cached_estimate(payment_item, protocol)
+            except Exception as e:
+                simulations[i] = e
+                continue
+            if simulations[i] is None:
+                simulated.append(i)
+            else:
+                cached.append(i)
+
+        pending = simulated
+        if GROUP_SIMULATION and len(pending) > 1:
+            group_results, isolated = self.simulate_operation_group(
+                [payment_items[i] for i in pending], branch, chain_id
+            )
+            for position, simulation_results in group_results.items():
+                simulations[pending[position]] = PaymentStatus.DONE, simulation_results
+            pending = [pending[position] for position in isolated]
+
+        if pending:
+            with ThreadPoolExecutor(
+                max_workers=min(MAX_SIMULATION_WORKERS, len(pending)),
+                thread_name_prefix="simulation",
+            ) as executor:
+                futures = {
+                    i: executor.submit(
+                        self.simulate_single_operation,
+                        payment_items[i],
+                        payment_items[i].adjusted_amount,
+                        branch,
+                        chain_id,
+                    )
+                    for i in pending
+                }
+            for i, future in futures.items():
+                simulations[i] = future.exception() or future.result()
+
+        if self.estimate_cache is not None:
+            for i in simulated:
+                if isinstance(simulations[i], Exception):
+                    continue
+                simulation_status, simulation_results = simulations[i]
+                if simulation_status.is_done():
+                    gas, tx_fee, storage = simulation_results
+                    self.estimate_cache.put(
+                        protocol, payment_items[i].paymentaddress, gas, storage, tx_fee
+                    )
+        return simulations, cached
+
+    def drop_estimates(self, batch_items):
+        """The next attempt simulates the contracts of a batch failing validation again."""
+        if self.estimate_cache is not None:
+            self.estimate_cache.drop(
+                [
+                    payment_item.paymentaddress
+                    for payment_item in batch_items
+                    if payment_item.paymentaddress.startswith("KT")
+                ]
+            )
+
+    def run_batch_operations(self, branch, chain_id, contents, positions, base_counter):
+        """
+        Runs the contents at the given positions in one run_operation, with
+        the counters following base_counter.
+        :return: the error of every content, None for those not failed, or
+        None if the node reports an error of the whole group
+        """
+        group_contents = [contents[position] for position in positions]
+        for i, content in enumerate(group_contents):
+            content.set_counter(base_counter + 1 + i)
+        runops_json = OperationGroup(branch, group_contents).run_operation_json(
+            chain_id
+        )
+        status, run_ops_parsed = self.clnt_mngr.request_url_post(
+            self.comm_runops, runops_json
+        )
+        if status != HTTPStatus.OK:
+            logger.debug(
+                "Run of {} operations failed with status {}".format(
+                    len(positions), status
+                )
+            )
+            return None
+
+        # Check each contents object for failure, the contents applied before
+        # a failed one are backtracked and those after it skipped
+        errors = []
+        for op in run_ops_parsed["contents"]:
+            # https://docs.python.org/3/glossary.html#term-eafp
+            try:
+                operation_result = op["metadata"]["operation_result"]
+                if operation_result["status"] == "failed":
+                    errors.append(operation_result["errors"][0]["id"])
+                    continue
+            except KeyError:
+                logger.debug(
+                    "Unable to find metadata->operation_result->{status,errors} in run_ops response"
+                )
+            errors.append(None)
+        return errors
+
+    def find_failed_contents(self, branch, chain_id, contents, base_counter):
+        """
+        Finds the contents of a batch failing validation. Failed contents
+        reported by the node are taken out and the others are run again. A
+        group the node only reports an error for is split in halves until the
+        failing contents are isolated.
+        :return: the error of every failing content by position, empty if the
+        batch is valid, or None if it fails and no content can be blamed
+        """
+        failed = {}
+        groups = [list(range(len(contents)))]
+        batch_failed = answered = False
+        first_run = True
+        while groups:
+            group = groups.pop()
+            errors = self.run_batch_operations(
+                branch, chain_id, contents, group, base_counter
+            )
+            if errors is None:
+                batch_failed = batch_failed or first_run
+                if len(group) > 1:
+                    half = len(group) // 2
+                    groups += [group[half:], group[:half]]
+                elif not first_run:
+                    failed[group[0]] = "Error in run_operation"
+            else:
+                answered = True
+                failing = {
+                    position: error
+                    for position, error in zip(group, errors)
+                    if error is not None
+                }
+                failed.update(failing)
+                group = [position for position in group if position not in failing]
+                if failing and group:
+                    groups.append(group)
+            first_run = False
+        # the node refusing every group points to the batch, not to its contents
+        if batch_failed and not (failed and answered):
+            return None
+        return failed
+
+    def forge(self, operation_group):
+        """
+        Forges the operations locally. The node forges them if they cannot be
+        forged locally, and also when the forge check is enabled, in which case
+        its bytes are used if both differ.
+        :return: status and hex string of the forged bytes, as returned by the node
+        """
+        try:
+            forged = operation_group.forge()
+        except ValueError as e:
+            logger.debug("Operations are forged by the node: {}".format(e))
+            return self.clnt_mngr.request_url_post(
+                self.comm_forge, operation_group.forge_json()
+            )
+
+        if not is_forge_check_enabled():
+            return HTTPStatus.OK, forged
+
+        status, node_forged = self.clnt_mngr.request_url_post(
+            self.comm_forge, operation_group.forge_json()
+        )
+        if status == HTTPStatus.OK and node_forged != forged:
+            logger.error(
+                "Locally forged operations differ from the node, using the bytes of the node"
+            )
+            verbose_logger.debug(
+                "Local forge: %s, node forge: %s", forged, LazyPayload(node_forged)
+            )
+        return status, node_forged
+
+    @staticmethod
+    def set_fee_breakdowns(batch_items, contents):
+        """
+        Splits the required fee of the batch over its operations for the payment
+        report. The first operation carries the minimal fee and the branch and
+        signature bytes, shared by the whole batch.
+        """
+        base_fee = MINIMUM_FEE_MUTEZ + MUTEZ_PER_BYTE * (
+            BRANCH_SIZE + SIGNATURE_BYTES_SIZE
+        )
+        for i, (payment_item, content) in enumerate(zip(batch_items, contents)):
+            payment_item.fee_breakdown = FeeBreakdown(
+                fee=content.fee,
+                gas_fee=math.ceil(MUTEZ_PER_GAS_UNIT * content.gas_limit),
+                size_fee=MUTEZ_PER_BYTE * forged_content_size(content.to_dict()),
+                base_fee=base_fee if i == 0 else 0,
+            )
+
+    def adjust_batch_fee(self, contents, batch_items, total_gas, total_tx_fees):
+        """
+        Raises the fee of the first content if the fees of the batch do not cover
+        its minimal required fee, the difference is paid by the delegate.
+        :return: the fees of the batch and the size of the signed operations
+        :raise ValueError: if the size of the operations cannot be computed
+        """
+        # Compute the minimal required fee of the batch from the exact size of the forged operations
+        size = SIGNATURE_BYTES_SIZE + forged_size(
+            content.to_dict() for content in contents
+        )
+        required_fee = calculate_required_fee(total_gas, size)
+        logger.info(
+            f"minimal required fee is {required_fee}, current used fee is {total_tx_fees}"
+        )
+        # If all fees are computed correctly above, the required fee is already covered.
+        # Otherwise the difference is added to the fee of the first transaction, this works
+        # because the Tezos blockchain is interested in the sum of all fees in a batch transaction
+        # and not in the individual fees of each transaction. The larger fee may need one more
+        # byte, which the minimal fee takes into account.
+        if total_tx_fees < required_fee:
+            first_fee = contents[0].fee
+            adjusted_fee = calculate_minimal_fee(
+                total_gas,
+                size - nat_size(first_fee),
+                other_fees=total_tx_fees - first_fee,
+                fee=first_fee,
+            )
+            difference_fees = adjusted_fee - first_fee
+            contents[0].set_fee(adjusted_fee)
+            # We do not want to adjust the content (payment amount) anymore and let the delegate pay this fee
+            batch_items[0].delegate_transaction_fee += difference_fees
+
+            total_tx_fees += difference_fees
+            size += nat_size(adjusted_fee) - nat_size(first_fee)
+            logger.info(
+                f"minimal required fee is {calculate_required_fee(total_gas, size)}, current used fee is {total_tx_fees}"
+            )
+        return total_tx_fees, size
+
+    def attempt_single_batch(
+        self, payment_items, op_counter, dry_run=None, prepared_batch=None
+    ):
+        """
+        Pays the items in one batch: prepares it, unless it was prepared ahead,
+        then submits it.
+        :return: payment status, operation hash and error message
+        """
+        if prepared_batch is None:
+            prepared_batch = self.prepare_batch(payment_items, op_counter)
+        return self.submit_batch(prepared_batch, op_counter, dry_run=dry_run)
+
+    def prepare_batch(self, payment_items, op_counter):
+        """
+        Simulates the payouts and sets their fees and limits. The counters are
+        left out of the contents and set by submit_batch, so that a batch can be
+        prepared while the previous one is waiting for inclusion.
+        :param op_counter: read from the node if not set, the counter is used
+        for the simulations only
+        """
+        if not op_counter.get():
+            self.base_counter = self.get_counter()
             op_counter.set(self.base_counter)
         _, head = self.clnt_mngr.request_url(self.comm_payment_head)
         branch = head["hash"]
@@ -547,12 +1209,21 @@ class BatchPayer:
             )
         )
 
-        content_list = []
+        contents = []
+        batch_items = []
 
-        total_gas = total_tx_fees = total_burn_fees = 0
+        total_gas = total_tx_fees = 0
 
-        for payment_item in payment_items:
+        simulations, cached = self.simulate_operations(
+            payment_items, branch, chain_id, protocol
+        )
+        cached_items = [payment_items[i] for i in cached]
+
+        for payment_item, simulation in zip(payment_items, simulations):
             pymnt_amnt = payment_item.adjusted_amount  # expected in micro tez
+            # fees are set again when a batch is prepared again
+            payment_item.delegator_transaction_fee = 0
+            payment_item.delegate_transaction_fee = 0
 
             # Get initial default values for storage, gas and fees
             # These default values are used for non-empty tz1 accounts transactions
@@ -566,12 +1237,9 @@ class BatchPayer:
             # TRD extension for non scriptless contract accounts
             if payment_item.paymentaddress.startswith("KT"):
                 try:
-                    (
-                        simulation_status,
-                        simulation_results,
-                    ) = self.simulate_single_operation(
-                        payment_item, pymnt_amnt, branch, chain_id
-                    )
+                    if isinstance(simulation, Exception):
+                        raise simulation
+                    simulation_status, simulation_results = simulation
 
                 except Exception as e:
                     logger.info(
@@ -707,120 +1375,146 @@ class BatchPayer:
             else:
                 logger.debug(message)
 
-            op_counter.inc()
-
             total_gas += int(gas_limit)
-            total_burn_fees += int(burn_fee)
             total_tx_fees += int(tx_fee)
 
-            content = (
-                CONTENT.replace("%SOURCE%", self.source)
-                .replace("%DESTINATION%", payment_item.paymentaddress)
-                .replace("%AMOUNT%", str(pymnt_amnt))
-                .replace("%COUNTER%", str(op_counter.get()))
-                .replace("%fee%", str(tx_fee))
-                .replace("%gas_limit%", str(gas_limit))
-                .replace("%storage_limit%", str(storage_limit))
+            # the counter is set on submission
+            content = Transaction(
+                self.source,
+                payment_item.paymentaddress,
+                pymnt_amnt,
+                tx_fee,
+                gas_limit,
+                storage_limit,
             )
 
-            content_list.append(content)
+            contents.append(content)
+            batch_items.append(payment_item)
+
+        return PreparedBatch(
+            branch,
+            chain_id,
+            protocol,
+            batch_items,
+            contents,
+            total_gas,
+            total_tx_fees,
+            estimated_items=[
+                payment_item
+                for payment_item in cached_items
+                if payment_item in batch_items
+            ],
+        )
 
-            verbose_logger.info("Payment content: {}".format(content))
-        if len(content_list) == 0:
+    def submit_batch(self, prepared_batch, op_counter, dry_run=None):
+        """
+        Sets the counters of a prepared batch following op_counter, read from
+        the node if not set, then runs, forges, signs, preapplies and injects it
+        and waits for its inclusion.
+        :return: payment status, operation hash and error message
+        """
+        if not prepared_batch.batch_items:
             return PaymentStatus.DONE, None, ""
-        contents_string = ",".join(content_list)
+        if not op_counter.get():
+            op_counter.set(self.get_counter())
+
+        branch = prepared_batch.branch
+        chain_id = prepared_batch.chain_id
+        protocol = prepared_batch.protocol
+        batch_items = list(prepared_batch.batch_items)
+        contents = list(prepared_batch.contents)
+        total_gas = prepared_batch.total_gas
+        total_tx_fees = prepared_batch.total_tx_fees
+        estimated = {
+            id(payment_item) for payment_item in prepared_batch.estimated_items
+        }
+        prepared_batch.deferred_items = []
+
+        # run the operations for simulation results, the payouts failing
+        # validation are left out and the others are paid in this attempt.
+        # Payouts priced from an estimate are left for a new simulation, those
+        # failing without one fail.
+        while True:
+            logger.debug("Running {} operations".format(len(contents)))
+            failed = self.find_failed_contents(
+                branch, chain_id, contents, op_counter.get()
+            )
+            if failed is None:
+                error_message = "Error in run_operation"
+                logger.error(error_message)
+                return PaymentStatus.FAIL, None, error_message
+            if not failed:
+                break
 
-        # run the operations for simulation results
-        logger.debug("Running {} operations".format(len(content_list)))
-        runops_json = RUNOPS_JSON.replace("%BRANCH%", branch).replace(
-            "%CONTENT%", contents_string
-        )
-        runops_json = JSON_WRAP.replace("%JSON%", runops_json).replace(
-            "%chain_id%", chain_id
-        )
+            failed_items = [batch_items[position] for position in failed]
+            self.drop_estimates(failed_items)
+            for position, op_error in failed.items():
+                payment_item = batch_items[position]
+                total_gas -= contents[position].gas_limit
+                total_tx_fees -= contents[position].fee
+                error_message = "Error while validating operation - Status: failed, Message: {}".format(
+                    op_error
+                )
+                payment_item.delegator_transaction_fee = 0
+                payment_item.delegate_transaction_fee = 0
+                if id(payment_item) in estimated:
+                    logger.warning(
+                        "Payment to {} is left out of the batch and simulated again, its estimate is outdated. {}".format(
+                            payment_item.paymentaddress, error_message
+                        )
+                    )
+                    prepared_batch.deferred_items.append(payment_item)
+                    continue
+                logger.error(
+                    "Payment to {} is left out of the batch. {}".format(
+                        payment_item.paymentaddress, error_message
+                    )
+                )
+                payment_item.paid = PaymentStatus.FAIL
+                payment_item.desc += error_message + ". "
+            batch_items = [
+                payment_item
+                for position, payment_item in enumerate(batch_items)
+                if position not in failed
+            ]
+            contents = [
+                content
+                for position, content in enumerate(contents)
+                if position not in failed
+            ]
+            if not batch_items:
+                return PaymentStatus.FAIL, None, error_message
 
-        status, run_ops_parsed = self.clnt_mngr.request_url_post(
-            self.comm_runops, runops_json
-        )
-        if status != HTTPStatus.OK:
-            error_message = "Error in run_operation"
+        # the counters are those of the last run, the encoded contents are
+        # reused for the forge and the preapply
+        for content in contents:
+            op_counter.inc()
+            content.set_counter(op_counter.get())
+            verbose_logger.info("Payment content: %s", LazyPayload(content.to_dict()))
+        operation_group = OperationGroup(branch, contents)
+
+        try:
+            total_tx_fees, size = self.adjust_batch_fee(
+                contents, batch_items, total_gas, total_tx_fees
+            )
+        except ValueError as e:
+            error_message = "Size of the operations cannot be computed: {}".format(e)
             logger.error(error_message)
             return PaymentStatus.FAIL, None, error_message
-
-        # Check each contents object for failure
-        for op in run_ops_parsed["contents"]:
-            # https://docs.python.org/3/glossary.html#term-eafp
-            try:
-                op_status = op["metadata"]["operation_result"]["status"]
-                if op_status == "failed":
-                    op_error = op["metadata"]["operation_result"]["errors"][0]["id"]
-                    error_message = "Error while validating operation - Status: {}, Message: {}".format(
-                        op_status, op_error
-                    )
-                    logger.error(error_message)
-                    return PaymentStatus.FAIL, None, error_message
-            except KeyError:
-                logger.debug(
-                    "Unable to find metadata->operation_result->{status,errors} in run_ops response"
-                )
+        self.set_fee_breakdowns(batch_items, contents)
 
         # forge the operations
-        logger.debug("Forging {} operations".format(len(content_list)))
-        forge_json = FORGE_JSON.replace("%BRANCH%", branch).replace(
-            "%CONTENT%", contents_string
-        )
-        status, bytes = self.clnt_mngr.request_url_post(self.comm_forge, forge_json)
+        logger.debug("Forging {} operations".format(len(contents)))
+        status, bytes = self.forge(operation_group)
         if status != HTTPStatus.OK:
             error_message = "Error in forge operation"
             logger.error(error_message)
             return PaymentStatus.FAIL, None, error_message
-
-        # Re-compute minimal required fee by the batch transaction and re-adjust the fee if necessary
-        size = SIGNATURE_BYTES_SIZE + len(bytes) / 2
-        required_fee = math.ceil(
-            MINIMUM_FEE_MUTEZ + MUTEZ_PER_GAS_UNIT * total_gas + MUTEZ_PER_BYTE * size
-        )
-        logger.info(
-            f"minimal required fee is {required_fee}, current used fee is {total_tx_fees}"
-        )
-        # TODO: This should be a function to be more modular as it is called twice
-        # If all fees are computed correctly above, the condition of this loop should not be True
-        # It is still recommended to leave this block here in order to double-check that all fee calculations
-        # were verified and that in the worst case any tiny differences in fee computations are adjusted
-        while total_tx_fees < required_fee:
-            # The difference in fees will be added to the fee of the first transaction
-            # This works because the Tezos blockchain is interested in the sum of all fees in a batch transaction
-            # and not in the individual fees of each transaction
-            difference_fees = math.ceil(required_fee - total_tx_fees)
-            first_tx = json.loads(content_list[0])
-            first_tx["fee"] = str(int(first_tx["fee"]) + difference_fees)
-            # We do not want to adjust the content (payment amount) anymore and let the delegate pay this fee
-            # TODO: Log info in description?
-            payment_items[0].delegate_transaction_fee += difference_fees
-
-            # Re-adjust the contents according to the new fee
-            total_tx_fees = required_fee
-            content_list[0] = json.dumps(first_tx)
-            contents_string = ",".join(content_list)
-            forge_json = FORGE_JSON.replace("%BRANCH%", branch).replace(
-                "%CONTENT%", contents_string
-            )
-            status, bytes = self.clnt_mngr.request_url_post(self.comm_forge, forge_json)
-            if status != HTTPStatus.OK:
-                error_message = "Error in forge operation"
-                logger.error(error_message)
-                return PaymentStatus.FAIL, None, error_message
-
-            # Compute the new required fee. It is possible that the size of the transaction in bytes is now higher
-            # because of the increase in the fee of the first transaction
-            size = SIGNATURE_BYTES_SIZE + len(bytes) / 2
-            required_fee = math.ceil(
-                MINIMUM_FEE_MUTEZ
-                + MUTEZ_PER_GAS_UNIT * total_gas
-                + MUTEZ_PER_BYTE * size
-            )
-            logger.info(
-                f"minimal required fee is {required_fee}, current used fee is {total_tx_fees}"
+        if len(bytes) != 2 * (size - SIGNATURE_BYTES_SIZE):
+            logger.warning(
+                "Forged operations are {} bytes long, {} bytes were expected".format(
+                    len(bytes) // 2, size - SIGNATURE_BYTES_SIZE
+                )
             )
 
         # Sign the batch transaction
@@ -828,12 +1522,7 @@ class BatchPayer:
 
         # pre-apply operations
         logger.debug("Preapplying the operations")
-        preapply_json = (
-            PREAPPLY_JSON.replace("%BRANCH%", branch)
-            .replace("%CONTENT%", contents_string)
-            .replace("%PROTOCOL%", protocol)
-            .replace("%SIGNATURE%", signed_bytes)
-        )
+        preapply_json = operation_group.preapply_json(protocol, signed_bytes)
 
         # if verbose: print("--> preapply_command_str is |{}|".format(preapply_command_str))
 
@@ -850,7 +1539,7 @@ class BatchPayer:
             return PaymentStatus.DONE, None, ""
 
         # inject the operations
-        logger.debug("Injecting {} operations".format(len(content_list)))
+        logger.debug("Injecting {} operations".format(len(contents)))
         decoded = base58.b58decode(signed_bytes).hex()
 
         if signed_bytes.startswith("edsig"):  # edsig signature
@@ -882,17 +1571,42 @@ class BatchPayer:
 
         signed_operation_bytes = bytes + decoded_signature
 
+        # The hash is known before injection and kept with the payment items, so that
+        # the fate of the operation can be checked whatever happens to the injection
+        try:
+            operation_hash = calculate_operation_hash(signed_operation_bytes)
+        except ValueError:
+            logger.warning("Operation hash could not be computed before injection")
+            operation_hash = None
+        for payment_item in batch_items:
+            payment_item.hash = operation_hash
+
         _, head = self.clnt_mngr.request_url(self.comm_head)
         last_level_before_injection = head["header"]["level"]
 
-        status, operation_hash = self.clnt_mngr.request_url_post(
+        status, injected_hash = self.clnt_mngr.request_url_post(
             self.comm_inject, json.dumps(signed_operation_bytes)
         )
         if status != HTTPStatus.OK:
             error_message = "Error in inject operation"
             logger.error(error_message)
-            return PaymentStatus.FAIL, None, error_message
+            if operation_hash is None:
+                return PaymentStatus.FAIL, None, error_message
+            # The node may have received the operation anyway. Only look for the
+            # known hash, a new batch would risk paying twice if it were included.
+            return self.check_failed_injection(
+                operation_hash, last_level_before_injection, error_message
+            )
 
+        if operation_hash is None:
+            operation_hash = injected_hash
+        elif injected_hash != operation_hash:
+            logger.warning(
+                "Node returned operation hash {}, {} was computed".format(
+                    injected_hash, operation_hash
+                )
+            )
+            operation_hash = injected_hash
         logger.info("Operation hash is {}".format(operation_hash))
 
         # wait for inclusion
@@ -906,30 +1620,24 @@ class BatchPayer:
                 operation_hash, timeout
             )
         )
-        for i in range(
-            last_level_before_injection + 1,
-            last_level_before_injection + 1 + MAX_BLOCKS_TO_CHECK_AFTER_INJECTION,
-        ):
-            cmd = self.comm_wait.replace("%BLOCK_HASH%", str(i))
-            status = -1
-            list_op_hash = []
-            trial_i = 0
-            while status != HTTPStatus.OK and (trial_i < MAX_NUM_TRIALS_PER_BLOCK):
-                sleep(self.network_config["MINIMAL_BLOCK_DELAY"])
-                status, list_op_hash = self.clnt_mngr.request_url(cmd)
-                trial_i += 1
-            if status != HTTPStatus.OK:
-                logger.warning(
-                    "Level {} could not be queried about operation hashes".format(i)
-                )
-                break
-            for op_hashes in list_op_hash:
-                if operation_hash in op_hashes:
-                    logger.info("Operation {} is included".format(operation_hash))
-                    return PaymentStatus.PAID, operation_hash, ""
-            logger.debug(
-                "Operation {} is not included at level {}".format(operation_hash, i)
+        inclusion_status, errors = self.wait_for_inclusion(
+            operation_hash, last_level_before_injection
+        )
+        if inclusion_status == InclusionStatus.INCLUDED:
+            return PaymentStatus.PAID, operation_hash, ""
+        if inclusion_status == InclusionStatus.REFUSED:
+            error_message = "Operation {} was refused by the node: {}".format(
+                operation_hash, errors
+            )
+            logger.error(error_message)
+            return PaymentStatus.FAIL, operation_hash, error_message
+        if inclusion_status == InclusionStatus.BRANCH_DELAYED:
+            error_message = "Operation {} is branch delayed or branch refused by the node: {}, it may still be included. Investigate on https://tzkt.io".format(
+                operation_hash, errors
             )
+            logger.warning(error_message)
+            return PaymentStatus.INJECTED, operation_hash, error_message
+
         error_message = (
             "Investigate on https://tzkt.io - Operation {} wait is timed out.".format(
                 operation_hash
@@ -938,6 +1646,73 @@ class BatchPayer:
         logger.warning(error_message)
         return PaymentStatus.INJECTED, operation_hash, error_message
 
+    def check_failed_injection(
+        self, operation_hash, last_level_before_injection, error_message
+    ):
+        """
+        Waits for an operation whose injection failed, in case it reached the node.
+        The batch is paid if it is included. Otherwise it fails and can be built
+        again: the new batch reuses the counter of this operation, so at most one
+        of them can be included.
+        """
+        logger.info(
+            "Looking for operation {} in case it was injected".format(operation_hash)
+        )
+        inclusion_status, errors = self.wait_for_inclusion(
+            operation_hash, last_level_before_injection
+        )
+        if inclusion_status == InclusionStatus.INCLUDED:
+            logger.info(
+                "Operation {} is included despite the injection error".format(
+                    operation_hash
+                )
+            )
+            return PaymentStatus.PAID, operation_hash, ""
+        if inclusion_status == InclusionStatus.REFUSED:
+            error_message += ", operation {} was refused by the node: {}".format(
+                operation_hash, errors
+            )
+        return PaymentStatus.FAIL, operation_hash, error_message
+
+    def wait_for_inclusion(self, operation_hash, last_level_before_injection):
+        """
+        Wait until the operation is included, refused or not seen in
+        MAX_BLOCKS_TO_CHECK_AFTER_INJECTION levels after injection.
+        :return: the InclusionStatus and the errors reported by the node
+        """
+        block_delay = self.network_config["MINIMAL_BLOCK_DELAY"]
+        inclusion_tracker = self.clnt_mngr.get_inclusion_tracker()
+        inclusion_tracker.track(operation_hash, last_level_before_injection)
+        failed_checks = 0
+        try:
+            for _ in range(
+                MAX_BLOCKS_TO_CHECK_AFTER_INJECTION * MAX_NUM_TRIALS_PER_BLOCK
+            ):
+                if inclusion_tracker.is_streaming():
+                    # new heads are checked as soon as the node streams them
+                    inclusion_tracker.wait(operation_hash, timeout=block_delay)
+                else:
+                    sleep(block_delay)
+                    if inclusion_tracker.check():
+                        failed_checks = 0
+                    else:
+                        failed_checks += 1
+                if inclusion_tracker.get_status(operation_hash).is_resolved():
+                    break
+                if failed_checks == MAX_NUM_TRIALS_PER_BLOCK:
+                    logger.warning(
+                        "The node could not be queried about operation {}".format(
+                            operation_hash
+                        )
+                    )
+                    break
+            return (
+                inclusion_tracker.get_status(operation_hash),
+                inclusion_tracker.get_errors(operation_hash),
+            )
+        finally:
+            inclusion_tracker.forget(operation_hash)
+
     def get_payment_address_balance(self):
         get_current_balance_request = COMM_DELEGATE_BALANCE.format("head", self.source)
         status, payment_address_balance = self.clnt_mngr.request_url(
@@ -955,6 +1730,33 @@ class BatchPayer:
         return int(payment_address_balance)
 
 
+class PreparedBatch:
+    """Contents of a batch without their counters, with the payment items they pay."""
+
+    def __init__(
+        self,
+        branch,
+        chain_id,
+        protocol,
+        batch_items,
+        contents,
+        total_gas,
+        total_tx_fees,
+        estimated_items=None,
+    ):
+        self.branch = branch
+        self.chain_id = chain_id
+        self.protocol = protocol
+        self.batch_items = batch_items
+        self.contents = contents
+        self.total_gas = total_gas
+        self.total_tx_fees = total_tx_fees
+        # items priced from an estimate, which are simulated again if it fails
+        self.estimated_items = estimated_items or []
+        # estimated items left out of the submission, to be simulated again
+        self.deferred_items = []
+
+
 class OpCounter:
     def __init__(self) -> None:
         super().__init__()
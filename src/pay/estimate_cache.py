@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+from log_config import main_logger
+
+logger = main_logger.getChild("estimate_cache")
+
+ESTIMATES_FILE = "gas_estimates.json"
+ESTIMATE_MAX_AGE_DAYS = 30
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Default cache, set up once the base directory is known
+estimate_cache = None
+
+
+class GasEstimateCache:
+    """
+    On-disk cache of the simulated gas and storage of payouts to contracts.
+
+    Entries are keyed by destination. All entries belong to the protocol they
+    were simulated with and are dropped when another protocol is seen. The
+    batch run_operation verifies the estimates, the payer drops those of a
+    batch which does not pass it.
+    """
+
+    def __init__(self, cache_dir, max_age_days=ESTIMATE_MAX_AGE_DAYS):
+        self.path = os.path.join(cache_dir, ESTIMATES_FILE)
+        self.max_age_seconds = max_age_days * SECONDS_PER_DAY
+        self._lock = threading.Lock()
+        self._protocol = None
+        self._estimates = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def get(self, protocol, destination):
+        """
+        Returns the estimate {"gas", "storage", "fee", "time"} of the destination
+        or None if there is none for this protocol or it is expired.
+        """
+        with self._lock:
+            if protocol != self._protocol:
+                return None
+            estimate = self._estimates.get(destination)
+            if estimate is None:
+                return None
+            if time.time() - estimate["time"] > self.max_age_seconds:
+                return None
+            return estimate
+
+    def peek(self, destination):
+        """
+        Returns the estimate of the destination whatever its protocol, only
+        good enough to plan the payouts before they are simulated.
+        """
+        with self._lock:
+            return self._estimates.get(destination)
+
+    def put(self, protocol, destination, gas, storage, fee):
+        estimate = {
+            "gas": int(gas),
+            "storage": int(storage),
+            "fee": int(fee),
+            "time": int(time.time()),
+        }
+        with self._lock:
+            if protocol != self._protocol:
+                if self._estimates:
+                    logger.info(
+                        "Protocol changed to {}, dropping {} gas estimates".format(
+                            protocol, len(self._estimates)
+                        )
+                    )
+                self._protocol = protocol
+                self._estimates = {}
+            self._estimates[destination] = estimate
+            self._save()
+
+    def drop(self, destinations):
+        with self._lock:
+            dropped = [
+                destination
+                for destination in destinations
+                if self._estimates.pop(destination, None) is not None
+            ]
+            if dropped:
+                logger.debug("Dropping gas estimates of {}".format(dropped))
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                content = json.load(f)
+            self._protocol = content["protocol"]
+            self._estimates = content["estimates"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Dropping unreadable gas estimates: {}".format(e))
+
+    def _save(self):
+        content = {"protocol": self._protocol, "estimates": self._estimates}
+        tmp_path = "{}.{}.tmp".format(self.path, threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump(content, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def init_estimate_cache(cache_dir, **kwargs):
+    global estimate_cache
+    estimate_cache = GasEstimateCache(cache_dir, **kwargs)
+    return estimate_cache
+
+
+def get_estimate_cache():
+    return estimate_cache
@@ -0,0 +1,222 @@
+import base58
+from hashlib import blake2b
+
+# base58check prefixes of the encoded values, as bytes before the payload
+BRANCH_PREFIX = bytes.fromhex("0134")
+OPERATION_HASH_PREFIX = bytes.fromhex("0574")
+ORIGINATED_PREFIX = bytes.fromhex("025a79")
+IMPLICIT_PREFIXES = {
+    "tz1": (bytes.fromhex("06a19f"), b"\x00"),
+    "tz2": (bytes.fromhex("06a1a1"), b"\x01"),
+    "tz3": (bytes.fromhex("06a1a4"), b"\x02"),
+    "tz4": (bytes.fromhex("06a1a6"), b"\x03"),
+}
+PUBLIC_KEY_PREFIXES = {
+    "edpk": (bytes.fromhex("0d0f25d9"), b"\x00", 32),
+    "sppk": (bytes.fromhex("03fee256"), b"\x01", 33),
+    "p2pk": (bytes.fromhex("03b28b7f"), b"\x02", 33),
+}
+BRANCH_SIZE = 32
+OPERATION_HASH_SIZE = 32
+PUBLIC_KEY_HASH_SIZE = 20
+# sizes of the forged values, tags and padding included
+FORGED_TAG_SIZE = 1
+FORGED_PUBLIC_KEY_HASH_SIZE = 1 + PUBLIC_KEY_HASH_SIZE
+FORGED_CONTRACT_SIZE = 1 + PUBLIC_KEY_HASH_SIZE + 1
+FORGED_NO_PARAMETERS_SIZE = 1
+
+OPERATION_TAGS = {"reveal": b"\x6b", "transaction": b"\x6c"}
+CONTRACT_IMPLICIT = b"\x00"
+CONTRACT_ORIGINATED = b"\x01"
+CONTRACT_PADDING = b"\x00"
+NO_PARAMETERS = b"\x00"
+
+# Also forge with the node and compare, the bytes of the node are used on a mismatch
+forge_check = False
+
+
+def set_forge_check(enabled):
+    global forge_check
+    forge_check = bool(enabled)
+
+
+def is_forge_check_enabled():
+    return forge_check
+
+
+def b58decode_prefixed(value, prefix, size):
+    try:
+        decoded = base58.b58decode_check(value)
+    except ValueError as e:
+        raise ValueError("Invalid base58 value {}: {}".format(value, e))
+    if not decoded.startswith(prefix) or len(decoded) != len(prefix) + size:
+        raise ValueError("Unexpected prefix or length of {}".format(value))
+    return decoded[len(prefix) :]
+
+
+def forge_nat(value):
+    """Zarith encoding of a natural number, 7 bits per byte, least significant first."""
+    value = int(value)
+    if value < 0:
+        raise ValueError(
+            "Negative value {} cannot be forged as a natural".format(value)
+        )
+    forged = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            forged.append(byte | 0x80)
+        else:
+            forged.append(byte)
+            return bytes(forged)
+
+
+def nat_size(value):
+    """Number of bytes of the zarith encoding of a natural number."""
+    value = int(value)
+    if value < 0:
+        raise ValueError(
+            "Negative value {} cannot be forged as a natural".format(value)
+        )
+    return max(1, (value.bit_length() + 6) // 7)
+
+
+def forge_branch(branch):
+    return b58decode_prefixed(branch, BRANCH_PREFIX, BRANCH_SIZE)
+
+
+def forge_public_key_hash(address):
+    if address[:3] not in IMPLICIT_PREFIXES:
+        raise ValueError("{} is not an implicit account".format(address))
+    prefix, tag = IMPLICIT_PREFIXES[address[:3]]
+    return tag + b58decode_prefixed(address, prefix, PUBLIC_KEY_HASH_SIZE)
+
+
+def forge_contract(address):
+    if address.startswith("KT1"):
+        return (
+            CONTRACT_ORIGINATED
+            + b58decode_prefixed(address, ORIGINATED_PREFIX, PUBLIC_KEY_HASH_SIZE)
+            + CONTRACT_PADDING
+        )
+    return CONTRACT_IMPLICIT + forge_public_key_hash(address)
+
+
+def forge_public_key(public_key):
+    if public_key[:4] not in PUBLIC_KEY_PREFIXES:
+        raise ValueError("Public key {} is not supported".format(public_key))
+    prefix, tag, size = PUBLIC_KEY_PREFIXES[public_key[:4]]
+    return tag + b58decode_prefixed(public_key, prefix, size)
+
+
+def forge_manager_fields(content):
+    return (
+        forge_public_key_hash(content["source"])
+        + forge_nat(content["fee"])
+        + forge_nat(content["counter"])
+        + forge_nat(content["gas_limit"])
+        + forge_nat(content["storage_limit"])
+    )
+
+
+def forge_transaction(content):
+    if "parameters" in content:
+        raise ValueError("Transactions with parameters are not supported")
+    return (
+        OPERATION_TAGS["transaction"]
+        + forge_manager_fields(content)
+        + forge_nat(content["amount"])
+        + forge_contract(content["destination"])
+        + NO_PARAMETERS
+    )
+
+
+def forge_reveal(content):
+    return (
+        OPERATION_TAGS["reveal"]
+        + forge_manager_fields(content)
+        + forge_public_key(content["public_key"])
+    )
+
+
+def forge_content(content):
+    kind = content.get("kind")
+    if kind == "transaction":
+        return forge_transaction(content)
+    if kind == "reveal":
+        return forge_reveal(content)
+    raise ValueError("Operations of kind {} are not supported".format(kind))
+
+
+def forge_operation_group(branch, contents):
+    """
+    Forges the unsigned bytes of an operation group the way the node does on
+    /helpers/forge/operations, for transactions without parameters and reveals.
+    :param contents: list of operation contents as sent to the node
+    :return: hex string of the forged bytes
+    :raise ValueError: if a content or value cannot be forged locally
+    """
+    try:
+        forged = forge_branch(branch) + b"".join(
+            forge_content(content) for content in contents
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError("Malformed operation content: {}".format(e))
+    return forged.hex()
+
+
+def forged_content_size(content):
+    """
+    Size in bytes of the forged content, computed from its fields without
+    forging it. Equal to the size of forge_content(content).
+    """
+    kind = content.get("kind")
+    if kind not in OPERATION_TAGS:
+        raise ValueError("Operations of kind {} are not supported".format(kind))
+    if content["source"][:3] not in IMPLICIT_PREFIXES:
+        raise ValueError("{} is not an implicit account".format(content["source"]))
+    size = (
+        FORGED_TAG_SIZE
+        + FORGED_PUBLIC_KEY_HASH_SIZE
+        + nat_size(content["fee"])
+        + nat_size(content["counter"])
+        + nat_size(content["gas_limit"])
+        + nat_size(content["storage_limit"])
+    )
+    if kind == "reveal":
+        if content["public_key"][:4] not in PUBLIC_KEY_PREFIXES:
+            raise ValueError(
+                "Public key {} is not supported".format(content["public_key"])
+            )
+        _, _, key_size = PUBLIC_KEY_PREFIXES[content["public_key"][:4]]
+        return size + FORGED_TAG_SIZE + key_size
+
+    if "parameters" in content:
+        raise ValueError("Transactions with parameters are not supported")
+    destination = content["destination"]
+    if not destination.startswith("KT1") and destination[:3] not in IMPLICIT_PREFIXES:
+        raise ValueError("Destination {} is not supported".format(destination))
+    return (
+        size
+        + nat_size(content["amount"])
+        + FORGED_CONTRACT_SIZE
+        + FORGED_NO_PARAMETERS_SIZE
+    )
+
+
+def forged_size(contents):
+    """Size in bytes of the forged operation group, without the signature."""
+    return BRANCH_SIZE + sum(forged_content_size(content) for content in contents)
+
+
+def calculate_operation_hash(signed_operation_bytes):
+    """
+    Hash of a signed operation group as given by the node on injection, the
+    base58check encoded blake2b digest of its bytes.
+    :param signed_operation_bytes: hex string of the forged bytes and signature
+    """
+    digest = blake2b(
+        bytes.fromhex(signed_operation_bytes), digest_size=OPERATION_HASH_SIZE
+    ).digest()
+    return base58.b58encode_check(OPERATION_HASH_PREFIX + digest).decode()
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from log_config import main_logger
+from pay.batch_payer import BatchPayer
+
+logger = main_logger.getChild("multi_source_payer")
+
+
+def split_payment_items(payment_items, balances):
+    """
+    Spreads the payment items over the payment addresses. The largest payouts
+    are placed first, each on the address with the most balance left, so the
+    sources run out of funds together. Items which are not to be paid go to
+    the first address, which only reports them.
+    :param balances: balance of every payment address, None if unknown
+    :return: list of payment items per payment address, in the given order
+    """
+    shares = [[] for _ in balances]
+    remaining = [balance or 0 for balance in balances]
+
+    payable = []
+    for index, payment_item in enumerate(payment_items):
+        if payment_item.payable and not payment_item.paid.is_processed():
+            payable.append((index, payment_item))
+        else:
+            shares[0].append((index, payment_item))
+
+    for index, payment_item in sorted(
+        payable, key=lambda indexed: -indexed[1].adjusted_amount
+    ):
+        i_source = max(range(len(remaining)), key=lambda i: remaining[i])
+        remaining[i_source] -= payment_item.adjusted_amount
+        shares[i_source].append((index, payment_item))
+
+    return [[payment_item for _, payment_item in sorted(share)] for share in shares]
+
+
+class MultiSourcePayer:
+    """
+    Pays from several payment addresses at once. Every address gets its
+    share of the payouts and its own BatchPayer, with its own counter and
+    balance check. A source can have one operation in a block, the batches of
+    all sources can be included in the same block.
+    """
+
+    def __init__(
+        self,
+        node_url,
+        pymnt_addrs,
+        clnt_mngr,
+        delegator_pays_ra_fee,
+        delegator_pays_xfer_fee,
+        network_config,
+        plugins_manager,
+        dry_run,
+        plans_dir=None,
+    ):
+        self.batch_payers = [
+            BatchPayer(
+                node_url,
+                pymnt_addr,
+                clnt_mngr,
+                delegator_pays_ra_fee,
+                delegator_pays_xfer_fee,
+                network_config,
+                plugins_manager,
+                dry_run,
+                plans_dir=plans_dir,
+            )
+            for pymnt_addr in pymnt_addrs
+        ]
+
+    def pay(self, payment_items_in, dry_run=None, payment_cycle=None):
+        balances = [
+            batch_payer.get_payment_address_balance()
+            for batch_payer in self.batch_payers
+        ]
+        shares = split_payment_items(payment_items_in, balances)
+
+        for batch_payer, balance, share in zip(self.batch_payers, balances, shares):
+            logger.info(
+                "{} payment items are paid from {} with a balance of {} mutez".format(
+                    len(share),
+                    batch_payer.source,
+                    "unknown" if balance is None else "{:<,d}".format(balance),
+                )
+            )
+
+        payers_and_shares = [
+            (batch_payer, share)
+            for batch_payer, share in zip(self.batch_payers, shares)
+            if share
+        ]
+        if not payers_and_shares:
+            return [], 0, 0, None, None
+
+        with ThreadPoolExecutor(
+            max_workers=len(payers_and_shares), thread_name_prefix="source"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    batch_payer.pay,
+                    share,
+                    dry_run=dry_run,
+                    payment_cycle=payment_cycle,
+                )
+                for batch_payer, share in payers_and_shares
+            ]
+            results = [future.result() for future in futures]
+
+        payment_logs = []
+        total_attempts = total_payout_amount = 0
+        future_payable_cycles = []
+        exit_code = None
+        for logs, attempts, payout_amount, payable_cycles, code in results:
+            payment_logs.extend(logs)
+            total_attempts += attempts
+            total_payout_amount += payout_amount
+            # None if the balance is unknown or nothing was left to pay,
+            # a dry run estimates it as well
+            if payable_cycles is not None:
+                future_payable_cycles.append(payable_cycles)
+            if exit_code is None:
+                exit_code = code
+
+        # the first source to run out of funds limits the payouts, None if
+        # no source knows its balance
+        number_future_payable_cycles = min(future_payable_cycles, default=None)
+
+        return (
+            payment_logs,
+            total_attempts,
+            total_payout_amount,
+            number_future_payable_cycles,
+            exit_code,
+        )
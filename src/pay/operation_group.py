@@ -0,0 +1,151 @@
+import json
+
+from pay.forge import forge_operation_group
+
+# run_operation does not check the signature, any well formed one is accepted
+RUN_OPERATION_SIGNATURE = "edsigtXomBKi5CTRf5cjATJWSyaRvhfYNHqSUGrn4SdbYRcGwQrUGjzEfQDTuqHhuA8b2d8NarZjz8TRf65WkpQmo423BtomS8Q"
+# Addresses are base58 and numbers are decimal, none of them needs escaping,
+# which makes formatting several times faster than json.dumps
+TRANSACTION_JSON = '{"kind":"transaction","source":"%s","destination":"%s","fee":"%d","counter":%s,"gas_limit":"%d","storage_limit":"%d","amount":"%d"}'
+
+
+class Transaction:
+    """
+    Transaction content of an operation group. The counter is left unset
+    until the batch is submitted. The content is encoded once as sent to the
+    node and encoded again only when its fee or counter changes, so that the
+    RPCs of a batch share the same encoded contents.
+    """
+
+    __slots__ = (
+        "source",
+        "destination",
+        "amount",
+        "fee",
+        "counter",
+        "gas_limit",
+        "storage_limit",
+        "_content",
+        "_encoded",
+    )
+
+    def __init__(
+        self,
+        source,
+        destination,
+        amount,
+        fee,
+        gas_limit,
+        storage_limit,
+        counter=None,
+    ):
+        self.source = source
+        self.destination = destination
+        self.amount = int(amount)
+        self.fee = int(fee)
+        self.gas_limit = int(gas_limit)
+        self.storage_limit = int(storage_limit)
+        self.counter = None if counter is None else int(counter)
+        self._content = None
+        self._encoded = None
+
+    def set_fee(self, fee):
+        if int(fee) != self.fee:
+            self.fee = int(fee)
+            self._content = self._encoded = None
+
+    def set_counter(self, counter):
+        if counter != self.counter:
+            self.counter = counter
+            self._content = self._encoded = None
+
+    def to_dict(self):
+        """
+        The content as sent to the node, kept until it changes and not to be
+        modified.
+        """
+        if self._content is None:
+            self._content = {
+                "kind": "transaction",
+                "source": self.source,
+                "destination": self.destination,
+                "fee": str(self.fee),
+                "counter": None if self.counter is None else str(self.counter),
+                "gas_limit": str(self.gas_limit),
+                "storage_limit": str(self.storage_limit),
+                "amount": str(self.amount),
+            }
+        return self._content
+
+    def encode(self):
+        if self._encoded is None:
+            self._encoded = TRANSACTION_JSON % (
+                self.source,
+                self.destination,
+                self.fee,
+                "null" if self.counter is None else '"%d"' % self.counter,
+                self.gas_limit,
+                self.storage_limit,
+                self.amount,
+            )
+        return self._encoded
+
+    @staticmethod
+    def from_dict(content):
+        return Transaction(
+            content["source"],
+            content["destination"],
+            content["amount"],
+            content["fee"],
+            content["gas_limit"],
+            content["storage_limit"],
+            content.get("counter"),
+        )
+
+
+class OperationGroup:
+    """
+    Operation group of a batch: its branch and its contents. Each RPC body is
+    serialized once from the encoded contents.
+    """
+
+    def __init__(self, branch, contents):
+        self.branch = branch
+        self.contents = contents
+
+    def encode_contents(self):
+        return "[" + ",".join(content.encode() for content in self.contents) + "]"
+
+    def encode_operation(self, signature=None, protocol=None):
+        fields = []
+        if protocol is not None:
+            fields.append('"protocol":' + json.dumps(protocol))
+        fields.append('"branch":' + json.dumps(self.branch))
+        fields.append('"contents":' + self.encode_contents())
+        if signature is not None:
+            fields.append('"signature":' + json.dumps(signature))
+        return "{" + ",".join(fields) + "}"
+
+    def run_operation_json(self, chain_id):
+        return '{{"operation":{},"chain_id":{}}}'.format(
+            self.encode_operation(signature=RUN_OPERATION_SIGNATURE),
+            json.dumps(chain_id),
+        )
+
+    def forge_json(self):
+        return self.encode_operation()
+
+    def preapply_json(self, protocol, signature):
+        return "[{}]".format(
+            self.encode_operation(signature=signature, protocol=protocol)
+        )
+
+    def content_dicts(self):
+        return [content.to_dict() for content in self.contents]
+
+    def forge(self):
+        """
+        :return: hex string of the forged bytes
+        :raise ValueError: if the contents cannot be forged locally
+        """
+        return forge_operation_group(self.branch, self.content_dicts())
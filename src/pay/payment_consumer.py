@@ -15,6 +15,7 @@ from model.reward_log import (
     TYPE_DELEGATOR,
 )
 from pay.batch_payer import BatchPayer
+from pay.multi_source_payer import MultiSourcePayer
 from util.disk_is_full import disk_is_full
 from stats.stats_publisher import stats_publisher
 from util.csv_payment_file_parser import CsvPaymentFileParser
@@ -23,6 +24,7 @@ from util.dir_utils import (
     get_payment_report_file_path,
     get_calculation_report_file_path,
     get_busy_file,
+    get_payment_plans_dir,
 )
 from util.exit_program import exit_program
 
@@ -64,6 +66,7 @@ class PaymentConsumer(threading.Thread):
         publish_stats=True,
         calculations_dir=None,
         baking_address=None,
+        payment_addresses=None,
     ):
         super(PaymentConsumer, self).__init__()
 
@@ -86,6 +89,7 @@ class PaymentConsumer(threading.Thread):
         self.rewards_type = rewards_type
         self.calculations_dir = calculations_dir
         self.baking_address = baking_address
+        self.payment_addresses = payment_addresses if payment_addresses else [key_name]
 
         logger.debug('Consumer "%s" created', self.name)
 
@@ -146,16 +150,31 @@ class PaymentConsumer(threading.Thread):
 
             payment_items.sort(key=lambda rl: (rl.type, -rl.delegating_balance))
 
-            batch_payer = BatchPayer(
-                self.node_addr,
-                self.key_name,
-                self.client_manager,
-                self.delegator_pays_ra_fee,
-                self.delegator_pays_xfer_fee,
-                self.network_config,
-                self.plugins_manager,
-                self.dry_run,
-            )
+            # payouts are spread over the payment addresses when there are several
+            if len(self.payment_addresses) > 1:
+                batch_payer = MultiSourcePayer(
+                    self.node_addr,
+                    self.payment_addresses,
+                    self.client_manager,
+                    self.delegator_pays_ra_fee,
+                    self.delegator_pays_xfer_fee,
+                    self.network_config,
+                    self.plugins_manager,
+                    self.dry_run,
+                    plans_dir=get_payment_plans_dir(self.payments_dir),
+                )
+            else:
+                batch_payer = BatchPayer(
+                    self.node_addr,
+                    self.key_name,
+                    self.client_manager,
+                    self.delegator_pays_ra_fee,
+                    self.delegator_pays_xfer_fee,
+                    self.network_config,
+                    self.plugins_manager,
+                    self.dry_run,
+                    plans_dir=get_payment_plans_dir(self.payments_dir),
+                )
 
             # 3- do the payment
             (
@@ -164,7 +183,9 @@ class PaymentConsumer(threading.Thread):
                 total_payout_amount,
                 number_future_payable_cycles,
                 exit_code,
-            ) = batch_payer.pay(payment_items, dry_run=self.dry_run)
+            ) = batch_payer.pay(
+                payment_items, dry_run=self.dry_run, payment_cycle=pymnt_cycle
+            )
 
             # override batch data
             payment_batch.batch = payment_logs
@@ -214,9 +235,12 @@ class PaymentConsumer(threading.Thread):
                         )
                 subject = subject + " " + status
 
-                admin_message = "The current payout account balance is expected to last for the next {:d} cycle(s)!".format(
-                    number_future_payable_cycles
-                )
+                if number_future_payable_cycles is None:
+                    admin_message = "The current payout account balance is not known."
+                else:
+                    admin_message = "The current payout account balance is expected to last for the next {:d} cycle(s)!".format(
+                        number_future_payable_cycles
+                    )
 
                 # Payout notification receives cycle, rewards total, number of delegators
                 self.plugins_manager.send_payout_notification(
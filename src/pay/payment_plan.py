@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+
+from Constants import PaymentStatus
+from log_config import main_logger
+from pay.utils import FeeBreakdown
+
+logger = main_logger.getChild("payment_plan")
+
+PLAN_VERSION = 1
+
+
+def payment_item_key(payment_item):
+    return payment_item.paymentaddress, int(payment_item.adjusted_amount)
+
+
+class PlannedBatch:
+    """
+    One operation group of the plan: the payment items it pays, given by
+    their position in the plan, and its contents with their fees, limits and
+    the counters planned for them.
+    """
+
+    def __init__(
+        self,
+        item_indexes,
+        contents,
+        total_gas,
+        total_tx_fees,
+        submission_counter=None,
+        status=PaymentStatus.UNDEFINED,
+        operation_hash=None,
+    ):
+        self.item_indexes = item_indexes
+        self.contents = contents
+        self.total_gas = int(total_gas)
+        self.total_tx_fees = int(total_tx_fees)
+        # counter of the source when the submission started, None before
+        self.submission_counter = submission_counter
+        self.status = status
+        self.operation_hash = operation_hash
+
+    def to_dict(self):
+        return {
+            "items": self.item_indexes,
+            "contents": self.contents,
+            "total_gas": self.total_gas,
+            "total_tx_fees": self.total_tx_fees,
+            "submission_counter": self.submission_counter,
+            "status": self.status.name,
+            "hash": self.operation_hash,
+        }
+
+    @staticmethod
+    def from_dict(content):
+        return PlannedBatch(
+            content["items"],
+            content["contents"],
+            content["total_gas"],
+            content["total_tx_fees"],
+            content["submission_counter"],
+            PaymentStatus[content["status"]],
+            content["hash"],
+        )
+
+
+class PaymentPlan:
+    """
+    Payouts of a cycle from one source, simulated and priced once and split
+    into batches. The plan is saved with the state of its payment items after
+    every step, so that its execution can be resumed without simulating the
+    payouts again.
+    """
+
+    def __init__(self, source, protocol, payment_items, batches):
+        self.source = source
+        self.protocol = protocol
+        self.payment_items = payment_items
+        self.batches = batches
+
+    def get_batch_items(self, batch):
+        return [self.payment_items[index] for index in batch.item_indexes]
+
+    def to_dict(self):
+        return {
+            "version": PLAN_VERSION,
+            "source": self.source,
+            "protocol": self.protocol,
+            "items": [self.item_to_dict(pi) for pi in self.payment_items],
+            "batches": [batch.to_dict() for batch in self.batches],
+        }
+
+    @staticmethod
+    def item_to_dict(payment_item):
+        fee_breakdown = payment_item.fee_breakdown
+        return {
+            "address": payment_item.paymentaddress,
+            "amount": int(payment_item.adjusted_amount),
+            "paid": payment_item.paid.name,
+            "hash": payment_item.hash,
+            "desc": payment_item.desc,
+            "delegator_transaction_fee": payment_item.delegator_transaction_fee,
+            "delegate_transaction_fee": payment_item.delegate_transaction_fee,
+            "fee_breakdown": (
+                [
+                    fee_breakdown.fee,
+                    fee_breakdown.gas_fee,
+                    fee_breakdown.size_fee,
+                    fee_breakdown.base_fee,
+                ]
+                if fee_breakdown
+                else None
+            ),
+        }
+
+    @staticmethod
+    def restore_item(payment_item, content):
+        payment_item.paid = PaymentStatus[content["paid"]]
+        payment_item.hash = content["hash"]
+        payment_item.desc = content["desc"]
+        payment_item.delegator_transaction_fee = content["delegator_transaction_fee"]
+        payment_item.delegate_transaction_fee = content["delegate_transaction_fee"]
+        payment_item.fee_breakdown = (
+            FeeBreakdown(*content["fee_breakdown"])
+            if content["fee_breakdown"]
+            else None
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path, source, payment_items):
+        """
+        Reads the plan saved for the payment items and restores their state.
+        Failed batches are planned again for submission, their items keep the
+        state they are given, so that a retry of the cycle pays them.
+        :return: the plan, None if there is none or it was made for other items
+        """
+        try:
+            with open(path, "r") as f:
+                content = json.load(f)
+            if content["version"] != PLAN_VERSION or content["source"] != source:
+                logger.info("Payment plan {} is outdated".format(path))
+                return None
+
+            # the stored items must be the payment items, in any order
+            items_by_key = {}
+            for payment_item in payment_items:
+                items_by_key.setdefault(payment_item_key(payment_item), []).append(
+                    payment_item
+                )
+            planned_items = []
+            for item in content["items"]:
+                matching = items_by_key.get((item["address"], item["amount"]))
+                if not matching:
+                    break
+                planned_items.append(matching.pop(0))
+            if len(planned_items) != len(content["items"]) or any(
+                items_by_key.values()
+            ):
+                logger.info(
+                    "Payment plan {} was made for other payment items".format(path)
+                )
+                return None
+
+            batches = [PlannedBatch.from_dict(batch) for batch in content["batches"]]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable payment plan {}: {}".format(path, e))
+            return None
+
+        retried_indexes = set()
+        for batch in batches:
+            if batch.status.is_fail():
+                retried_indexes.update(batch.item_indexes)
+                batch.status = PaymentStatus.UNDEFINED
+                batch.submission_counter = None
+                batch.operation_hash = None
+        if retried_indexes:
+            logger.info("Failed payments of plan {} are submitted again".format(path))
+
+        for index, (payment_item, item) in enumerate(
+            zip(planned_items, content["items"])
+        ):
+            if index not in retried_indexes:
+                PaymentPlan.restore_item(payment_item, item)
+        return PaymentPlan(source, content["protocol"], planned_items, batches)
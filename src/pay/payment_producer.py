@@ -4,11 +4,12 @@ import signal
 import threading
 from datetime import datetime, timedelta
 from _decimal import ROUND_HALF_DOWN, Decimal
-from time import sleep
+from time import sleep, monotonic
 from requests import ReadTimeout, ConnectTimeout
 from Constants import MUTEZ_PER_TEZ, RunMode, RewardsType
 from api.provider_factory import ProviderFactory
 from calc.phased_payment_calculator import PhasedPaymentCalculator
+from cli.head_monitor import HEAD_EVENT_CYCLE
 from exception.api_provider import ApiProviderException
 from log_config import main_logger, get_verbose_log_helper
 from model.reward_log import RewardLog
@@ -91,6 +92,8 @@ class PaymentProducer(threading.Thread, PaymentProducerABC):
 
         self.node_url = node_url
         self.client_manager = client_manager
+        # head monitor of the client manager, taken on the first wait for blocks
+        self.head_monitor = None
         self.reward_api = self.provider_factory.newRewardApi(
             network_config,
             self.baking_address,
@@ -184,6 +187,8 @@ class PaymentProducer(threading.Thread, PaymentProducerABC):
                 )
             if self.retry_fail_event:
                 self.retry_fail_event.set()
+            if self.head_monitor is not None:
+                self.head_monitor.stop()
 
     def retry_fail_run(self):
         logger.debug(
@@ -311,7 +316,7 @@ class PaymentProducer(threading.Thread, PaymentProducerABC):
                                     wait_offset_minutes,
                                 )
                             )
-                            self.wait_for_blocks(wait_offset_blocks)
+                            self.wait_for_blocks(wait_offset_blocks, current_level)
                             continue  # Break/Repeat loop
 
                         else:
@@ -354,8 +359,6 @@ class PaymentProducer(threading.Thread, PaymentProducerABC):
                         self.exit(ExitCode.SUCCESS)
                         break
 
-                    sleep(10)
-
                     # calculate number of blocks until end of current cycle plus user-defined offset
                     nb_blocks_remaining = (
                         self.nw_config["BLOCKS_PER_CYCLE"]
@@ -369,7 +372,7 @@ class PaymentProducer(threading.Thread, PaymentProducerABC):
                     )
 
                     # wait until current cycle ends
-                    self.wait_for_blocks(nb_blocks_remaining)
+                    self.wait_for_blocks(nb_blocks_remaining, current_level)
 
             except (ApiProviderException, ReadTimeout, ConnectTimeout) as e:
                 logger.debug(
@@ -505,15 +508,48 @@ class PaymentProducer(threading.Thread, PaymentProducerABC):
         # Either succeeded or raised exception
         return True
 
-    def wait_for_blocks(self, nb_blocks_remaining):
-        for x in range(nb_blocks_remaining):
-            sleep(self.nw_config["MINIMAL_BLOCK_DELAY"])
+    def wait_for_blocks(self, nb_blocks_remaining, current_level=None):
+        """
+        Wait until the node reaches current_level + nb_blocks_remaining. Without
+        a current level, or while the head stream of the node is unavailable,
+        wait for nb_blocks_remaining times the minimal block delay instead.
+        """
+        block_delay = self.nw_config["MINIMAL_BLOCK_DELAY"]
+        deadline = monotonic() + nb_blocks_remaining * block_delay
+        target_level = None
+        if current_level is not None:
+            target_level = current_level + nb_blocks_remaining
+            head_monitor = self.get_head_monitor()
+
+        while True:
+            if target_level is not None and head_monitor.is_streaming():
+                if head_monitor.wait_for_level(target_level, timeout=block_delay):
+                    logger.debug("Target level {} reached".format(target_level))
+                    break
+            else:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                sleep(min(remaining, block_delay))
 
             # if shutting down, exit
             if not self.life_cycle.is_running():
                 self.exit(ExitCode.SUCCESS)
                 break
 
+    def get_head_monitor(self):
+        if self.head_monitor is None:
+            self.head_monitor = self.client_manager.get_head_monitor(
+                self.block_api.level_in_cycle
+            )
+            self.head_monitor.subscribe(self.on_head_event)
+        return self.head_monitor
+
+    @staticmethod
+    def on_head_event(event, level):
+        if event == HEAD_EVENT_CYCLE:
+            logger.info("New cycle started at level {}".format(level))
+
     def node_is_bootstrapped(self):
         # Get RPC node's (-A) bootstrap time. If bootstrap time + 2 minutes is
         # before local time, node is not bootstrapped.
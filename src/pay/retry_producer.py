@@ -94,6 +94,8 @@ class RetryProducer:
                 )
             )
 
+            self.check_known_operations(batch)
+
             if self.retry_injected:
                 self.convert_injected_to_fail(batch)
 
@@ -118,6 +120,40 @@ class RetryProducer:
 
         return
 
+    def check_known_operations(self, batch):
+        """
+        Marks as paid the failed and injected items whose operation hash is
+        known to be applied, instead of paying them again.
+        """
+        statuses = {}
+        nb_converted = 0
+        for pl in batch:
+            if not pl.hash or not (pl.paid.is_fail() or pl.paid.is_injected()):
+                continue
+            if pl.hash not in statuses:
+                try:
+                    statuses[pl.hash] = (
+                        self.payment_producer.block_api.get_operation_status(pl.hash)
+                    )
+                except Exception as e:
+                    logger.warning(
+                        "Status of operation {} could not be fetched: {}".format(
+                            pl.hash, e
+                        )
+                    )
+                    statuses[pl.hash] = None
+            if statuses[pl.hash] == "applied":
+                pl.paid = PaymentStatus.PAID
+                pl.desc += "Operation {} found applied on retry. ".format(pl.hash)
+                nb_converted += 1
+
+        if nb_converted:
+            logger.info(
+                "{} rewards converted to paid, their operations are applied.".format(
+                    nb_converted
+                )
+            )
+
     @staticmethod
     def convert_injected_to_fail(batch):
         nb_converted = 0
@@ -3,14 +3,22 @@ from time import sleep
 from log_config import main_logger
 import math
 from Constants import PaymentStatus
+from pay.forge import nat_size, BRANCH_SIZE
 
 
 MINIMUM_FEE_MUTEZ = 100
 MUTEZ_PER_GAS_UNIT = 0.1
 MUTEZ_PER_BYTE = 1
-RUNOPS_JSON = '{"branch": "%BRANCH%","contents":[%CONTENT%], "signature":"edsigtXomBKi5CTRf5cjATJWSyaRvhfYNHqSUGrn4SdbYRcGwQrUGjzEfQDTuqHhuA8b2d8NarZjz8TRf65WkpQmo423BtomS8Q"}'
-JSON_WRAP = '{"operation": %JSON%,"chain_id":"%chain_id%"}'
-MAX_TX_PER_BLOCK_TZ = 200
+SIGNATURE_BYTES_SIZE = 64
+# https://rpc.tzkt.io/mainnet/chains/main/blocks/head/context/constants
+HARD_GAS_LIMIT_PER_BLOCK = 2600000
+HARD_GAS_LIMIT_PER_OPERATION = 1040000
+HARD_STORAGE_LIMIT_PER_OPERATION = 60000
+MAX_OPERATION_DATA_LENGTH = 32768
+# Batches are filled up to these fractions of the gas of a block and of the size of an operation
+BATCH_GAS_LIMIT_FRACTION = 0.5
+BATCH_SIZE_LIMIT_FRACTION = 0.75
+# Payouts to contracts of unknown gas take this share of the gas of a batch each
 MAX_TX_PER_BLOCK_KT = 25
 
 
@@ -20,13 +28,45 @@ def calculate_required_fee(consumed_gas, size):
     )
 
 
-def calculate_tx_fee(default_fee):
-    return int(10 * (default_fee))
+def calculate_minimal_fee(consumed_gas, size_without_fee, other_fees=0, fee=0):
+    """
+    Smallest fee, not lower than fee, for which other_fees plus the fee cover
+    the required fee of consumed_gas and of the forged operations. Their size
+    is size_without_fee plus the zarith width of the fee itself. The width
+    only takes a few values, each is tried from the narrowest one.
+    """
+    width = nat_size(fee)
+    while True:
+        minimal_fee = max(
+            fee,
+            calculate_required_fee(consumed_gas, size_without_fee + width) - other_fees,
+        )
+        if nat_size(minimal_fee) <= width:
+            return minimal_fee
+        width += 1
+
+
+class FeeBreakdown:
+    """
+    Fee of one operation of a batch and the parts of the required fee it
+    covers: its gas, its forged bytes and, for the operation carrying it, the
+    minimal fee and the bytes of the branch and signature of the batch.
+    """
+
+    def __init__(self, fee, gas_fee, size_fee, base_fee=0):
+        self.fee = int(fee)
+        self.gas_fee = int(gas_fee)
+        self.size_fee = int(size_fee)
+        self.base_fee = int(base_fee)
+
+    def __repr__(self) -> str:
+        return "Fee: {}, Gas: {}, Size: {}, Base: {}".format(
+            self.fee, self.gas_fee, self.size_fee, self.base_fee
+        )
 
 
-def build_runops_json_params(branch, content, chain_id):
-    runops_json = RUNOPS_JSON.replace("%BRANCH%", branch).replace("%CONTENT%", content)
-    return JSON_WRAP.replace("%JSON%", runops_json).replace("%chain_id%", chain_id)
+def calculate_tx_fee(default_fee):
+    return int(10 * (default_fee))
 
 
 def calculate_consumed_gas(consumed_milligas, metadata):
@@ -128,26 +168,46 @@ def calculate_estimated_amount_to_pay(
     return estimated_amount_to_pay
 
 
-def sort_and_chunk_payment_items(payment_items):
-    payment_items_tz = [
+def sort_and_chunk_payment_items(payment_items, estimate_limits):
+    """
+    Splits the payments into batches, payouts to implicit accounts first. Each
+    batch is filled in order while the estimated gas and forged size of its
+    operations stay within BATCH_GAS_LIMIT_FRACTION of the gas limit of a block
+    and BATCH_SIZE_LIMIT_FRACTION of the maximal size of an operation.
+    :param estimate_limits: function returning the estimated gas and forged
+    size of a payout, the gas is None for a contract never simulated
+    """
+    gas_limit = BATCH_GAS_LIMIT_FRACTION * HARD_GAS_LIMIT_PER_BLOCK
+    size_limit = (
+        BATCH_SIZE_LIMIT_FRACTION * MAX_OPERATION_DATA_LENGTH
+        - BRANCH_SIZE
+        - SIGNATURE_BYTES_SIZE
+    )
+    payment_items = [
         payment_item
         for payment_item in payment_items
         if payment_item.paymentaddress.startswith("tz")
-    ]
-    payment_items_KT = [
+    ] + [
         payment_item
         for payment_item in payment_items
         if payment_item.paymentaddress.startswith("KT")
     ]
-    payment_items_chunks_tz = [
-        payment_items_tz[i : i + MAX_TX_PER_BLOCK_TZ]
-        for i in range(0, len(payment_items_tz), MAX_TX_PER_BLOCK_TZ)
-    ]
-    payment_items_chunks_KT = [
-        payment_items_KT[i : i + MAX_TX_PER_BLOCK_KT]
-        for i in range(0, len(payment_items_KT), MAX_TX_PER_BLOCK_KT)
-    ]
-    return payment_items_chunks_tz + payment_items_chunks_KT
+
+    payment_items_chunks = []
+    chunk, chunk_gas, chunk_size = [], 0, 0
+    for payment_item in payment_items:
+        gas, size = estimate_limits(payment_item)
+        if gas is None:
+            gas = gas_limit / MAX_TX_PER_BLOCK_KT
+        if chunk and (chunk_gas + gas > gas_limit or chunk_size + size > size_limit):
+            payment_items_chunks.append(chunk)
+            chunk, chunk_gas, chunk_size = [], 0, 0
+        chunk.append(payment_item)
+        chunk_gas += gas
+        chunk_size += size
+    if chunk:
+        payment_items_chunks.append(chunk)
+    return payment_items_chunks
 
 
 def calculate_future_payable_cycles(payment_address_balance, estimated_amount_to_pay):
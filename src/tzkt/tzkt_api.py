@@ -1,12 +1,33 @@
 import requests
+import threading
 from http import HTTPStatus
-from time import sleep
-from pprint import pformat
+from http.cookiejar import DefaultCookiePolicy
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+    as_completed,
+)
+from time import sleep, perf_counter
 from json import JSONDecodeError
+from requests.adapters import HTTPAdapter
 
 from Constants import VERSION, TZKT_PUBLIC_API_URL, MAX_SEQUENT_CALLS
 from exception.api_provider import ApiProviderException
 from log_config import main_logger, verbose_logger
+from tzkt.tzkt_cache import get_split_cache
+from tzkt.tzkt_head_state import get_head_state
+from tzkt.tzkt_endpoints import (
+    TzKTEndpointPool,
+    parse_endpoint_urls,
+    get_hedge_percentile,
+    TZKT_LEVEL_HEADER,
+)
+from tzkt.tzkt_split_decoder import (
+    DelegatorColumns,
+    decode_split_page,
+    SPLIT_STREAM_CHUNK_SIZE,
+)
+from util.lazy_logging import LazyPayload
 
 logger = main_logger
 
@@ -15,64 +36,288 @@ class TzKTApiError(ApiProviderException):
     pass
 
 
+class _EndpointFailure(Exception):
+    """An endpoint failed, the request may be sent to the next one."""
+
+    def __init__(self, error=None):
+        super().__init__(error)
+        # None for server side errors, which are returned as empty responses
+        self.error = error
+
+
 MAX_PAGE_SIZE = 10000
-TZKT_REQUEST_BUFFER_SECONDS = 0.5
 TZKT_RETRY_TIMEOUT_SECONDS = 2.0
+TZKT_CONNECTION_POOL_SIZE = 10
+TZKT_MAX_PAGE_WORKERS = 4
+TZKT_MAX_ADDRESSES_PER_REQUEST = 100
+TZKT_MAX_RATE_LIMITED_RETRIES = 5
+CACHE_PROVIDER = "tzkt"
+
+
+class _CallBudget:
+    """Thread-safe count of the calls left before giving up on a request."""
+
+    def __init__(self, max_calls):
+        self.max_calls = max_calls
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.calls >= self.max_calls:
+                return False
+            self.calls += 1
+            return True
 
 
 class TzKTApi:
     max_page_size = MAX_PAGE_SIZE
-    delay_between_calls = TZKT_REQUEST_BUFFER_SECONDS  # in seconds
-
-    def __init__(self, base_url, timeout):
-        self.base_url = base_url
+    max_page_workers = TZKT_MAX_PAGE_WORKERS
+    max_addresses_per_request = TZKT_MAX_ADDRESSES_PER_REQUEST
+
+    def __init__(
+        self,
+        base_url,
+        timeout,
+        pool_size=TZKT_CONNECTION_POOL_SIZE,
+        network=None,
+        split_cache=None,
+        rate_limiter=None,
+        head_state=None,
+        hedge_percentile=None,
+    ):
+        """
+        :param base_url: base API url or comma separated list of urls, in order
+        of preference. Requests fail over to the next url.
+        :param hedge_percentile: send a second request to the next url when the
+        first takes longer than this percentile of its latencies
+        """
+        self.endpoints = TzKTEndpointPool(parse_endpoint_urls(base_url))
+        self.base_url = self.endpoints.primary.url
         self.timeout = timeout
+        self.pool_size = pool_size
+        # cache entries of self-hosted indexers without a known network are kept apart
+        self.network = network if network is not None else self.base_url
+        self.split_cache = split_cache if split_cache is not None else get_split_cache()
+        self.session = self._create_session(pool_size)
+        # rate limiters are shared by all instances talking to the same host
+        if rate_limiter is not None:
+            self.rate_limiter = rate_limiter
+        self.head_state = (
+            head_state if head_state is not None else get_head_state(self.base_url)
+        )
+        self.hedge_percentile = (
+            hedge_percentile if hedge_percentile is not None else get_hedge_percentile()
+        )
+        self._hedge_executor = None
+        self._stats_lock = threading.Lock()
+        self._num_requests = 0
+        self._num_hedged_requests = 0
+
+    @property
+    def rate_limiter(self):
+        return self.endpoints.primary.rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, rate_limiter):
+        self.endpoints.primary.rate_limiter = rate_limiter
 
     @staticmethod
-    def from_network(network, timeout=30):
+    def from_network(network, timeout=30, pool_size=TZKT_CONNECTION_POOL_SIZE):
         """
         Create new API instance
         :param network: one of `mainnet`, current testnet
         :param timeout: request timeout in seconds (default = 30)
+        :param pool_size: number of keep-alive connections kept open (default = 10)
         """
         base_urls = TZKT_PUBLIC_API_URL
         assert network in base_urls, f"Unsupported network {network}"
-        return TzKTApi(base_url=base_urls[network], timeout=timeout)
+        return TzKTApi(
+            base_url=base_urls[network],
+            timeout=timeout,
+            pool_size=pool_size,
+            network=network,
+        )
 
     @staticmethod
-    def from_url(base_url, timeout=30):
+    def from_url(
+        base_url, timeout=30, pool_size=TZKT_CONNECTION_POOL_SIZE, network=None
+    ):
         """
         Create new API instance
         :param base_url: base API url, i.e. http://localhost:5000/v1
         :param timeout: request timeout in seconds (default = 30)
+        :param pool_size: number of keep-alive connections kept open (default = 10)
+        :param network: network served by the API, used to key cached data
         """
-        return TzKTApi(base_url=base_url, timeout=timeout)
+        return TzKTApi(
+            base_url=base_url, timeout=timeout, pool_size=pool_size, network=network
+        )
+
+    @staticmethod
+    def _create_session(pool_size):
+        """
+        Build the keep-alive session shared by all threads using this instance.
+        The TzKT API is cookie-less, refusing cookies keeps the session free of
+        shared mutable state so it can be used from several threads at once.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.headers.update(
+            {
+                "User-Agent": f"trd-{VERSION}",
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            }
+        )
+        return session
 
-    def _request(self, path, **params):
+    def get_connection_stats(self) -> dict:
+        """
+        Returns connection reuse metrics of the session pool.
+        :return: {
+            "requests": 0,
+            "connections": 0,
+            "reused": 0
+        }
+        """
+        num_connections = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    num_connections += pool.num_connections
+
+        with self._stats_lock:
+            num_requests = self._num_requests
+
+        return {
+            "requests": num_requests,
+            "connections": num_connections,
+            "reused": max(num_requests - num_connections, 0),
+        }
+
+    def get_endpoint_stats(self) -> list:
+        """
+        Returns the health of every endpoint, in the configured order.
+        :return: [{
+            "url": "string",
+            "health": 1.0,
+            "level": 0,
+            "requests_timed": 0
+        }]
+        """
+        return self.endpoints.get_stats()
+
+    def close(self):
+        self.session.close()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+
+    def _request(self, path, decode=None, **params):
+        """
+        Sends the request to the preferred endpoint and fails over to the next
+        ones on connection errors, server errors or a lagging indexer.
+        :param decode: optional function decoding the response body from an
+        iterable of bytes chunks, the body is then streamed instead of loaded
+        at once
+        """
         data = {key: value for key, value in params.items() if value is not None}
 
-        if path.startswith("/"):
-            url = self.base_url + path
-        else:
-            url = self.base_url + "/" + path
+        candidates = self.endpoints.ordered()
+        failure = None
+        while candidates:
+            endpoint = candidates.pop(0)
+            try:
+                if self._should_hedge(endpoint, candidates):
+                    res = self._request_hedged(endpoint, candidates, path, data, decode)
+                else:
+                    res = self._request_endpoint(endpoint, path, data, decode)
+            except _EndpointFailure as e:
+                failure = e
+                if candidates:
+                    verbose_logger.warning(
+                        "TzKT endpoint {} failed, trying {}".format(
+                            endpoint.url, candidates[0].url
+                        )
+                    )
+                continue
+
+            verbose_logger.debug("Response from TzKT is:\n%s", LazyPayload(res))
+            return res
 
-        verbose_logger.debug("Requesting {}".format(url))
+        # Return None if all endpoints returned a server side error (5xx)
+        if failure.error is not None:
+            raise failure.error
+        return None
 
+    def _should_hedge(self, endpoint, candidates):
+        return (
+            self.hedge_percentile is not None
+            and len(candidates) > 0
+            and endpoint.latency_percentile(self.hedge_percentile) is not None
+        )
+
+    def _request_hedged(self, endpoint, candidates, path, data, decode):
+        """
+        Sends the request to endpoint and, if it takes longer than the hedge
+        percentile of its latencies, a second one to the next candidate. The
+        first successful response is returned.
+        """
+        if self._hedge_executor is None:
+            with self._stats_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=2 * self.pool_size, thread_name_prefix="tzkt_hedge"
+                    )
+
+        delay = endpoint.latency_percentile(self.hedge_percentile)
+        first = self._hedge_executor.submit(
+            self._request_endpoint, endpoint, path, data, decode
+        )
         try:
-            response = requests.get(
-                url=url,
-                params=data,
-                timeout=self.timeout,
-                headers={"User-Agent": f"trd-{VERSION}"},
+            return first.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+
+        hedge = candidates.pop(0)
+        verbose_logger.debug(
+            "No response from {} after {:.3f}s, hedging to {}".format(
+                endpoint.url, delay, hedge.url
+            )
+        )
+        with self._stats_lock:
+            self._num_hedged_requests += 1
+        second = self._hedge_executor.submit(
+            self._request_endpoint, hedge, path, data, decode
+        )
+
+        failure = None
+        for future in as_completed([first, second]):
+            try:
+                return future.result()
+            except _EndpointFailure as e:
+                failure = e
+        raise failure
+
+    def _request_endpoint(self, endpoint, path, data, decode):
+        url = endpoint.url_for(path)
+        verbose_logger.debug("Requesting %s", url)
+
+        for _ in range(TZKT_MAX_RATE_LIMITED_RETRIES + 1):
+            start = perf_counter()
+            response = self._send(endpoint, url, data, stream=decode is not None)
+            if response.status_code != HTTPStatus.TOO_MANY_REQUESTS:
+                break
+            verbose_logger.warning(
+                "TzKT rate limit hit, current rate {:.2f} requests/s".format(
+                    endpoint.rate_limiter.get_rate()
+                )
             )
-        except requests.Timeout:
-            raise TzKTApiError("Request timeout")
-        except requests.ConnectionError:
-            raise TzKTApiError("DNS lookup failed")
-        except requests.HTTPError as e:
-            raise TzKTApiError("HTTP Error occurred: {}".format(e))
-        except requests.RequestException as e:
-            raise TzKTApiError(e)
 
         # Raise exception for client side errors (4xx)
         if (
@@ -85,21 +330,76 @@ class TzKTApi:
             )
 
         # Return None if empty content
-        # or we get a server side error (5xx)
-        if (response.status_code == HTTPStatus.NO_CONTENT) or (
-            response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
-        ):
+        if response.status_code == HTTPStatus.NO_CONTENT:
             return None
 
-        try:
-            res = response.json()
-        except JSONDecodeError:
-            raise TzKTApiError(f"Failed to decode JSON:\n{response.text}")
+        # or try the next endpoint on server side errors (5xx)
+        if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            endpoint.record_failure()
+            raise _EndpointFailure()
+
+        level = response.headers.get(TZKT_LEVEL_HEADER)
+        if level is not None and str(level).isdigit():
+            self.endpoints.record_level(endpoint, int(level))
+            if self.endpoints.is_lagging(endpoint):
+                response.close()
+                endpoint.record_failure()
+                raise _EndpointFailure(
+                    TzKTApiError(
+                        f"TzKT endpoint {endpoint.url} is behind at level {level}"
+                    )
+                )
 
-        verbose_logger.debug(f"Response from TzKT is:\n{pformat(res)}")
+        if decode is not None:
+            res = self._decode_stream(response, decode)
+        else:
+            try:
+                res = response.json()
+            except JSONDecodeError:
+                raise TzKTApiError(f"Failed to decode JSON:\n{response.text}")
 
+        endpoint.record_success(perf_counter() - start)
         return res
 
+    @staticmethod
+    def _decode_stream(response, decode):
+        try:
+            return decode(response.iter_content(chunk_size=SPLIT_STREAM_CHUNK_SIZE))
+        except ValueError as e:
+            raise TzKTApiError(f"Failed to decode JSON: {e}")
+        except requests.RequestException as e:
+            raise TzKTApiError(e)
+        finally:
+            response.close()
+
+    def _send(self, endpoint, url, params, stream=False):
+        endpoint.rate_limiter.acquire()
+
+        with self._stats_lock:
+            self._num_requests += 1
+
+        try:
+            response = self.session.get(
+                url=url,
+                params=params,
+                timeout=self.timeout,
+                stream=stream,
+            )
+        except requests.Timeout:
+            error = TzKTApiError("Request timeout")
+        except requests.ConnectionError:
+            error = TzKTApiError("DNS lookup failed")
+        except requests.HTTPError as e:
+            error = TzKTApiError("HTTP Error occurred: {}".format(e))
+        except requests.RequestException as e:
+            error = TzKTApiError(e)
+        else:
+            endpoint.rate_limiter.on_response(response.status_code, response.headers)
+            return response
+
+        endpoint.record_failure()
+        raise _EndpointFailure(error)
+
     def get_current_cycle(self):
         return self.get_head()["cycle"]
 
@@ -109,6 +409,8 @@ class TzKTApi:
     def get_head(self) -> dict:
         """
         Returns indexer head and synchronization status.
+        The head is shared with all instances using the same API url and
+        requested again once older than the head state ttl.
         :return: {
             "level": 0,
             "hash": "string",
@@ -119,15 +421,25 @@ class TzKTApi:
             "synced": true
         }
         """
-        return self._request("head")
+        return self.head_state.get(lambda: self._request("head"))
 
-    def get_reward_split(self, address, cycle, fetch_delegators=True) -> dict:
+    def get_reward_split(
+        self, address, cycle, fetch_delegators=True, max_workers=None
+    ) -> dict:
         """
         Returns baker rewards for the specified cycle with all delegator balances at that cycle
         to allow rewards distribution in proportion to shares.
+        The first page tells the number of delegators, remaining pages are then
+        fetched concurrently and merged in order.
         :param address: Baker address
         :param cycle: Rewards cycle
         :param fetch_delegators: Load snapshotted balances for all delegators
+        :param max_workers: Maximum number of pages fetched in parallel, 1 pages sequentially
+        Splits of finalized cycles are served from and stored to the split cache if one is set.
+        The current balances are not cached, on every cache hit they are requested
+        again with get_delegated_balances.
+        Pages are decoded while streamed and only the delegator fields listed in
+        DELEGATOR_FIELDS are kept, in DelegatorColumns.
         :returns: {
             "cycle": 0,
             "stakingBalance": 0,
@@ -178,47 +490,152 @@ class TzKTApi:
             "revelationRewards": 0,
             "revelationLostRewards": 0,
             "revelationLostFees": 0,
-            "delegators": [
+            "delegators": DelegatorColumns [
                 {
                     "address": "string",
-                    "balance": 0,
-                    "emptied": true,
-                    "currentBalance": 0
+                    "delegatedBalance": 0,
+                    "currentDelegatedBalance": 0,
+                    "balance": 0
                 }
             ]
         }
         """
-        res = None
-        offset = 0
+        split = self._get_cached_split(address, cycle) if fetch_delegators else None
+        if split is None:
+            split = self._fetch_reward_split(
+                address, cycle, fetch_delegators, max_workers
+            )
+            split["delegators"] = DelegatorColumns.from_json(split["delegators"])
+            if fetch_delegators:
+                self._cache_split(address, cycle, split)
+        return split
+
+    def _get_cached_split(self, address, cycle):
+        if self.split_cache is None:
+            return None
+        split = self.split_cache.get(self.network, address, cycle, CACHE_PROVIDER)
+        if split is not None:
+            delegators = DelegatorColumns.from_json(split["delegators"])
+            # only delegators with a balance at the snapshot are paid
+            balances = self.get_delegated_balances(
+                address,
+                [
+                    address
+                    for address, _, _, balance in delegators.rows()
+                    if balance > 0
+                ],
+            )
+            delegators.set_current_delegated_balances(balances)
+            split["delegators"] = delegators
+        return split
+
+    def _cache_split(self, address, cycle, split):
+        if self.split_cache is None or not self.is_finalized_split(cycle, split):
+            return
+        delegators = split["delegators"].to_json()
+        # current balances change after the cycle, only the finalized fields are kept
+        del delegators["currentDelegatedBalance"]
+        self.split_cache.put(
+            self.network,
+            address,
+            cycle,
+            CACHE_PROVIDER,
+            dict(split, delegators=delegators),
+        )
+
+    def is_finalized_split(self, cycle, split):
+        """
+        A split is final once its cycle is over and no blocks or endorsements are
+        left to come. Its current balances are not final and are not cached.
+        """
+        return (
+            cycle < self.get_current_cycle()
+            and split.get("futureBlocks", 0) == 0
+            and split.get("futureEndorsements", 0) == 0
+        )
+
+    def _fetch_reward_split(self, address, cycle, fetch_delegators, max_workers):
+        path = f"rewards/split/{address}/{cycle}"
         limit = self.max_page_size if fetch_delegators else 0
+        if max_workers is None:
+            max_workers = self.max_page_workers
+        call_budget = _CallBudget(MAX_SEQUENT_CALLS)
+
+        res = self._request_split_page(path, 0, limit, call_budget)
+        if not fetch_delegators or len(res["delegators"]) < limit:
+            return res
+
+        offset = limit
+        num_delegators = res.get("delegatorsCount", res.get("numDelegators"))
+        if max_workers > 1 and num_delegators:
+            offsets = list(range(offset, int(num_delegators), limit))
+            if offsets:
+                pages = self._request_split_pages_concurrently(
+                    path, offsets, limit, call_budget, max_workers
+                )
+                for page in pages:
+                    res["delegators"].extend(page["delegators"])
+                if len(pages[-1]["delegators"]) < limit:
+                    return res
+                offset = offsets[-1] + limit
+
+        # Sequential paging, also picks up any delegators beyond the announced count
+        while True:
+            page = self._request_split_page(path, offset, limit, call_budget)
+            res["delegators"].extend(page["delegators"])
+            if len(page["delegators"]) < limit:
+                return res
+            offset += limit
 
-        for call_count in range(MAX_SEQUENT_CALLS):
+    def _request_split_page(self, path, offset, limit, call_budget):
+        while call_budget.take():
             page = self._request(
-                f"rewards/split/{address}/{cycle}", offset=offset, limit=limit
+                path, decode=decode_split_page, offset=offset, limit=limit
             )
 
             if page is None:
                 verbose_logger.warning(
-                    f"Retry getting rewards/split/{address}/{cycle} ({call_count}) ..."
+                    f"Retry getting {path} offset {offset} ({call_budget.calls}) ..."
                 )
                 sleep(TZKT_RETRY_TIMEOUT_SECONDS)
                 continue
 
             assert isinstance(page, dict) and "delegators" in page
+            return page
 
-            if res is None:
-                res = page
-            else:
-                assert isinstance(res, dict) and "delegators" in res
-                res["delegators"].extend(page["delegators"])
+        raise TzKTApiError(f"Max sequent calls number exceeded ({MAX_SEQUENT_CALLS})")
 
-            if not fetch_delegators or len(page["delegators"]) < limit:
-                return res
-            else:
-                offset += limit
-                sleep(self.delay_between_calls)
+    def _request_split_pages_concurrently(
+        self, path, offsets, limit, call_budget, max_workers
+    ):
+        """
+        Fetch the pages at the given offsets with at most max_workers requests in
+        flight. Pages are returned in the order of the offsets.
+        """
 
-        raise TzKTApiError(f"Max sequent calls number exceeded ({MAX_SEQUENT_CALLS})")
+        def fetch(offset):
+            return self._request_split_page(path, offset, limit, call_budget)
+
+        return self._map_concurrently(fetch, offsets, max_workers, "tzkt_split")
+
+    @staticmethod
+    def _map_concurrently(fetch, items, max_workers, thread_name_prefix):
+        """
+        Apply fetch to every item with at most max_workers calls in flight.
+        Results are returned in the order of the items, the first error cancels
+        the calls not started yet and is raised.
+        """
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(items)),
+            thread_name_prefix=thread_name_prefix,
+        ) as executor:
+            futures = [executor.submit(fetch, item) for item in items]
+            try:
+                return [future.result() for future in futures]
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
 
     def get_account_by_address(self, address) -> dict:
         """
@@ -280,6 +697,117 @@ class TzKTApi:
         """
         return self._request(f"accounts/{address}")
 
+    def get_balances_by_addresses(self, addresses, max_workers=None) -> dict:
+        """
+        Returns the current balance of many accounts at once.
+        Addresses are queried in chunks of max_addresses_per_request with
+        address.in and only the address and balance fields are selected.
+        Addresses missing from the bulk result are looked up one by one, those
+        without an account have a balance of 0.
+        :param addresses: Account addresses (starting with tz or KT)
+        :param max_workers: Maximum number of chunks fetched in parallel
+        :return: {
+            "address": 0
+        }
+        """
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return {}
+        if max_workers is None:
+            max_workers = self.max_page_workers
+        call_budget = _CallBudget(MAX_SEQUENT_CALLS)
+
+        chunks = self._chunk_addresses(addresses)
+
+        def fetch(chunk):
+            return self._request_balance_chunk(chunk, call_budget)
+
+        balances = {}
+        for accounts in self._map_concurrently(
+            fetch, chunks, max_workers, "tzkt_balances"
+        ):
+            for account in accounts:
+                balances[account["address"]] = account["balance"]
+
+        for address in addresses:
+            if address not in balances:
+                verbose_logger.debug(
+                    "Address {} not in bulk result, requesting it alone".format(address)
+                )
+                account = self.get_account_by_address(address)
+                if account is None:
+                    logger.info(
+                        "No account {} on TzKT, its balance is taken as 0".format(
+                            address
+                        )
+                    )
+                    balances[address] = 0
+                else:
+                    balances[address] = account["balance"]
+
+        return balances
+
+    def get_delegated_balances(self, baker, addresses, max_workers=None) -> dict:
+        """
+        Returns the current balance of the accounts still delegating to the
+        baker, the currentDelegatedBalance of a reward split. Addresses are
+        queried in chunks like in get_balances_by_addresses, filtered on the
+        delegate. Accounts delegating to another baker or to none are left out.
+        :param baker: Baker address
+        :param addresses: Account addresses (starting with tz or KT)
+        :param max_workers: Maximum number of chunks fetched in parallel
+        :return: {
+            "address": 0
+        }
+        """
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return {}
+        if max_workers is None:
+            max_workers = self.max_page_workers
+        call_budget = _CallBudget(MAX_SEQUENT_CALLS)
+
+        def fetch(chunk):
+            return self._request_balance_chunk(chunk, call_budget, delegate=baker)
+
+        balances = {}
+        for accounts in self._map_concurrently(
+            fetch, self._chunk_addresses(addresses), max_workers, "tzkt_balances"
+        ):
+            for account in accounts:
+                balances[account["address"]] = account["balance"]
+        return balances
+
+    def _chunk_addresses(self, addresses):
+        chunk_size = self.max_addresses_per_request
+        return [
+            addresses[i : i + chunk_size] for i in range(0, len(addresses), chunk_size)
+        ]
+
+    def _request_balance_chunk(self, addresses, call_budget, delegate=None):
+        while call_budget.take():
+            accounts = self._request(
+                "accounts",
+                **{
+                    "address.in": ",".join(addresses),
+                    "delegate": delegate,
+                    "select": "address,balance",
+                    "limit": len(addresses),
+                },
+            )
+
+            if accounts is None:
+                verbose_logger.warning(
+                    f"Retry getting balances of {len(addresses)} accounts ({call_budget.calls}) ..."
+                )
+                sleep(TZKT_RETRY_TIMEOUT_SECONDS)
+                continue
+
+            assert isinstance(accounts, list)
+            return accounts
+
+        raise TzKTApiError(f"Max sequent calls number exceeded ({MAX_SEQUENT_CALLS})")
+
     def get_protocol_by_cycle(self, cycle: int) -> dict:
         """
         Returns actual protocol for a particular cycle.
@@ -324,3 +852,19 @@ class TzKTApi:
 
     def get_snapshot_level(self, cycle):
         return self._request(f"cycles/{cycle}")["snapshotLevel"]
+
+    def get_operation_status(self, operation_hash):
+        """
+        Returns the status of an operation group.
+        :param operation_hash: Operation hash (starting with o)
+        :return: "applied" if all its operations are applied, else the status
+        of the first one which is not, e.g. "failed" or "backtracked". None if
+        the operation is not known to the indexer.
+        """
+        statuses = self._request(f"operations/{operation_hash}", select="status")
+        if not statuses:
+            return None
+        for status in statuses:
+            if status != "applied":
+                return status
+        return "applied"
@@ -12,7 +12,7 @@ class TzKTBlockApiImpl(BlockApi):
         if base_url is None:
             self.api = TzKTApi.from_network(nw["NAME"])
         else:
-            self.api = TzKTApi.from_url(base_url)
+            self.api = TzKTApi.from_url(base_url, network=nw["NAME"])
 
     def get_current_cycle_and_level(self) -> Tuple[int, int]:
         """
@@ -36,3 +36,6 @@ class TzKTBlockApiImpl(BlockApi):
     def get_delegatable(self, pkh):
         account = self.api.get_account_by_address(pkh)
         return account["type"] == "delegate" and bool(account["active"])
+
+    def get_operation_status(self, operation_hash):
+        return self.api.get_operation_status(operation_hash)
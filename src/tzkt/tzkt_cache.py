@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from log_config import main_logger
+
+logger = main_logger.getChild("tzkt_cache")
+
+OBJECTS_DIR = "objects"
+REFS_DIR = "refs"
+OBJECT_SUFFIX = ".json.gz"
+CACHE_MAX_AGE_DAYS = 180
+CACHE_MAX_SIZE_BYTES = 512 * 1024 * 1024
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Default cache, set up once the base directory is known
+split_cache = None
+
+
+class RewardSplitCache:
+    """
+    Content-addressed on-disk cache of finalized reward splits.
+
+    Splits are stored gzip compressed under objects/<sha256 of the split>.
+    A small ref file named after the hash of (network, baker, cycle, provider)
+    points to the object. On read the object is hashed again and any mismatch
+    drops the entry, so a corrupted file is never returned.
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        max_age_days=CACHE_MAX_AGE_DAYS,
+        max_size_bytes=CACHE_MAX_SIZE_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_days * SECONDS_PER_DAY
+        self.max_size_bytes = max_size_bytes
+        self.objects_dir = os.path.join(cache_dir, OBJECTS_DIR)
+        self.refs_dir = os.path.join(cache_dir, REFS_DIR)
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+
+    @staticmethod
+    def key_digest(network, baker, cycle, provider):
+        key = "{}/{}/{}/{}".format(network, baker, int(cycle), provider)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, network, baker, cycle, provider):
+        """
+        Returns the cached split or None if it is not cached or does not
+        pass the integrity check.
+        """
+        ref_path = os.path.join(
+            self.refs_dir, self.key_digest(network, baker, cycle, provider)
+        )
+        with self._lock:
+            try:
+                with open(ref_path, "r") as f:
+                    digest = f.read().strip()
+            except FileNotFoundError:
+                return None
+
+            object_path = self._object_path(digest)
+            try:
+                with gzip.open(object_path, "rb") as f:
+                    payload = f.read()
+            except (OSError, EOFError) as e:
+                logger.debug(
+                    "Dropping unreadable cache entry for cycle {}: {}".format(cycle, e)
+                )
+                self._remove(ref_path, object_path)
+                return None
+
+            if hashlib.sha256(payload).hexdigest() != digest:
+                logger.warning(
+                    "Cached reward split for cycle {} failed the integrity check and is dropped.".format(
+                        cycle
+                    )
+                )
+                self._remove(ref_path, object_path)
+                return None
+
+            # refresh the timestamps to keep recently used entries on eviction
+            os.utime(object_path)
+            os.utime(ref_path)
+
+        logger.debug("Reward split for cycle {} served from cache".format(cycle))
+        return json.loads(payload)
+
+    def put(self, network, baker, cycle, provider, split):
+        payload = json.dumps(split, sort_keys=True, separators=(",", ":")).encode()
+        digest = hashlib.sha256(payload).hexdigest()
+        ref_path = os.path.join(
+            self.refs_dir, self.key_digest(network, baker, cycle, provider)
+        )
+        object_path = self._object_path(digest)
+
+        with self._lock:
+            if not os.path.isfile(object_path):
+                self._write_atomic(object_path, gzip.compress(payload))
+            self._write_atomic(ref_path, digest.encode())
+            self._evict()
+
+        logger.debug("Reward split for cycle {} stored in cache".format(cycle))
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        objects = []
+        for name in os.listdir(self.objects_dir):
+            path = os.path.join(self.objects_dir, name)
+            stat = os.stat(path)
+            if now - stat.st_mtime > self.max_age_seconds:
+                os.remove(path)
+            else:
+                objects.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in objects)
+        for _, size, path in sorted(objects):
+            if total_size <= self.max_size_bytes:
+                break
+            os.remove(path)
+            total_size -= size
+
+        # drop refs whose object is gone
+        for name in os.listdir(self.refs_dir):
+            path = os.path.join(self.refs_dir, name)
+            with open(path, "r") as f:
+                digest = f.read().strip()
+            if not os.path.isfile(self._object_path(digest)):
+                os.remove(path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest + OBJECT_SUFFIX)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove(*paths):
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+def init_split_cache(cache_dir, **kwargs):
+    global split_cache
+    split_cache = RewardSplitCache(cache_dir, **kwargs)
+    return split_cache
+
+
+def get_split_cache():
+    return split_cache
@@ -0,0 +1,143 @@
+import threading
+from collections import deque
+from time import monotonic
+
+from log_config import main_logger
+from tzkt.tzkt_rate_limiter import get_rate_limiter
+
+logger = main_logger.getChild("tzkt_endpoints")
+
+TZKT_HEALTHY_SCORE = 0.5
+TZKT_HEALTH_SMOOTHING = 0.3  # weight of the last request in the health score
+TZKT_ENDPOINT_RETRY_SECONDS = 60  # unhealthy endpoints are tried again after
+TZKT_MAX_LEVEL_LAG = 2  # blocks an endpoint may be behind the most recent one
+TZKT_LATENCY_WINDOW = 200
+TZKT_HEDGE_MIN_SAMPLES = 20
+TZKT_LEVEL_HEADER = "Tzkt-Level"
+
+# Latency percentile after which a hedged request is sent, None disables hedging
+hedge_percentile = None
+
+
+def set_hedge_percentile(percentile):
+    global hedge_percentile
+    hedge_percentile = percentile
+
+
+def get_hedge_percentile():
+    return hedge_percentile
+
+
+def parse_endpoint_urls(base_url):
+    """
+    Accepts one url, a comma separated list of urls or a list of urls, in
+    order of preference.
+    """
+    if isinstance(base_url, str):
+        base_url = base_url.split(",")
+    urls = [url.strip().rstrip("/") for url in base_url]
+    return [url for url in urls if url] or [""]
+
+
+class TzKTEndpoint:
+    """One indexer url with its health score, latencies and indexed level."""
+
+    def __init__(self, url, priority, rate_limiter=None):
+        self.url = url
+        self.priority = priority
+        self.rate_limiter = rate_limiter
+        self.health = 1.0
+        self.level = None
+        self.last_failure = None
+        self.latencies = deque(maxlen=TZKT_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def url_for(self, path):
+        if path.startswith("/"):
+            return self.url + path
+        return self.url + "/" + path
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.health += TZKT_HEALTH_SMOOTHING * (1.0 - self.health)
+
+    def record_failure(self):
+        with self._lock:
+            self.health -= TZKT_HEALTH_SMOOTHING * self.health
+            self.last_failure = monotonic()
+        logger.debug(
+            "Request to {} failed, health is now {:.2f}".format(self.url, self.health)
+        )
+
+    def is_healthy(self, now):
+        with self._lock:
+            return (
+                self.health >= TZKT_HEALTHY_SCORE
+                or self.last_failure is None
+                or now - self.last_failure > TZKT_ENDPOINT_RETRY_SECONDS
+            )
+
+    def latency_percentile(self, percentile):
+        """Returns None until enough requests were timed."""
+        with self._lock:
+            if len(self.latencies) < TZKT_HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(self.latencies)
+        index = min(int(len(latencies) * percentile / 100), len(latencies) - 1)
+        return latencies[index]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "url": self.url,
+                "health": self.health,
+                "level": self.level,
+                "requests_timed": len(self.latencies),
+            }
+
+
+class TzKTEndpointPool:
+    """
+    Indexer endpoints in order of preference.
+
+    Healthy endpoints whose indexed level is not behind the most recent level
+    seen on any endpoint come first, in the configured order. The level is
+    read from the Tzkt-Level header TzKT sends with every response.
+    """
+
+    def __init__(self, urls):
+        self.endpoints = [
+            TzKTEndpoint(url, index, get_rate_limiter(url))
+            for index, url in enumerate(urls)
+        ]
+        self._lock = threading.Lock()
+        self._max_level = None
+
+    @property
+    def primary(self):
+        return self.endpoints[0]
+
+    def ordered(self):
+        now = monotonic()
+        return sorted(
+            self.endpoints,
+            key=lambda e: (not e.is_healthy(now), self.is_lagging(e), e.priority),
+        )
+
+    def record_level(self, endpoint, level):
+        with self._lock:
+            endpoint.level = level
+            if self._max_level is None or level > self._max_level:
+                self._max_level = level
+
+    def is_lagging(self, endpoint):
+        with self._lock:
+            return (
+                endpoint.level is not None
+                and self._max_level is not None
+                and endpoint.level < self._max_level - TZKT_MAX_LEVEL_LAG
+            )
+
+    def get_stats(self) -> list:
+        return [endpoint.get_stats() for endpoint in self.endpoints]
@@ -0,0 +1,85 @@
+import threading
+from time import monotonic
+
+from log_config import main_logger
+
+logger = main_logger.getChild("tzkt_head_state")
+
+TZKT_HEAD_TTL_SECONDS = 4.0
+
+# Head states shared by all TzKTApi instances of the process, one per API url
+head_states = {}
+head_states_lock = threading.Lock()
+
+
+class TzKTHeadState:
+    """
+    Last known indexer head, served from memory while younger than ttl seconds.
+
+    Only one thread refreshes an expired head, the others wait for it and get
+    the refreshed head. Event sources that learn about new heads first, like a
+    head monitor, hand them over with push().
+    """
+
+    def __init__(self, ttl=TZKT_HEAD_TTL_SECONDS):
+        self.ttl = ttl
+        self._head = None
+        self._updated_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def get(self, fetch_head) -> dict:
+        """
+        Returns the cached head or the one returned by fetch_head if the cache
+        is expired. A None head (no content or server error) is not cached.
+        :param fetch_head: function requesting the head from the API
+        """
+        head = self._get_fresh()
+        if head is not None:
+            return head
+
+        with self._refresh_lock:
+            # another thread may have refreshed the head in the meantime
+            head = self._get_fresh()
+            if head is not None:
+                return head
+
+            head = fetch_head()
+            if head is not None:
+                self.push(head)
+            return head
+
+    def push(self, head):
+        """
+        Hook for event sources to set a new head. Heads older than the known
+        one are ignored.
+        :param head: {"level": 0, "cycle": 0, "synced": true, "timestamp": "..."}
+        """
+        with self._lock:
+            if self._head is not None and head["level"] < self._head["level"]:
+                logger.debug(
+                    "Ignoring head at level {} older than known level {}".format(
+                        head["level"], self._head["level"]
+                    )
+                )
+                return
+            self._head = head
+            self._updated_at = monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._updated_at = 0.0
+
+    def _get_fresh(self):
+        with self._lock:
+            if self._head is not None and monotonic() - self._updated_at < self.ttl:
+                return self._head
+            return None
+
+
+def get_head_state(base_url):
+    """Returns the process wide head state of the API at base_url."""
+    with head_states_lock:
+        if base_url not in head_states:
+            head_states[base_url] = TzKTHeadState()
+        return head_states[base_url]
@@ -0,0 +1,196 @@
+import threading
+from email.utils import parsedate_to_datetime
+from time import monotonic, time
+from urllib.parse import urlparse
+
+from log_config import main_logger
+
+logger = main_logger.getChild("tzkt_rate_limiter")
+
+TZKT_INITIAL_RATE = 10.0  # requests per second
+TZKT_MIN_RATE = 0.5
+TZKT_MAX_RATE = 50.0
+TZKT_RATE_INCREASE = 0.1  # added to the rate after every successful request
+TZKT_RATE_DECREASE_FACTOR = 0.5  # applied to the rate on 429
+TZKT_DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+RATE_LIMIT_REMAINING_HEADERS = ["X-RateLimit-Remaining", "RateLimit-Remaining"]
+RATE_LIMIT_RESET_HEADERS = ["X-RateLimit-Reset", "RateLimit-Reset"]
+
+# Limiters shared by all TzKTApi instances of the process, one per API host
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+
+class TzKTRateLimiter:
+    """
+    Token bucket limiting the requests sent to one TzKT host.
+
+    The rate grows additively with every successful response and halves on
+    429 (AIMD). A Retry-After header, or rate limit headers telling
+    that no requests are left, pause the bucket until the given time. When the
+    rate limit headers tell the remaining requests of the current window, the
+    rate is set so they are spread over the time left.
+    """
+
+    def __init__(
+        self,
+        rate=TZKT_INITIAL_RATE,
+        min_rate=TZKT_MIN_RATE,
+        max_rate=TZKT_MAX_RATE,
+        burst=None,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self._rate = self._clamp(rate)
+        self._tokens = 1.0
+        self._last_refill = monotonic()
+        self._paused_until = 0.0
+        self._queue_depth = 0
+        self._condition = threading.Condition()
+
+    def get_rate(self):
+        with self._condition:
+            return self._rate
+
+    def get_queue_depth(self):
+        """Number of threads currently waiting for a token."""
+        with self._condition:
+            return self._queue_depth
+
+    def get_stats(self) -> dict:
+        """
+        :return: {
+            "rate": 0.0,
+            "queue_depth": 0,
+            "paused_for": 0.0
+        }
+        """
+        with self._condition:
+            return {
+                "rate": self._rate,
+                "queue_depth": self._queue_depth,
+                "paused_for": max(self._paused_until - monotonic(), 0.0),
+            }
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        with self._condition:
+            self._queue_depth += 1
+            try:
+                while True:
+                    now = monotonic()
+                    self._refill(now)
+                    if now < self._paused_until:
+                        wait = self._paused_until - now
+                    elif self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    else:
+                        wait = (1.0 - self._tokens) / self._rate
+                    self._condition.wait(wait)
+            finally:
+                self._queue_depth -= 1
+
+    def on_response(self, status_code, headers):
+        """
+        Adapts the rate to a response of the API.
+        :param status_code: HTTP status code of the response
+        :param headers: response headers (case insensitive mapping)
+        """
+        with self._condition:
+            now = monotonic()
+            if status_code == 429:
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                if retry_after is None:
+                    retry_after = TZKT_DEFAULT_RETRY_AFTER_SECONDS
+                self._pause(now + retry_after)
+                self._set_rate(self._rate * TZKT_RATE_DECREASE_FACTOR)
+                logger.debug(
+                    "TzKT rate limit hit, pausing {:.1f}s and lowering the rate to {:.2f}/s".format(
+                        retry_after, self._rate
+                    )
+                )
+            elif status_code < 400:
+                self._set_rate(self._rate + TZKT_RATE_INCREASE)
+
+            remaining = first_header_number(headers, RATE_LIMIT_REMAINING_HEADERS)
+            reset = parse_reset(
+                first_header_number(headers, RATE_LIMIT_RESET_HEADERS), time()
+            )
+            if remaining is not None and reset is not None and reset > 0:
+                if remaining <= 0:
+                    self._pause(now + reset)
+                else:
+                    self._set_rate(remaining / reset)
+
+            self._condition.notify_all()
+
+    def _refill(self, now):
+        capacity = self.burst if self.burst is not None else max(self._rate, 1.0)
+        elapsed = now - self._last_refill
+        self._tokens = min(self._tokens + elapsed * self._rate, capacity)
+        self._last_refill = now
+
+    def _pause(self, until):
+        self._paused_until = max(self._paused_until, until)
+        # nothing saved up during a pause may be spent right after it
+        self._tokens = min(self._tokens, 0.0)
+
+    def _set_rate(self, rate):
+        self._refill(monotonic())
+        self._rate = self._clamp(rate)
+
+    def _clamp(self, rate):
+        return min(max(rate, self.min_rate), self.max_rate)
+
+
+def parse_retry_after(value):
+    """
+    Returns the delay in seconds of a Retry-After header given either as
+    seconds or as an HTTP date, None if it is missing or malformed.
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value, now):
+    """
+    Rate limit reset headers hold either the seconds left in the window or
+    the epoch time the window ends at.
+    """
+    if value is None:
+        return None
+    if value > now / 2:
+        return max(value - now, 0.0)
+    return value
+
+
+def first_header_number(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def get_rate_limiter(base_url):
+    """Returns the process wide limiter of the host serving base_url."""
+    host = urlparse(base_url).netloc or base_url
+    with rate_limiters_lock:
+        if host not in rate_limiters:
+            rate_limiters[host] = TzKTRateLimiter()
+        return rate_limiters[host]
@@ -1,5 +1,4 @@
 from typing import List
-from time import sleep
 
 from api.reward_api import RewardApi
 from model.reward_provider_model import RewardProviderModel
@@ -13,7 +12,7 @@ class TzKTRewardApiImpl(RewardApi):
         if base_url is None:
             self.api = TzKTApi.from_network(nw["NAME"])
         else:
-            self.api = TzKTApi.from_url(base_url)
+            self.api = TzKTApi.from_url(base_url, network=nw["NAME"])
         self.baking_address = baking_address
         self.name = "tzkt"
 
@@ -71,14 +70,16 @@ class TzKTRewardApiImpl(RewardApi):
         )
 
         delegators_balances = {
-            item["address"]: {
-                "delegated_balance": item["delegatedBalance"],
+            address: {
+                "delegated_balance": delegated_balance,
                 # FIXME: current_balance is deprecated and no longer accurate
                 # Instead, tzkt provides a boolean "empty" that can be used.
-                "current_balance": item["currentDelegatedBalance"],
+                "current_balance": current_delegated_balance,
             }
-            for item in split["delegators"]
-            if item["balance"] > 0
+            for address, delegated_balance, current_delegated_balance, balance in split[
+                "delegators"
+            ].rows()
+            if balance > 0
         }
 
         return RewardProviderModel(
@@ -100,7 +101,8 @@ class TzKTRewardApiImpl(RewardApi):
         Updates current balance for each iten in list [MODIFIES STATE]
         :param reward_logs: List[RewardLog]
         """
+        balances = self.api.get_balances_by_addresses(
+            [rl.address for rl in reward_logs]
+        )
         for rl in reward_logs:
-            account = self.api.get_account_by_address(rl.address)
-            rl.current_balance = account["balance"]
-            sleep(self.api.delay_between_calls)
+            rl.current_balance = balances[rl.address]
@@ -0,0 +1,217 @@
+import codecs
+import json
+from array import array
+
+# Delegator fields of a reward split page used by the reward calculation
+DELEGATOR_FIELDS = ["address", "delegatedBalance", "currentDelegatedBalance", "balance"]
+SPLIT_STREAM_CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+
+
+class DelegatorColumns:
+    """
+    Delegators of a reward split stored column by column.
+
+    Only the fields listed in DELEGATOR_FIELDS are kept and balances are
+    stored in int64 arrays, a fraction of the memory of one dict per delegator.
+    Iterating yields one dict per delegator with the TzKT field names.
+    """
+
+    def __init__(self):
+        self.addresses = []
+        self.delegated_balances = array("q")
+        self.current_delegated_balances = array("q")
+        self.balances = array("q")
+
+    @staticmethod
+    def from_json(delegators):
+        """
+        Builds columns from a list of delegator dicts as returned by TzKT or
+        from the output of to_json. Columns are returned as they are.
+        """
+        if isinstance(delegators, DelegatorColumns):
+            return delegators
+        columns = DelegatorColumns()
+        if isinstance(delegators, dict):
+            columns.addresses = list(delegators["address"])
+            columns.delegated_balances = array("q", delegators["delegatedBalance"])
+            # the current balances are left out of cached splits
+            columns.current_delegated_balances = array(
+                "q",
+                delegators.get("currentDelegatedBalance")
+                or [0] * len(columns.addresses),
+            )
+            columns.balances = array("q", delegators["balance"])
+        else:
+            columns.extend(delegators)
+        return columns
+
+    def to_json(self) -> dict:
+        return {
+            "address": self.addresses,
+            "delegatedBalance": self.delegated_balances.tolist(),
+            "currentDelegatedBalance": self.current_delegated_balances.tolist(),
+            "balance": self.balances.tolist(),
+        }
+
+    def set_current_delegated_balances(self, balances):
+        """
+        :param balances: current balance by address, 0 for those missing
+        """
+        self.current_delegated_balances = array(
+            "q", (balances.get(address) or 0 for address in self.addresses)
+        )
+
+    def append(self, delegator):
+        self.addresses.append(delegator["address"])
+        self.delegated_balances.append(delegator.get("delegatedBalance") or 0)
+        self.current_delegated_balances.append(
+            delegator.get("currentDelegatedBalance") or 0
+        )
+        self.balances.append(delegator.get("balance") or 0)
+
+    def extend(self, delegators):
+        if isinstance(delegators, DelegatorColumns):
+            self.addresses.extend(delegators.addresses)
+            self.delegated_balances.extend(delegators.delegated_balances)
+            self.current_delegated_balances.extend(
+                delegators.current_delegated_balances
+            )
+            self.balances.extend(delegators.balances)
+        else:
+            for delegator in delegators:
+                self.append(delegator)
+
+    def rows(self):
+        """Yields (address, delegatedBalance, currentDelegatedBalance, balance)."""
+        return zip(
+            self.addresses,
+            self.delegated_balances,
+            self.current_delegated_balances,
+            self.balances,
+        )
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __iter__(self):
+        for row in self.rows():
+            yield dict(zip(DELEGATOR_FIELDS, row))
+
+    def __eq__(self, other):
+        return isinstance(other, DelegatorColumns) and self.to_json() == other.to_json()
+
+    def __repr__(self):
+        return "DelegatorColumns({} delegators)".format(len(self))
+
+
+class SplitPageDecoder:
+    """
+    Incremental decoder of one reward split page.
+
+    The text around the delegators array is kept and parsed at the end, it
+    only holds the scalar fields of the split. Delegators are decoded one at
+    a time as the response arrives and go straight into DelegatorColumns, so
+    neither the whole payload nor a list of full dicts is held in memory.
+    """
+
+    HEAD, DELEGATORS, TAIL = range(3)
+
+    def __init__(self):
+        self.columns = DelegatorColumns()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._state = self.HEAD
+        self._outer = []
+        self._buffer = ""
+        # scanner state of the outer object
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+
+    def feed(self, chunk):
+        text = self._text_decoder.decode(chunk)
+        if self._state == self.HEAD:
+            self._scan_head(text)
+        elif self._state == self.DELEGATORS:
+            self._buffer += text
+            self._decode_delegators()
+        else:
+            self._outer.append(text)
+
+    def close(self) -> dict:
+        self.feed(b"")
+        if self._state == self.DELEGATORS:
+            raise ValueError("Reward split ended inside the delegators list")
+        page = json.loads("".join(self._outer))
+        if self._state == self.TAIL:
+            page["delegators"] = self.columns
+        return page
+
+    def _scan_head(self, text):
+        head = (self._outer.pop() if self._outer else "") + text
+        for i in range(len(head) - len(text), len(head)):
+            c = head[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = head[self._string_start + 1 : i]
+            elif c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif c == "," and self._depth == 1:
+                self._key = None
+            elif c in "{[":
+                if c == "[" and self._depth == 1 and self._key == "delegators":
+                    self._outer.append(head[: i + 1])
+                    self._state = self.DELEGATORS
+                    self._buffer = head[i + 1 :]
+                    self._decode_delegators()
+                    return
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+        self._outer.append(head)
+
+    def _decode_delegators(self):
+        buffer = self._buffer
+        pos = 0
+        while True:
+            while pos < len(buffer) and (
+                buffer[pos] in WHITESPACE or buffer[pos] == ","
+            ):
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._state = self.TAIL
+                self._outer.append(buffer[pos:])
+                self._buffer = ""
+                return
+            try:
+                delegator, pos = self._json_decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # wait for the rest of the delegator
+                break
+            self.columns.append(delegator)
+        self._buffer = buffer[pos:]
+
+
+def decode_split_page(chunks) -> dict:
+    """
+    Decodes a reward split page from an iterable of bytes chunks, delegators
+    are returned as DelegatorColumns.
+    """
+    decoder = SplitPageDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
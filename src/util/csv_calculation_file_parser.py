@@ -1,8 +1,10 @@
 import csv
+import logging
 from log_config import main_logger
 from Constants import RewardsType
 
 from model.reward_log import RewardLog
+from util.lazy_logging import is_logging_enabled, LogSampler
 
 logger = main_logger.getChild("payment_producer")
 
@@ -160,6 +162,9 @@ class CsvCalculationFileParser:
                 ]
             )
 
+            # the report holds every row, the debug log only a sample of them
+            log_rows = is_logging_enabled(logger, logging.DEBUG)
+            sampler = LogSampler()
             for pymnt_log in payment_logs:
                 # write row to csv file
                 array = [
@@ -194,6 +199,8 @@ class CsvCalculationFileParser:
                 ]
                 csv_writer.writerow(array)
 
+                if not (log_rows and sampler.sample()):
+                    continue
                 logger.debug(
                     "Reward created for {:s} type: {:s}, stake bal: {:<,d} mutez, cur bal: {:<,d} mutez, ratio: {:.6f}, fee_ratio: {:.6f}, "
                     "amount: {:<,d} mutez, fee_amount: {:<,d} mutez, fee_rate: {:.2f}, overestimate: {}, adjustment: {:<,d}, adjustment_amount: {:<,d}, delegate_transaction_fee: {}, delegator_transaction_fee: {}, payable: {:d}, skipped: {:d}, at-phase: {:d}, "
@@ -229,4 +236,11 @@ class CsvCalculationFileParser:
                     )
                 )
 
+            if sampler.num_skipped:
+                logger.debug(
+                    "{} more rewards written to the report but not logged".format(
+                        sampler.num_skipped
+                    )
+                )
+
         logger.info("Calculation report is created at '{}'".format(report_file))
@@ -29,6 +29,7 @@ class CsvPaymentFileParser:
         reward_log.hash = None if row["hash"] == "None" else row["hash"]
         reward_log.paid = PaymentStatus[str(row["paid"]).upper()]
         reward_log.desc = str(row["description"])
+        reward_log.source = row.get("source") or None
 
         return reward_log
 
@@ -47,10 +48,16 @@ class CsvPaymentFileParser:
                         "hash",
                         "paid",
                         "description",
+                        "fee",
+                        "gas_fee",
+                        "size_fee",
+                        "base_fee",
+                        "source",
                     ]
                 )
 
                 for payment_log in payment_logs:
+                    fee_breakdown = payment_log.fee_breakdown
                     csv_writer.writerow(
                         [
                             str(payment_log.paymentaddress),
@@ -60,6 +67,17 @@ class CsvPaymentFileParser:
                             str(payment_log.paid.name).lower(),
                             str(payment_log.desc),
                         ]
+                        + (
+                            [
+                                fee_breakdown.fee,
+                                fee_breakdown.gas_fee,
+                                fee_breakdown.size_fee,
+                                fee_breakdown.base_fee,
+                            ]
+                            if fee_breakdown
+                            else ["", "", "", ""]
+                        )
+                        + [str(payment_log.source) if payment_log.source else ""]
                     )
 
         except Exception as e:
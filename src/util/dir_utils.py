@@ -1,11 +1,13 @@
 import os
 
+from Constants import CACHE_DIR
 from log_config import main_logger
 
 logger = main_logger
 
 PAYMENT_DONE_DIR = "done"
 PAYMENT_FAILED_DIR = "failed"
+PAYMENT_PLANS_DIR = "plans"
 BUSY_FILE = ".BUSY"
 PAYMENTS_ROOT_DIR = "payments"
 CALCULATIONS_ROOT_DIR = "calculations"
@@ -35,6 +37,28 @@ def get_failed_payments_dir(pymnt_root, create=None):
     return root_dir
 
 
+def get_payment_plans_dir(pymnt_root, create=None):
+    root_dir = os.path.abspath(os.path.join(pymnt_root, PAYMENT_PLANS_DIR))
+    if create and not os.path.isdir(root_dir):
+        os.makedirs(root_dir)
+    return root_dir
+
+
+def get_payment_plan_file_path(plans_root, pymnt_cycle, source):
+    return os.path.abspath(
+        os.path.join(plans_root, "{}_{}.json".format(pymnt_cycle, source))
+    )
+
+
+def get_cache_root(base_directory, create=None):
+    root_dir = os.path.abspath(
+        os.path.join(os.path.expanduser(os.path.normpath(base_directory)), CACHE_DIR)
+    )
+    if create and not os.path.isdir(root_dir):
+        os.makedirs(root_dir)
+    return root_dir
+
+
 def get_busy_file(failed_payment_report_file):
     return failed_payment_report_file + BUSY_FILE
 
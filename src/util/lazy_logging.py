@@ -0,0 +1,97 @@
+import logging
+import reprlib
+from itertools import count
+
+LOG_MAX_PAYLOAD_CHARS = 4000
+LOG_MAX_PAYLOAD_ITEMS = 50  # items shown of each list or dict in a payload
+LOG_MAX_PAYLOAD_DEPTH = 8
+LOG_SAMPLE_FIRST = 20
+LOG_SAMPLE_EVERY = 100
+
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = LOG_MAX_PAYLOAD_DEPTH
+_payload_repr.maxlist = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxtuple = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxdict = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxset = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxfrozenset = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxdeque = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxarray = LOG_MAX_PAYLOAD_ITEMS
+_payload_repr.maxstring = LOG_MAX_PAYLOAD_CHARS
+_payload_repr.maxlong = LOG_MAX_PAYLOAD_CHARS
+_payload_repr.maxother = LOG_MAX_PAYLOAD_CHARS
+
+
+def is_logging_enabled(logger, level=logging.DEBUG):
+    """
+    Returns True if a record of the given level would be written somewhere.
+
+    Unlike Logger.isEnabledFor, loggers whose only handlers are NullHandlers,
+    like the verbose logger when verbose mode is off, are not enabled.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+
+    found_handler = False
+    current = logger
+    while current is not None:
+        for handler in current.handlers:
+            if isinstance(handler, logging.NullHandler):
+                found_handler = True
+            elif level >= handler.level:
+                return True
+        if not current.propagate:
+            break
+        current = current.parent
+
+    # Python falls back to logging.lastResort only if no handler was found
+    last_resort = logging.lastResort
+    return not found_handler and last_resort is not None and level >= last_resort.level
+
+
+def truncate(text, max_chars=LOG_MAX_PAYLOAD_CHARS):
+    if len(text) <= max_chars:
+        return text
+    return "{}... ({} more characters)".format(text[:max_chars], len(text) - max_chars)
+
+
+class LazyPayload:
+    """
+    Log argument formatting a payload only when a handler emits the record.
+
+    Lists and dicts are cut after LOG_MAX_PAYLOAD_ITEMS items and the text
+    after max_chars characters, so multi-megabyte responses stay cheap to log.
+    Pass it as a %-style argument: logger.debug("Answer is |%s|", LazyPayload(x))
+    """
+
+    __slots__ = ("payload", "max_chars")
+
+    def __init__(self, payload, max_chars=LOG_MAX_PAYLOAD_CHARS):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self):
+        if isinstance(self.payload, str):
+            return truncate(self.payload, self.max_chars)
+        return truncate(_payload_repr.repr(self.payload), self.max_chars)
+
+    __repr__ = __str__
+
+
+class LogSampler:
+    """
+    Lets the first `first` records of a loop through, then one in `every`.
+    """
+
+    def __init__(self, first=LOG_SAMPLE_FIRST, every=LOG_SAMPLE_EVERY):
+        self.first = first
+        self.every = every
+        self._counter = count()
+        self.num_skipped = 0
+
+    def sample(self) -> bool:
+        index = next(self._counter)
+        if index < self.first or (index - self.first) % self.every == self.every - 1:
+            return True
+        self.num_skipped += 1
+        return False
@@ -34,7 +34,9 @@ def build_parser():
     add_argument_stats(argparser)
     add_argument_verbose(argparser)
     add_argument_api_base_url(argparser)
+    add_argument_api_hedge_percentile(argparser)
     add_argument_retry_injected(argparser)
+    add_argument_forge_check(argparser)
     add_argument_syslog(argparser)
     add_argument_log_file(argparser)
     return argparser
@@ -223,11 +225,32 @@ def add_argument_api_base_url(argparser):
     argparser.add_argument(
         "-U",
         "--api_base_url",
-        help="Base API url for non-rpc providers. If not set, public endpoints will be used.",
+        help="Base API url for non-rpc providers. If not set, public endpoints will be used. "
+        "Several urls can be given separated by commas, in order of preference, e.g. a self-hosted "
+        "indexer first and the public one second. Requests fail over to the next url.",
         type=str,
     )
 
 
+def percentile(value):
+    percentile = float(value)
+    if not 0 < percentile < 100:
+        raise argparse.ArgumentTypeError(
+            "{} is not a percentile between 0 and 100, both excluded".format(value)
+        )
+    return percentile
+
+
+def add_argument_api_hedge_percentile(argparser):
+    argparser.add_argument(
+        "--api_hedge_percentile",
+        help="Percentile of the latencies of an API url after which a second request is sent "
+        "to the next url given in --api_base_url, between 0 and 100 excluded, e.g. 95. "
+        "Disabled if not set.",
+        type=percentile,
+    )
+
+
 def add_argument_retry_injected(argparser):
     argparser.add_argument(
         "-inj",
@@ -237,6 +260,15 @@ def add_argument_retry_injected(argparser):
     )
 
 
+def add_argument_forge_check(argparser):
+    argparser.add_argument(
+        "--forge_check",
+        help="Operations are forged locally. With this option the node forges them too and its bytes are used "
+        "if they differ from the local ones.",
+        action="store_true",
+    )
+
+
 def add_argument_syslog(argparser):
     argparser.add_argument(
         "--syslog", help="Log to syslog. Useful in daemon mode.", action="store_true"
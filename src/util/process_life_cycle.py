@@ -23,6 +23,10 @@ from pay.payment_consumer import PaymentConsumer
 from pay.payment_producer import EXIT_CODE_FILE, PaymentProducer
 from util.config_life_cycle import ConfigLifeCycle
 from util.lock_file import LockFile
+from tzkt.tzkt_cache import init_split_cache
+from pay.estimate_cache import init_estimate_cache
+from tzkt.tzkt_endpoints import set_hedge_percentile
+from pay.forge import set_forge_check
 from log_config import main_logger, init, verbose_logger
 from plugins import plugins
 from util.exit_program import exit_program, ExitCode
@@ -251,6 +255,8 @@ class ProcessLifeCycle:
 
     def do_parse_args(self, e):
         self.__args = parse_arguments()
+        set_hedge_percentile(self.__args.api_hedge_percentile)
+        set_forge_check(self.__args.forge_check)
 
     def print_argument_configuration(self, e=None):
         mode = "daemon" if self.args.background_service else "interactive"
@@ -304,6 +310,8 @@ class ProcessLifeCycle:
 
     def do_set_up_dirs(self, e):
         self.__baking_dirs = BakingDirs(self.args, self.__cfg.get_baking_address())
+        init_split_cache(self.__baking_dirs.cache_root)
+        init_estimate_cache(self.__baking_dirs.cache_root)
 
     def do_register_signals(self, e):
         for sig in (SIGABRT, SIGILL, SIGSEGV, SIGTERM):
@@ -370,6 +378,7 @@ class ProcessLifeCycle:
             publish_stats=not self.args.do_not_publish_stats,
             calculations_dir=self.__baking_dirs.calculations_root,
             baking_address=self.__cfg.get_baking_address(),
+            payment_addresses=self.__cfg.get_payment_addresses(),
         ).start()
 
     def do_shut_down(self, e):
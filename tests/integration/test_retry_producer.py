@@ -219,6 +219,33 @@ class TestRetryProducer(TestCase):
         self.assertEqual(5, hash_xxx_op_count)
         self.assertEqual(0, failed_reports_count)
 
+    def test_retry_failed_payments_with_applied_operation(self):
+        """The failed items of the report share an operation hash, which the
+        indexer knows as applied. They are not paid again.
+        """
+        payment_queue = queue.Queue(100)
+        payment_producer = _TestPaymentProducer()
+        payment_producer.block_api = MagicMock()
+        payment_producer.block_api.get_operation_status.return_value = "applied"
+
+        retry_producer = RetryProducer(
+            payment_queue,
+            _DummyRpcRewardApi(),
+            payment_producer,
+            TEST_REPORT_TEMP_DIR,
+            10,
+        )
+        retry_producer.retry_failed_payments()
+
+        payment_batch = payment_queue.get()
+        self.assertEqual(
+            0,
+            len([row for row in payment_batch.batch if row.paid.is_fail()]),
+        )
+        payment_producer.block_api.get_operation_status.assert_called_once_with(
+            "ooa5VV7bNvLtk7kaWiZfgyTxWvvJckVq1yM8bRFVK6PhdPNaxpF"
+        )
+
     def tearDown(self):
         shutil.rmtree(TEST_REPORT_TEMP_DIR)
 
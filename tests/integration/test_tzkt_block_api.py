@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from src.Constants import DEFAULT_NETWORK_CONFIG_MAP
 from src.tzkt.tzkt_block_api import TzKTBlockApiImpl
+from src.tzkt.tzkt_head_state import TzKTHeadState
 from tests.utils import Constants
 
 MAINNET_ADDRESS_DELEGATOR = Constants.MAINNET_ADDRESS_DELEGATOR
@@ -9,6 +10,8 @@ MAINNET_ADDRESS_STAKENOW_BAKER = Constants.MAINNET_ADDRESS_STAKENOW_BAKER
 
 
 class MockResponse:
+    headers = {}
+
     def json(self):
         return None
 
@@ -19,7 +22,10 @@ class MockResponse:
 
 @pytest.fixture
 def address_api():
-    return TzKTBlockApiImpl(DEFAULT_NETWORK_CONFIG_MAP["MAINNET"])
+    api = TzKTBlockApiImpl(DEFAULT_NETWORK_CONFIG_MAP["MAINNET"])
+    # do not share the mocked head with other tests
+    api.api.head_state = TzKTHeadState()
+    return api
 
 
 class MockRelevationResponse(MockResponse):
@@ -28,7 +34,7 @@ class MockRelevationResponse(MockResponse):
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=MockRelevationResponse()),
 )
 def test_get_revelation(address_api):
@@ -41,7 +47,7 @@ class MockCycleLevelResponse(MockResponse):
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=MockCycleLevelResponse()),
 )
 def test_get_current_cycle_and_level(address_api):
@@ -54,7 +60,7 @@ class MockDelegatableResponse(MockResponse):
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=MockDelegatableResponse()),
 )
 def test_get_delegatable_baker(address_api):
@@ -67,7 +73,7 @@ class MockNonDelegatableResponse(MockResponse):
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=MockNonDelegatableResponse()),
 )
 def test_get_delegatable_non_baker(address_api):
@@ -8,6 +8,7 @@ from src.Constants import (
     MAX_SEQUENT_CALLS,
 )
 from src.tzkt.tzkt_reward_api import TzKTRewardApiImpl, RewardLog
+from src.tzkt.tzkt_rate_limiter import TzKTRateLimiter
 from tests.utils import Constants
 
 MAINNET_ADDRESS_STAKENOW_BAKER = Constants.MAINNET_ADDRESS_STAKENOW_BAKER
@@ -27,7 +28,7 @@ dummy_addr_dict = dict(
 )
 
 
-@patch("src.tzkt.tzkt_reward_api.sleep", MagicMock())
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
 @vcr.use_cassette(
     "tests/integration/cassettes/tzkt_api/test_update_current_balances.yaml",
     filter_headers=["X-API-Key", "authorization"],
@@ -52,13 +53,18 @@ def test_update_current_balances():
 
 @pytest.fixture
 def address_api():
-    return TzKTRewardApiImpl(
+    api = TzKTRewardApiImpl(
         nw=DEFAULT_NETWORK_CONFIG_MAP["MAINNET"],
         baking_address=MAINNET_ADDRESS_STAKENOW_BAKER,
     )
+    # the retry tests send MAX_SEQUENT_CALLS requests, do not throttle them
+    api.api.rate_limiter = TzKTRateLimiter(rate=10000, max_rate=10000)
+    return api
 
 
 class Mock_404_Response:
+    headers = {}
+
     def json(self):
         return None
 
@@ -72,7 +78,7 @@ class Mock_404_Response:
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=Mock_404_Response()),
 )
 @patch("tzkt.tzkt_api.sleep", MagicMock())
@@ -88,6 +94,8 @@ def test_tzkt_terminate_404(address_api):
 
 
 class Mock_500_Response:
+    headers = {}
+
     def json(self):
         return {}
 
@@ -101,7 +109,7 @@ class Mock_500_Response:
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=Mock_500_Response()),
 )
 @patch("tzkt.tzkt_api.sleep", MagicMock())
@@ -117,6 +125,8 @@ def test_tzkt_retry_500(address_api):
 
 
 class Mock_204_Response:
+    headers = {}
+
     def json(self):
         return {}
 
@@ -130,7 +140,7 @@ class Mock_204_Response:
 
 
 @patch(
-    "src.tzkt.tzkt_api.requests.get",
+    "src.tzkt.tzkt_api.requests.Session.get",
     MagicMock(return_value=Mock_204_Response()),
 )
 @patch("tzkt.tzkt_api.sleep", MagicMock())
@@ -0,0 +1,153 @@
+import json
+import tracemalloc
+import pytest
+from time import process_time
+from src.pay.forge import forge_operation_group, forged_size, IMPLICIT_PREFIXES
+from src.pay.operation_group import OperationGroup, Transaction
+import base58
+
+NB_OPERATIONS = 200
+NB_BATCHES = 50
+BRANCH = "BKkgLXYjM3DhdgzUuk2y6wQibYNmTDBZuj8Raa9PYEFvgrBeUhd"
+CHAIN_ID = "NetXdQprcVkpaWU"
+PROTOCOL = "PtHangz2aRngywmSRGGvrcTyMbbdpWdpFKuS4uMWxg2RaH9i1qx"
+SIGNATURE = "edsigtXomBKi5CTRf5cjATJWSyaRvhfYNHqSUGrn4SdbYRcGwQrUGjzEfQDTuqHhuA8b2d8NarZjz8TRf65WkpQmo423BtomS8Q"
+SOURCE = "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ"
+COUNTER = 7117400
+
+# string templates of the operation contents and RPC bodies, the former behaviour
+CONTENT = '{"kind":"transaction","source":"%SOURCE%","destination":"%DESTINATION%","fee":"%fee%","counter":"%COUNTER%","gas_limit":"%gas_limit%","storage_limit":"%storage_limit%","amount":"%AMOUNT%"}'
+FORGE_JSON = '{"branch": "%BRANCH%","contents":[%CONTENT%]}'
+RUNOPS_JSON = '{"branch": "%BRANCH%","contents":[%CONTENT%], "signature":"%SIGNATURE%"}'
+PREAPPLY_JSON = '[{"protocol":"%PROTOCOL%","branch":"%BRANCH%","contents":[%CONTENT%],"signature":"%SIGNATURE%"}]'
+JSON_WRAP = '{"operation": %JSON%,"chain_id":"%chain_id%"}'
+
+
+def payouts():
+    return [
+        (
+            base58.b58encode_check(
+                IMPLICIT_PREFIXES["tz1"][0] + index.to_bytes(20, "big")
+            ).decode(),
+            1000000 + index,
+        )
+        for index in range(NB_OPERATIONS)
+    ]
+
+
+def template_batch(payouts):
+    """
+    Builds the contents of a batch and the bodies of its RPCs with the string
+    templates. The contents are forged alike in both cases, only the contents
+    given to the forge are built.
+    """
+    templates = [
+        CONTENT.replace("%SOURCE%", SOURCE)
+        .replace("%DESTINATION%", destination)
+        .replace("%AMOUNT%", str(amount))
+        .replace("%fee%", "298")
+        .replace("%gas_limit%", "1400")
+        .replace("%storage_limit%", "0")
+        for destination, amount in payouts
+    ]
+    content_list = [
+        template.replace("%COUNTER%", str(COUNTER + 1 + i))
+        for i, template in enumerate(templates)
+    ]
+    contents_string = ",".join(content_list)
+    runops_json = (
+        RUNOPS_JSON.replace("%BRANCH%", BRANCH)
+        .replace("%CONTENT%", contents_string)
+        .replace("%SIGNATURE%", SIGNATURE)
+    )
+    runops_json = JSON_WRAP.replace("%JSON%", runops_json).replace(
+        "%chain_id%", CHAIN_ID
+    )
+
+    contents = [json.loads(content) for content in content_list]
+    forged_size(contents)
+    contents[0]["fee"] = "1298"
+    content_list[0] = json.dumps(contents[0])
+    contents_string = ",".join(content_list)
+
+    FORGE_JSON.replace("%BRANCH%", BRANCH).replace("%CONTENT%", contents_string)
+    forge_contents = json.loads("[{}]".format(contents_string))
+    preapply_json = (
+        PREAPPLY_JSON.replace("%BRANCH%", BRANCH)
+        .replace("%CONTENT%", contents_string)
+        .replace("%PROTOCOL%", PROTOCOL)
+        .replace("%SIGNATURE%", SIGNATURE)
+    )
+    return runops_json, forge_contents, preapply_json
+
+
+def group_batch(payouts):
+    """Builds the same with the operation group model."""
+    contents = [
+        Transaction(SOURCE, destination, amount, 298, 1400, 0)
+        for destination, amount in payouts
+    ]
+    for i, content in enumerate(contents):
+        content.set_counter(COUNTER + 1 + i)
+    operation_group = OperationGroup(BRANCH, contents)
+    runops_json = operation_group.run_operation_json(CHAIN_ID)
+
+    forged_size(operation_group.content_dicts())
+    contents[0].set_fee(1298)
+
+    forge_contents = operation_group.content_dicts()
+    preapply_json = operation_group.preapply_json(PROTOCOL, SIGNATURE)
+    return runops_json, forge_contents, preapply_json
+
+
+def measure(batch, payouts):
+    """CPU seconds and allocated KiB per batch."""
+    start = process_time()
+    for _ in range(NB_BATCHES):
+        batch(payouts)
+    cpu_seconds = (process_time() - start) / NB_BATCHES
+
+    tracemalloc.start()
+    try:
+        batch(payouts)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return cpu_seconds, peak / 1024
+
+
+def test_operation_group_batch_bodies():
+    """The string templates and the operation group model send the same
+    requests to the node."""
+    batch_payouts = payouts()
+
+    template_bodies = template_batch(batch_payouts)
+    group_bodies = group_batch(batch_payouts)
+    assert json.loads(template_bodies[0]) == json.loads(group_bodies[0])
+    assert forge_operation_group(BRANCH, template_bodies[1]) == forge_operation_group(
+        BRANCH, group_bodies[1]
+    )
+    assert json.loads(template_bodies[2]) == json.loads(group_bodies[2])
+
+
+@pytest.mark.benchmark
+def test_operation_group_batch_cpu_and_memory():
+    """CPU and memory spent building the contents and RPC bodies of a batch
+    of 200 payouts with the string templates and with the operation group
+    model."""
+    batch_payouts = payouts()
+
+    template_seconds, template_kib = measure(template_batch, batch_payouts)
+    group_seconds, group_kib = measure(group_batch, batch_payouts)
+
+    print(
+        "\nBatch of {} operations: templates {:.2f} ms ({:.0f} KiB peak), operation group {:.2f} ms ({:.0f} KiB peak) CPU per batch".format(
+            NB_OPERATIONS,
+            template_seconds * 1000,
+            template_kib,
+            group_seconds * 1000,
+            group_kib,
+        )
+    )
+    assert group_seconds < template_seconds
+    assert group_kib < template_kib
@@ -0,0 +1,122 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from src.tzkt.tzkt_split_decoder import decode_split_page
+
+NB_DELEGATORS = 100000
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+# Each mode loads the split the way the reward API consumes it and prints the
+# peak RSS of the process in KiB, measured in a fresh interpreter.
+MEASURE = """
+import json, resource, sys
+from src.tzkt.tzkt_split_decoder import decode_split_page
+
+mode, path = sys.argv[1], sys.argv[2]
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+if mode == "json":
+    with open(path, "rb") as f:
+        split = json.loads(f.read())
+    delegators = []
+    delegators.extend(split["delegators"])
+    balances = {
+        item["address"]: {
+            "delegated_balance": item["delegatedBalance"],
+            "current_balance": item["currentDelegatedBalance"],
+        }
+        for item in delegators
+        if item["balance"] > 0
+    }
+else:
+    with open(path, "rb") as f:
+        split = decode_split_page(iter(lambda: f.read(64 * 1024), b""))
+    balances = {
+        address: {
+            "delegated_balance": delegated_balance,
+            "current_balance": current_delegated_balance,
+        }
+        for address, delegated_balance, current_delegated_balance, balance in split[
+            "delegators"
+        ].rows()
+        if balance > 0
+    }
+
+assert len(balances) == {nb_delegators}
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+""".replace(
+    "{nb_delegators}", str(NB_DELEGATORS)
+)
+
+
+def write_split(path, nb_delegators=NB_DELEGATORS):
+    """Write a TzKT like split page with all the delegator fields TzKT returns."""
+    with open(path, "w") as f:
+        f.write('{"cycle":700,"delegatorsCount":%d,"delegators":[' % nb_delegators)
+        for index in range(nb_delegators):
+            if index:
+                f.write(",")
+            json.dump(
+                {
+                    "address": "tz1{:033d}".format(index),
+                    "delegatedBalance": 1000000 + index,
+                    "stakedBalance": 0,
+                    "stakedPseudotokens": None,
+                    "currentDelegatedBalance": 1000000 + index,
+                    "currentStakedBalance": 0,
+                    "balance": 1000000 + index,
+                    "emptied": False,
+                },
+                f,
+                separators=(",", ":"),
+            )
+        f.write("]}")
+
+
+def peak_rss_kib(mode, path):
+    output = subprocess.check_output(
+        [sys.executable, "-c", MEASURE, mode, path], cwd=PROJECT_ROOT
+    )
+    return int(output.decode().strip())
+
+
+def test_split_decode_rows(tmp_path):
+    """The streaming decoder reads the same delegators as json."""
+    path = str(tmp_path / "split.json")
+    write_split(path, nb_delegators=1000)
+
+    with open(path, "rb") as f:
+        delegators = json.loads(f.read())["delegators"]
+    with open(path, "rb") as f:
+        split = decode_split_page(iter(lambda: f.read(4096), b""))
+
+    assert list(split["delegators"].rows()) == [
+        (
+            item["address"],
+            item["delegatedBalance"],
+            item["currentDelegatedBalance"],
+            item["balance"],
+        )
+        for item in delegators
+    ]
+
+
+@pytest.mark.benchmark
+def test_split_decode_peak_rss(tmp_path):
+    path = str(tmp_path / "split.json")
+    write_split(path)
+
+    json_kib = peak_rss_kib("json", path)
+    stream_kib = peak_rss_kib("stream", path)
+
+    print(
+        "\nPeak RSS increase for {} delegators ({:.1f} MiB payload): json {:.1f} MiB, streaming {:.1f} MiB".format(
+            NB_DELEGATORS,
+            os.path.getsize(path) / 2**20,
+            json_kib / 1024,
+            stream_kib / 1024,
+        )
+    )
+    assert stream_kib < json_kib
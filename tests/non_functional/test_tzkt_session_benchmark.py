@@ -0,0 +1,61 @@
+import requests
+from time import perf_counter
+from http import HTTPStatus
+from src.Constants import VERSION
+from src.tzkt.tzkt_api import TzKTApi
+from src.tzkt.tzkt_rate_limiter import TzKTRateLimiter
+from src.tzkt.tzkt_head_state import TzKTHeadState
+from tests.utils import LocalHttpServer
+
+NB_REQUESTS = 100
+
+
+def head_route(path):
+    return HTTPStatus.OK, {"synced": True, "cycle": 434, "level": 1972459}
+
+
+def mean_latency_ms(call):
+    start = perf_counter()
+    for _ in range(NB_REQUESTS):
+        call()
+    return (perf_counter() - start) * 1000 / NB_REQUESTS
+
+
+def test_pooled_session_benchmark():
+    """Compare per-request latency of one pooled keep-alive session against
+    a fresh connection for every request (the former requests.get behaviour).
+    """
+    with LocalHttpServer(head_route) as server:
+        unpooled_ms = mean_latency_ms(
+            lambda: requests.get(
+                url=server.url + "/head",
+                timeout=5,
+                headers={"User-Agent": f"trd-{VERSION}", "Connection": "close"},
+            ).json()
+        )
+        unpooled_connections = server.num_connections
+
+        tzkt = TzKTApi(
+            server.url,
+            timeout=5,
+            rate_limiter=TzKTRateLimiter(rate=10000, max_rate=10000),
+            # every call must reach the server
+            head_state=TzKTHeadState(ttl=0),
+        )
+        pooled_ms = mean_latency_ms(tzkt.get_head)
+        pooled_connections = server.num_connections - unpooled_connections
+        stats = tzkt.get_connection_stats()
+        tzkt.close()
+
+    print(
+        "\nPer-request latency over {} requests: unpooled {:.3f} ms, pooled {:.3f} ms".format(
+            NB_REQUESTS, unpooled_ms, pooled_ms
+        )
+    )
+    assert unpooled_connections == NB_REQUESTS
+    assert pooled_connections == 1
+    assert stats == {
+        "requests": NB_REQUESTS,
+        "connections": 1,
+        "reused": NB_REQUESTS - 1,
+    }
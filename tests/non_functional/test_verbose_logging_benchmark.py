@@ -0,0 +1,168 @@
+import io
+import logging
+import pytest
+from pprint import pformat
+from time import process_time
+from unittest.mock import patch, MagicMock
+from src.log_config import main_logger, verbose_logger
+from src.model.reward_log import RewardLog
+from src.util.csv_calculation_file_parser import CsvCalculationFileParser
+from src.util.lazy_logging import LazyPayload, LogSampler
+
+NB_DELEGATORS = 10000
+NB_SPLIT_PAGES = 10  # requests of 1000 delegators, about one reward split
+
+
+def split_page(offset):
+    return {
+        "cycle": 700,
+        "delegatorsCount": NB_DELEGATORS,
+        "delegators": [
+            {
+                "address": "tz1{:033d}".format(index),
+                "delegatedBalance": 1000000 + index,
+                "currentDelegatedBalance": 1000000 + index,
+                "balance": 1000000 + index,
+                "emptied": False,
+            }
+            for index in range(offset, offset + NB_DELEGATORS // NB_SPLIT_PAGES)
+        ],
+    }
+
+
+def payment_logs():
+    logs = []
+    for index in range(NB_DELEGATORS):
+        log = RewardLog("tz1{:033d}".format(index), "D", 1000000 + index, 1000000)
+        log.amount = log.adjusted_amount = 1000 + index
+        log.skippedatphase = -1
+        log.paymentaddress = log.address
+        logs.append(log)
+    return logs
+
+
+def cpu_seconds(call):
+    start = process_time()
+    call()
+    return process_time() - start
+
+
+def split_pages():
+    return [split_page(offset) for offset in range(0, NB_DELEGATORS, 1000)]
+
+
+def silent_verbose_logger():
+    """Patches the verbose logger as when verbose mode is off."""
+    return patch.object(verbose_logger, "handlers", [logging.NullHandler()])
+
+
+def test_verbose_response_logging_is_lazy():
+    """With verbose mode off, the split responses are never formatted."""
+    pages = split_pages()
+    with silent_verbose_logger(), patch.object(
+        verbose_logger, "propagate", False
+    ), patch.object(LazyPayload, "__str__", MagicMock(return_value="")) as to_str:
+        for res in pages:
+            verbose_logger.debug("Response from TzKT is:\n%s", LazyPayload(res))
+    to_str.assert_not_called()
+
+
+@pytest.mark.benchmark
+def test_verbose_response_logging_cpu():
+    """CPU spent logging the split responses of one cycle with verbose mode
+    off, formatting eagerly (the former behaviour) and lazily."""
+    pages = split_pages()
+
+    def eager():
+        for res in pages:
+            verbose_logger.debug(f"Response from TzKT is:\n{pformat(res)}")
+
+    def lazy():
+        for res in pages:
+            verbose_logger.debug("Response from TzKT is:\n%s", LazyPayload(res))
+
+    with silent_verbose_logger(), patch.object(verbose_logger, "propagate", False):
+        eager_seconds = cpu_seconds(eager)
+        lazy_seconds = cpu_seconds(lazy)
+
+    print(
+        "\nVerbose logging of {} split pages: eager {:.3f} s, lazy {:.6f} s CPU per cycle".format(
+            len(pages), eager_seconds, lazy_seconds
+        )
+    )
+    assert lazy_seconds < eager_seconds
+
+
+def write_reports(tmp_path):
+    """
+    Writes the calculation report of one cycle with the debug log file
+    enabled, logging every row then logging a sample of the rows.
+    :return: CPU seconds, logged bytes and report of both writes
+    """
+    logs = payment_logs()
+    report_logger = main_logger.getChild("payment_producer")
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setLevel(logging.DEBUG)
+    results = []
+
+    def write():
+        report_file = tmp_path / "report{}.csv".format(len(results))
+        CsvCalculationFileParser.write(
+            logs, str(report_file), 10**9, "actual", "tz1baker", False
+        )
+        return report_file
+
+    def measure():
+        start_size = handler.stream.tell()
+        start = process_time()
+        report_file = write()
+        seconds = process_time() - start
+        results.append(
+            (seconds, handler.stream.tell() - start_size, report_file.read_text())
+        )
+
+    level = report_logger.level
+    # setLevel, unlike assigning the level, clears the cached isEnabledFor results
+    report_logger.setLevel(logging.DEBUG)
+    try:
+        with patch.object(report_logger, "handlers", [handler]), patch.object(
+            report_logger, "propagate", False
+        ):
+            with patch(
+                "src.util.csv_calculation_file_parser.LogSampler",
+                lambda: LogSampler(first=NB_DELEGATORS),
+            ):
+                measure()
+            measure()
+    finally:
+        report_logger.setLevel(level)
+    return results
+
+
+def test_calculation_report_logging_sampled(tmp_path):
+    """Sampling the logged rows leaves the calculation report unchanged."""
+    (_, all_rows_size, all_rows_report), (_, sampled_size, sampled_report) = (
+        write_reports(tmp_path)
+    )
+    assert sampled_report == all_rows_report
+    assert sampled_size < all_rows_size / 10
+
+
+@pytest.mark.benchmark
+def test_calculation_report_logging_cpu(tmp_path):
+    """CPU spent writing the calculation report of one cycle with the debug
+    log file enabled, logging every row and logging a sample of the rows."""
+    (all_rows_seconds, all_rows_size, _), (sampled_seconds, sampled_size, _) = (
+        write_reports(tmp_path)
+    )
+
+    print(
+        "\nCalculation report of {} rows: every row logged {:.3f} s ({} KiB), sampled {:.3f} s ({} KiB) CPU per cycle".format(
+            NB_DELEGATORS,
+            all_rows_seconds,
+            all_rows_size // 1024,
+            sampled_seconds,
+            sampled_size // 1024,
+        )
+    )
+    assert sampled_seconds < all_rows_seconds
@@ -1,5 +1,25 @@
+import json
+import threading
+import base58
+import pytest
 from unittest.mock import patch, MagicMock
-from src.pay.batch_payer import BatchPayer, TX_FEES, OpCounter
+from src.pay.batch_payer import (
+    BatchPayer,
+    TX_FEES,
+    OpCounter,
+    InclusionStatus,
+    MINIMUM_FEE_MUTEZ,
+    MAX_BATCH_PAYMENT_ATTEMPTS,
+    SIGNATURE_BYTES_SIZE,
+)
+from src.pay.forge import (
+    forge_operation_group,
+    calculate_operation_hash,
+    ORIGINATED_PREFIX,
+    IMPLICIT_PREFIXES,
+)
+from src.pay.utils import calculate_required_fee
+from src.pay.estimate_cache import GasEstimateCache
 from src.model.reward_log import RewardLog
 from src.cli.client_manager import ClientManager
 from http import HTTPStatus
@@ -43,8 +63,6 @@ TEST_TZ_ADDRESS = "tz2JrnsSXPkN3QHKsYm1bGijwVHc1vFaR5kU"
     "src.cli.client_manager.ClientManager.request_url_post",
     side_effect=[
         (HTTPStatus.OK, run_ops_parsed),
-        (HTTPStatus.OK, forge),
-        (HTTPStatus.OK, forge),
         (HTTPStatus.OK, None),
     ],
 )
@@ -104,10 +122,8 @@ TEST_KT_ADDRESS = "KT1SZrurTqTBWsWsZUVR27GZ8bHK3EhFV62g"
     "src.cli.client_manager.ClientManager.request_url_post",
     side_effect=[
         (HTTPStatus.OK, run_ops_parsed),
-        (HTTPStatus.OK, forge),
         (HTTPStatus.OK, run_ops_parsed),
-        (HTTPStatus.OK, forge),
-        (HTTPStatus.OK, forge),
+        (HTTPStatus.OK, None),
     ],
 )
 @patch(
@@ -155,3 +171,715 @@ def test_attempt_single_batch_KT(sign, request_url, request_url_post):
     assert operation_hash is None
     assert reward_log.delegator_transaction_fee == 9004
     assert opt_counter.counter == 4
+
+
+@patch(
+    "src.cli.client_manager.ClientManager.request_url_post",
+    side_effect=[
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, None),
+    ],
+)
+@patch(
+    "src.cli.client_manager.ClientManager.request_url",
+    side_effect=[
+        (HTTPStatus.OK, 3209357),
+        (HTTPStatus.OK, payment_head),
+    ],
+)
+@patch(
+    "src.cli.client_manager.ClientManager.sign",
+    return_value=forge,
+)
+def test_attempt_single_batch_minimal_fee(sign, request_url, request_url_post):
+    network_config = {"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30}
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=ClientManager(
+            node_endpoint=PUBLIC_NODE_URL["MAINNET"],
+            signer_endpoint=PRIVATE_SIGNER_URL,
+        ),
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config=network_config,
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    # too low to cover the batch, the difference is paid by the delegate
+    batch_payer.default_fee = 1
+    reward_logs = []
+    for amount in [15577803, 1000]:
+        reward_log = RewardLog(
+            address=TEST_TZ_ADDRESS,
+            type="D",
+            delegating_balance=80,
+            current_balance=100,
+        )
+        reward_log.adjusted_amount = amount
+        reward_log.skipped = False
+        reward_logs.append(reward_log)
+
+    status, _, _ = batch_payer.attempt_single_batch(
+        reward_logs, OpCounter(), dry_run=True
+    )
+    assert status.is_done()
+
+    # the fee is set in one pass, the operations are forged locally once
+    assert request_url_post.call_count == 2
+    assert sign.call_count == 1
+    preapply_json = json.loads(request_url_post.call_args[0][1])[0]
+    contents = preapply_json["contents"]
+    forged = forge_operation_group(preapply_json["branch"], contents)
+    assert sign.call_args[0][0] == forged
+
+    total_fee = sum(int(content["fee"]) for content in contents)
+    total_gas = sum(int(content["gas_limit"]) for content in contents)
+    size = SIGNATURE_BYTES_SIZE + len(forged) // 2
+    assert total_fee == calculate_required_fee(total_gas, size)
+    assert reward_logs[0].delegate_transaction_fee == int(contents[0]["fee"]) - 1
+
+    breakdowns = [reward_log.fee_breakdown for reward_log in reward_logs]
+    assert [breakdown.fee for breakdown in breakdowns] == [
+        int(content["fee"]) for content in contents
+    ]
+    assert breakdowns[1].base_fee == 0
+    assert (
+        sum(breakdown.size_fee + breakdown.base_fee for breakdown in breakdowns)
+        == MINIMUM_FEE_MUTEZ + size
+    )
+
+
+SIGNATURE = "edsigtXomBKi5CTRf5cjATJWSyaRvhfYNHqSUGrn4SdbYRcGwQrUGjzEfQDTuqHhuA8b2d8NarZjz8TRf65WkpQmo423BtomS8Q"
+
+
+@pytest.mark.parametrize(
+    "inclusion_status, expected_status",
+    [
+        (InclusionStatus.INCLUDED, "PAID"),
+        (InclusionStatus.TIMED_OUT, "FAIL"),
+    ],
+)
+def test_attempt_single_batch_injection_error(inclusion_status, expected_status):
+    client_manager = MagicMock()
+    client_manager.request_url.side_effect = [
+        (HTTPStatus.OK, 3209357),
+        (HTTPStatus.OK, payment_head),
+        (HTTPStatus.OK, {"header": {"level": 1000}}),
+    ]
+    client_manager.request_url_post.side_effect = [
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, None),
+        (HTTPStatus.GATEWAY_TIMEOUT, None),
+    ]
+    client_manager.sign.return_value = SIGNATURE
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    batch_payer.wait_for_inclusion = MagicMock(return_value=(inclusion_status, None))
+    reward_log = RewardLog(
+        address=TEST_TZ_ADDRESS,
+        type="D",
+        delegating_balance=80,
+        current_balance=100,
+    )
+    reward_log.adjusted_amount = 15577803
+    reward_log.skipped = False
+
+    status, operation_hash, _ = batch_payer.attempt_single_batch(
+        [reward_log], OpCounter()
+    )
+
+    # the hash of the signed bytes is looked for instead of paying again
+    injected_bytes = json.loads(client_manager.request_url_post.call_args[0][1])
+    assert operation_hash == calculate_operation_hash(injected_bytes)
+    assert reward_log.hash == operation_hash
+    batch_payer.wait_for_inclusion.assert_called_once_with(operation_hash, 1000)
+    assert status.name == expected_status
+
+
+@patch("src.pay.batch_payer.GROUP_SIMULATION", False)
+def test_attempt_single_batch_concurrent_simulations():
+    contracts = [
+        base58.b58encode_check(ORIGINATED_PREFIX + bytes([i] * 20)).decode()
+        for i in range(4)
+    ]
+    # the simulations of the other contracts only pass if they are in flight together
+    barrier = threading.Barrier(len(contracts) - 1, timeout=5)
+
+    def request_url_post(cmd, json_params, timeout=None):
+        if not cmd.endswith("run_operation"):
+            return HTTPStatus.OK, None
+        contents = json.loads(json_params)["operation"]["contents"]
+        if len(contents) > 1:
+            return HTTPStatus.OK, {
+                "contents": run_ops_parsed["contents"] * len(contents)
+            }
+        if contents[0]["destination"] == contracts[0]:
+            raise Exception("Contract is not responding")
+        barrier.wait()
+        return HTTPStatus.OK, run_ops_parsed
+
+    client_manager = MagicMock()
+    client_manager.request_url.side_effect = [
+        (HTTPStatus.OK, 3),
+        (HTTPStatus.OK, payment_head),
+    ]
+    client_manager.request_url_post.side_effect = request_url_post
+    client_manager.sign.return_value = SIGNATURE
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    reward_logs = []
+    for contract in contracts:
+        reward_log = RewardLog(
+            address=contract,
+            type="D",
+            delegating_balance=50,
+            current_balance=100,
+        )
+        reward_log.adjusted_amount = 15577803
+        reward_log.skipped = False
+        reward_logs.append(reward_log)
+
+    status, _, _ = batch_payer.attempt_single_batch(
+        reward_logs, OpCounter(), dry_run=True
+    )
+
+    assert status.is_done()
+    assert reward_logs[0].paid.name == "FAIL"
+    assert "simulation encountered an error" in reward_logs[0].desc
+    preapply_json = json.loads(client_manager.request_url_post.call_args[0][1])[0]
+    assert [content["destination"] for content in preapply_json["contents"]] == (
+        contracts[1:]
+    )
+    assert [reward_log.delegator_transaction_fee for reward_log in reward_logs] == [
+        0,
+        9004,
+        9004,
+        9004,
+    ]
+
+
+GAS_EXHAUSTED = {
+    "metadata": {
+        "operation_result": {
+            "status": "failed",
+            "errors": [{"id": "gas_exhausted.operation"}],
+        }
+    }
+}
+
+
+def test_attempt_single_batch_estimate_cache(tmp_path):
+    client_manager = MagicMock()
+    client_manager.request_url.return_value = (HTTPStatus.OK, payment_head)
+    client_manager.request_url_post.side_effect = [
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, None),
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, None),
+    ]
+    client_manager.sign.return_value = SIGNATURE
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    batch_payer.estimate_cache = GasEstimateCache(str(tmp_path))
+    protocol = payment_head["metadata"]["protocol"]
+
+    def attempt():
+        reward_log = RewardLog(
+            address=TEST_KT_ADDRESS,
+            type="D",
+            delegating_balance=50,
+            current_balance=100,
+        )
+        reward_log.adjusted_amount = 15577803
+        reward_log.skipped = False
+        op_counter = OpCounter()
+        op_counter.set(3)
+        batch_payer.base_counter = 3
+        status, _, _ = batch_payer.attempt_single_batch(
+            [reward_log], op_counter, dry_run=True
+        )
+        assert status.is_done()
+        return reward_log
+
+    # simulated once, the estimate is verified by the run_operation of the batch
+    assert attempt().delegator_transaction_fee == 9004
+    assert batch_payer.estimate_cache.get(protocol, TEST_KT_ADDRESS)["gas"] == 240
+    assert attempt().delegator_transaction_fee == 9004
+    assert client_manager.request_url_post.call_count == 5
+
+    # an estimate failing the batch run_operation is dropped, the payout is
+    # left for a new simulation
+    client_manager.request_url_post.side_effect = [
+        (HTTPStatus.OK, {"contents": [GAS_EXHAUSTED]})
+    ]
+    reward_log = RewardLog(
+        address=TEST_KT_ADDRESS, type="D", delegating_balance=50, current_balance=100
+    )
+    reward_log.adjusted_amount = 15577803
+    op_counter = OpCounter()
+    op_counter.set(3)
+    status, _, _ = batch_payer.attempt_single_batch(
+        [reward_log], op_counter, dry_run=True
+    )
+    assert status.is_fail()
+    assert reward_log.paid.is_undefined()
+    assert batch_payer.estimate_cache.get(protocol, TEST_KT_ADDRESS) is None
+
+
+def test_pay_single_batch_simulates_outdated_estimate_again(tmp_path):
+    def request_url(cmd, timeout=None):
+        if cmd.endswith("/counter"):
+            return HTTPStatus.OK, 3
+        return HTTPStatus.OK, payment_head
+
+    applied = {"metadata": {"operation_result": {"status": "applied"}}}
+    client_manager = MagicMock(request_url=MagicMock(side_effect=request_url))
+    client_manager.request_url_post.side_effect = [
+        # the cached estimate of the contract is outdated
+        (HTTPStatus.OK, {"contents": [applied, GAS_EXHAUSTED]}),
+        (HTTPStatus.OK, {"contents": [applied]}),
+        (HTTPStatus.OK, {"contents": [applied]}),
+        (HTTPStatus.OK, None),
+        # the next attempt simulates the contract again and pays it
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, run_ops_parsed),
+        (HTTPStatus.OK, None),
+    ]
+    client_manager.sign.return_value = SIGNATURE
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    batch_payer.estimate_cache = GasEstimateCache(str(tmp_path))
+    protocol = payment_head["metadata"]["protocol"]
+    batch_payer.estimate_cache.put(protocol, TEST_KT_ADDRESS, 100, 0, 1000)
+    reward_logs = []
+    for address in [TEST_TZ_ADDRESS, TEST_KT_ADDRESS]:
+        reward_log = RewardLog(
+            address=address, type="D", delegating_balance=50, current_balance=100
+        )
+        reward_log.adjusted_amount = 15577803
+        reward_logs.append(reward_log)
+
+    attempts, status = batch_payer.pay_single_batch(
+        reward_logs, OpCounter(), dry_run=True
+    )
+
+    assert attempts == 2
+    assert status.is_done()
+    assert [reward_log.paid.name for reward_log in reward_logs] == ["DONE", "DONE"]
+    assert reward_logs[1].delegator_transaction_fee == 9004
+    assert batch_payer.estimate_cache.get(protocol, TEST_KT_ADDRESS)["gas"] == 240
+    assert client_manager.request_url_post.call_count == 7
+
+
+def test_attempt_single_batch_group_simulation():
+    contracts = [
+        base58.b58encode_check(ORIGINATED_PREFIX + bytes([i] * 20)).decode()
+        for i in range(5)
+    ]
+    failing_contract = contracts[2]
+    simulated_groups = []
+
+    def request_url_post(cmd, json_params, timeout=None):
+        if not cmd.endswith("run_operation"):
+            return HTTPStatus.OK, None
+        contents = json.loads(json_params)["operation"]["contents"]
+        simulated_groups.append([content["destination"] for content in contents])
+        results, failed = [], False
+        for content in contents:
+            if content["destination"] == failing_contract:
+                failed = True
+                result = {
+                    "status": "failed",
+                    "errors": [{"id": "script_rejected"}],
+                }
+            else:
+                result = run_ops_parsed["contents"][0]["metadata"]["operation_result"]
+                if failed:
+                    result = dict(result, status="backtracked")
+            results.append(
+                {
+                    "metadata": dict(
+                        run_ops_parsed["contents"][0]["metadata"],
+                        operation_result=result,
+                    )
+                }
+            )
+        return HTTPStatus.OK, {"contents": results}
+
+    client_manager = MagicMock()
+    client_manager.request_url.side_effect = [
+        (HTTPStatus.OK, 3),
+        (HTTPStatus.OK, payment_head),
+    ]
+    client_manager.request_url_post.side_effect = request_url_post
+    client_manager.sign.return_value = SIGNATURE
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    reward_logs = []
+    for contract in contracts:
+        reward_log = RewardLog(
+            address=contract,
+            type="D",
+            delegating_balance=50,
+            current_balance=100,
+        )
+        reward_log.adjusted_amount = 15577803
+        reward_log.skipped = False
+        reward_logs.append(reward_log)
+
+    status, _, _ = batch_payer.attempt_single_batch(
+        reward_logs, OpCounter(), dry_run=True
+    )
+
+    assert status.is_done()
+    # the failing contract is isolated by bisection, then simulated alone
+    assert simulated_groups[:5] == [
+        contracts,
+        contracts[:2],
+        contracts[2:],
+        contracts[3:],
+        [failing_contract],
+    ]
+    assert simulated_groups[5] == contracts[:2] + contracts[3:]
+    assert len(simulated_groups) == 6
+    assert reward_logs[2].paid.name == "AVOIDED"
+    assert [reward_log.delegator_transaction_fee for reward_log in reward_logs] == [
+        9004,
+        9004,
+        0,
+        9004,
+        9004,
+    ]
+
+
+@pytest.mark.parametrize("group_error", [False, True])
+def test_attempt_single_batch_isolates_failed_payout(group_error):
+    addresses = [
+        base58.b58encode_check(IMPLICIT_PREFIXES["tz1"][0] + bytes([i] * 20)).decode()
+        for i in range(4)
+    ]
+    failing_address = addresses[2]
+    run_groups = []
+
+    def request_url_post(cmd, json_params, timeout=None):
+        if not cmd.endswith("run_operation"):
+            return HTTPStatus.OK, None
+        contents = json.loads(json_params)["operation"]["contents"]
+        destinations = [content["destination"] for content in contents]
+        run_groups.append(destinations)
+        if failing_address in destinations and group_error:
+            # the node only reports an error of the whole group
+            return HTTPStatus.INTERNAL_SERVER_ERROR, None
+        results = []
+        for destination in destinations:
+            status = "applied"
+            if destination == failing_address:
+                status = "failed"
+            elif failing_address in destinations:
+                status = "skipped"
+            results.append(
+                {
+                    "metadata": {
+                        "operation_result": {
+                            "status": status,
+                            "errors": [{"id": "contract.balance_too_low"}],
+                        }
+                    }
+                }
+            )
+        return HTTPStatus.OK, {"contents": results}
+
+    client_manager = MagicMock()
+    client_manager.request_url.return_value = (HTTPStatus.OK, payment_head)
+    client_manager.request_url_post.side_effect = request_url_post
+    client_manager.sign.return_value = SIGNATURE
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    reward_logs = []
+    for address in addresses:
+        reward_log = RewardLog(
+            address=address,
+            type="D",
+            delegating_balance=50,
+            current_balance=100,
+        )
+        reward_log.adjusted_amount = 15577803
+        reward_log.skipped = False
+        reward_logs.append(reward_log)
+    op_counter = OpCounter()
+    op_counter.set(3)
+
+    status, _, _ = batch_payer.attempt_single_batch(
+        reward_logs, op_counter, dry_run=True
+    )
+
+    # the other payouts are paid in the same attempt
+    assert status.is_done()
+    remaining = addresses[:2] + addresses[3:]
+    if group_error:
+        # the failing payout is isolated by bisection
+        assert run_groups[:5] == [
+            addresses,
+            addresses[:2],
+            addresses[2:],
+            addresses[2:3],
+            addresses[3:],
+        ]
+    else:
+        assert run_groups[:2] == [addresses, remaining]
+    # the remaining payouts are run again as they are submitted
+    assert run_groups[-1] == remaining
+    assert [reward_log.paid.name for reward_log in reward_logs] == [
+        "UNDEFINED",
+        "UNDEFINED",
+        "FAIL",
+        "UNDEFINED",
+    ]
+    assert "Error while validating operation" in reward_logs[2].desc
+    assert reward_logs[2].delegator_transaction_fee == 0
+    preapply_json = json.loads(client_manager.request_url_post.call_args[0][1])[0]
+    contents = preapply_json["contents"]
+    assert [content["destination"] for content in contents] == remaining
+    assert [content["counter"] for content in contents] == ["4", "5", "6"]
+
+
+PLAN_COUNTER = 3209357
+
+
+def plan_batch_payer(plans_dir, counter):
+    def request_url(cmd, timeout=None):
+        if cmd.endswith("/counter"):
+            return HTTPStatus.OK, counter[0]
+        return HTTPStatus.OK, payment_head
+
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=MagicMock(request_url=MagicMock(side_effect=request_url)),
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+        plans_dir=str(plans_dir),
+    )
+    batch_payer.get_payment_address_balance = MagicMock(return_value=10**12)
+    return batch_payer
+
+
+def plan_reward_logs():
+    reward_logs = []
+    for amount in [15577803, 2577803]:
+        reward_log = RewardLog(
+            address=TEST_TZ_ADDRESS,
+            type="D",
+            delegating_balance=80,
+            current_balance=100,
+        )
+        reward_log.adjusted_amount = amount
+        reward_logs.append(reward_log)
+    return reward_logs
+
+
+def chunk_by_item(payment_items, estimate_limits):
+    return [[payment_item] for payment_item in payment_items]
+
+
+@pytest.mark.parametrize("counter_moved", [False, True])
+@patch("src.pay.batch_payer.sort_and_chunk_payment_items", chunk_by_item)
+def test_pay_resumes_payment_plan(tmp_path, counter_moved):
+    counter = [PLAN_COUNTER]
+    submitted = []
+
+    def submit_batch(prepared_batch, op_counter, dry_run=None):
+        i_batch = 0 if prepared_batch.batch_items[0].adjusted_amount > 10**7 else 1
+        contents = [content.to_dict() for content in prepared_batch.contents]
+        submitted.append((i_batch, op_counter.get(), contents))
+        if i_batch == 1 and len(submitted) == 2:
+            # the process stops while the second batch is being submitted
+            if counter_moved:
+                counter[0] += 1
+            raise SystemExit()
+        counter[0] += 1
+        return PaymentStatus.PAID, "oo{}".format(i_batch), ""
+
+    batch_payer = plan_batch_payer(tmp_path, counter)
+    batch_payer.submit_batch = MagicMock(side_effect=submit_batch)
+    with pytest.raises(SystemExit):
+        batch_payer.pay(plan_reward_logs(), payment_cycle=10)
+
+    # the plan is resumed without simulating the payments again
+    batch_payer = plan_batch_payer(tmp_path, counter)
+    batch_payer.prepare_batch = MagicMock()
+    batch_payer.submit_batch = MagicMock(side_effect=submit_batch)
+    reward_logs = plan_reward_logs()
+    payment_logs, _, _, _, _ = batch_payer.pay(reward_logs, payment_cycle=10)
+
+    batch_payer.prepare_batch.assert_not_called()
+    assert [reward_log.hash for reward_log in reward_logs] == [
+        "oo0",
+        None if counter_moved else "oo1",
+    ]
+    assert [reward_log.paid.name for reward_log in reward_logs] == [
+        "PAID",
+        "INJECTED" if counter_moved else "PAID",
+    ]
+    assert (
+        reward_logs[0].delegator_transaction_fee
+        == TX_FEES["TZ1_TO_ALLOCATED_TZ1"]["FEE"]
+    )
+    # the fees of the plan are restored, a single payment pays the minimal fee
+    assert reward_logs[0].fee_breakdown.fee == (
+        reward_logs[0].delegator_transaction_fee
+        + reward_logs[0].delegate_transaction_fee
+    )
+    # the batch is submitted again with the same counter and contents
+    assert [(i_batch, op_counter) for i_batch, op_counter, _ in submitted] == [
+        (0, PLAN_COUNTER),
+        (1, PLAN_COUNTER + 1),
+    ] + ([] if counter_moved else [(1, PLAN_COUNTER + 1)])
+    assert submitted[1][2] == submitted[-1][2]
+    assert submitted[1][2][0]["counter"] is None
+
+
+@patch("src.pay.batch_payer.wait_random", MagicMock())
+@patch("src.pay.batch_payer.sort_and_chunk_payment_items", chunk_by_item)
+def test_pay_retries_failed_payment_plan(tmp_path):
+    counter = [PLAN_COUNTER]
+    batch_payer = plan_batch_payer(tmp_path, counter)
+    batch_payer.submit_batch = MagicMock(
+        return_value=(PaymentStatus.FAIL, None, "Error in preapply operation")
+    )
+    reward_logs = plan_reward_logs()
+    batch_payer.pay(reward_logs, payment_cycle=10)
+    assert [reward_log.paid.name for reward_log in reward_logs] == ["FAIL", "FAIL"]
+    assert batch_payer.submit_batch.call_count == 2 * MAX_BATCH_PAYMENT_ATTEMPTS
+
+    # the retry of the failed cycle finds the saved plan and submits it again
+    batch_payer = plan_batch_payer(tmp_path, counter)
+    batch_payer.prepare_batch = MagicMock()
+    batch_payer.submit_batch = MagicMock(
+        side_effect=lambda prepared_batch, op_counter, dry_run=None: (
+            PaymentStatus.PAID,
+            "oo1",
+            "",
+        )
+    )
+    reward_logs = plan_reward_logs()
+    _, attempts, _, _, _ = batch_payer.pay(reward_logs, payment_cycle=10)
+
+    batch_payer.prepare_batch.assert_not_called()
+    assert attempts == 2
+    assert batch_payer.submit_batch.call_count == 2
+    assert [reward_log.paid.name for reward_log in reward_logs] == ["PAID", "PAID"]
+    with open(tmp_path / "10_{}.json".format(TEST_TZ_ADDRESS)) as f:
+        plan = json.load(f)
+    assert [batch["status"] for batch in plan["batches"]] == ["PAID", "PAID"]
+
+
+@patch("src.pay.batch_payer.sort_and_chunk_payment_items", chunk_by_item)
+def test_pay_dry_run_payment_plan(tmp_path):
+    batch_payer = plan_batch_payer(tmp_path, [PLAN_COUNTER])
+    batch_payer.submit_batch = MagicMock()
+    reward_logs = plan_reward_logs()
+
+    _, attempts, _, _, _ = batch_payer.pay(reward_logs, dry_run=True, payment_cycle=10)
+
+    batch_payer.submit_batch.assert_not_called()
+    # the planned batches are reported as attempted
+    assert attempts == 2
+    assert [reward_log.paid.name for reward_log in reward_logs] == ["DONE", "DONE"]
+    with open(tmp_path / "10_{}.json".format(TEST_TZ_ADDRESS)) as f:
+        plan = json.load(f)
+    assert [
+        [content["counter"] for content in batch["contents"]]
+        for batch in plan["batches"]
+    ] == [[str(PLAN_COUNTER + 1)], [str(PLAN_COUNTER + 2)]]
+    assert [batch["status"] for batch in plan["batches"]] == [
+        "UNDEFINED",
+        "UNDEFINED",
+    ]
+
+
+def test_attempt_single_batch_group_error_fails_batch():
+    client_manager = MagicMock()
+    client_manager.request_url.return_value = (HTTPStatus.OK, payment_head)
+    client_manager.request_url_post.return_value = (
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        None,
+    )
+    batch_payer = BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=TEST_TZ_ADDRESS,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+    reward_logs = plan_reward_logs()
+    op_counter = OpCounter()
+    op_counter.set(3)
+
+    status, _, error_message = batch_payer.attempt_single_batch(
+        reward_logs, op_counter, dry_run=True
+    )
+
+    # an error of every group is not blamed on the payouts, the batch is retried
+    assert status.is_fail()
+    assert error_message == "Error in run_operation"
+    assert [reward_log.paid.name for reward_log in reward_logs] == [
+        "UNDEFINED",
+        "UNDEFINED",
+    ]
@@ -168,8 +168,10 @@ def test_batch_payer_total_payout_amount():
 
     assert exit_code is None
 
-    # Payment does not have status done, paid or injected thus the total payout amount is zero
-    assert total_payout_amount == 0, f"total_payout_amount is {total_payout_amount}"
+    # A dry run stops at the payment plan, the planned payments are done
+    assert (
+        total_payout_amount == 18977188
+    ), f"total_payout_amount is {total_payout_amount}"
     assert (
         number_future_payable_cycles == 51
     ), f"number_future_payable_cycles is {number_future_payable_cycles}"
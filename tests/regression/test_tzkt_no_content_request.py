@@ -8,10 +8,13 @@ from src.Constants import TZKT_PUBLIC_API_URL
 
 class NoContentResponse:
     status_code = HTTPStatus.NO_CONTENT
+    headers = {}
     text = ""
 
 
-@patch("tzkt.tzkt_api.requests.get", MagicMock(return_value=NoContentResponse()))
+@patch(
+    "tzkt.tzkt_api.requests.Session.get", MagicMock(return_value=NoContentResponse())
+)
 def test_request_no_content_response():
     """Test the handling of API calls which respond with no content (204).
     Issue:
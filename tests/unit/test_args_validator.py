@@ -161,7 +161,9 @@ def test_validate():
         do_not_publish_stats=False,
         verbose="on",
         api_base_url=None,
+        api_hedge_percentile=None,
         retry_injected=False,
+        forge_check=False,
         syslog=False,
         log_file=os.path.normpath("~/pymnt/logs/app.log"),
     )
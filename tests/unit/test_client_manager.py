@@ -0,0 +1,148 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from http import HTTPStatus
+from unittest.mock import patch, MagicMock
+from src.cli.client_manager import (
+    ClientManager,
+    MAX_NB_TRIES,
+    NODE_TIMEOUT,
+    SIGNER_TIMEOUT,
+    RETRY_BACKOFF_SECONDS,
+)
+from tests.utils import LocalHttpServer
+
+PAYOUT_ADDRESS = "tz1PayTZoKjNyofxFQxkzhcv9RCdyW7Q64Wc"
+
+
+def node_route(path):
+    return HTTPStatus.OK, {"path": path}
+
+
+def signer_route(path):
+    return HTTPStatus.OK, {"signature": "sigXYZ"}
+
+
+def test_sessions_are_reused():
+    with LocalHttpServer(node_route) as node, LocalHttpServer(signer_route) as signer:
+        client_manager = ClientManager(node.url, signer.url)
+        for level in range(5):
+            status, output = client_manager.request_url(
+                f"/chains/main/blocks/{level}/operation_hashes"
+            )
+            assert status == HTTPStatus.OK
+        status, _ = client_manager.request_url_post("/injection/operation", '"00"')
+        assert status == HTTPStatus.OK
+        assert client_manager.sign("00", PAYOUT_ADDRESS) == "sigXYZ"
+        assert client_manager.sign("01", PAYOUT_ADDRESS) == "sigXYZ"
+        client_manager.close()
+
+        assert node.num_requests == 6
+        assert node.num_connections == 1
+        assert signer.num_requests == 2
+        assert signer.num_connections == 1
+
+
+def test_default_timeouts():
+    client_manager = ClientManager("http://node", "http://signer")
+    response = MagicMock(status_code=HTTPStatus.OK)
+    response.json.return_value = {"signature": "sigXYZ"}
+    client_manager.node_session.request = MagicMock(return_value=response)
+    client_manager.signer_session.request = MagicMock(return_value=response)
+
+    client_manager.request_url("/chains/main/blocks/head")
+    assert client_manager.node_session.request.call_args[1]["timeout"] == NODE_TIMEOUT
+    client_manager.request_url("/chains/main/blocks/head", timeout=3)
+    assert client_manager.node_session.request.call_args[1]["timeout"] == 3
+
+    client_manager.sign("00", PAYOUT_ADDRESS)
+    assert (
+        client_manager.signer_session.request.call_args[1]["timeout"] == SIGNER_TIMEOUT
+    )
+
+
+@patch("src.cli.client_manager.sleep")
+def test_retry_with_backoff(sleep):
+    client_manager = ClientManager("http://node", "http://signer")
+    client_manager.node_session.request = MagicMock(
+        side_effect=[
+            requests.exceptions.ReadTimeout(),
+            requests.exceptions.ConnectionError(),
+            MagicMock(status_code=HTTPStatus.OK, json=MagicMock(return_value=5)),
+        ]
+    )
+
+    assert client_manager.request_url("/chains/main/blocks/head/header") == (
+        HTTPStatus.OK,
+        5,
+    )
+    waits = [call[0][0] for call in sleep.call_args_list]
+    assert len(waits) == 2
+    assert RETRY_BACKOFF_SECONDS / 2 <= waits[0] <= RETRY_BACKOFF_SECONDS
+    assert RETRY_BACKOFF_SECONDS <= waits[1] <= 2 * RETRY_BACKOFF_SECONDS
+
+    client_manager.node_session.request = MagicMock(
+        side_effect=requests.exceptions.ReadTimeout()
+    )
+    with pytest.raises(SystemExit):
+        client_manager.request_url("/chains/main/blocks/head/header")
+    assert client_manager.node_session.request.call_count == MAX_NB_TRIES
+
+
+@patch("src.cli.client_manager.sleep", MagicMock())
+def test_sign_is_not_sent_again():
+    client_manager = ClientManager("http://node", "http://signer")
+    refused = requests.exceptions.ConnectionError(
+        MaxRetryError(None, "/keys", NewConnectionError(None, "refused"))
+    )
+    client_manager.signer_session.request = MagicMock(
+        side_effect=[
+            requests.exceptions.ConnectTimeout(),
+            refused,
+            MagicMock(
+                status_code=HTTPStatus.OK,
+                json=MagicMock(return_value={"signature": "sigXYZ"}),
+            ),
+        ]
+    )
+    assert client_manager.sign("00", PAYOUT_ADDRESS) == "sigXYZ"
+    assert client_manager.signer_session.request.call_count == 3
+
+    # the signer may have received the request, signing it again is left to the user
+    for error in [
+        requests.exceptions.ReadTimeout(),
+        requests.exceptions.ConnectionError(),
+    ]:
+        client_manager.signer_session.request = MagicMock(side_effect=error)
+        with pytest.raises(SystemExit):
+            client_manager.sign("00", PAYOUT_ADDRESS)
+        assert client_manager.signer_session.request.call_count == 1
+
+
+@patch("src.cli.client_manager.sleep", MagicMock())
+def test_rpc_stats():
+    client_manager = ClientManager("http://node", "http://signer")
+    client_manager.node_session.request = MagicMock(
+        side_effect=[
+            MagicMock(status_code=HTTPStatus.OK),
+            MagicMock(status_code=HTTPStatus.OK),
+            requests.exceptions.ConnectionError(),
+            MagicMock(status_code=HTTPStatus.INTERNAL_SERVER_ERROR),
+        ]
+    )
+
+    client_manager.request_url(
+        f"/chains/main/blocks/head/context/contracts/{PAYOUT_ADDRESS}/counter"
+    )
+    client_manager.request_url("/chains/main/blocks/5000000/operation_hashes")
+    client_manager.request_url("/chains/main/blocks/5000001/operation_hashes")
+
+    stats = client_manager.get_rpc_stats()
+    assert set(stats.keys()) == {
+        "GET /chains/main/blocks/head/context/contracts/*/counter",
+        "GET /chains/main/blocks/*/operation_hashes",
+    }
+    operation_hashes = stats["GET /chains/main/blocks/*/operation_hashes"]
+    assert operation_hashes["calls"] == 3
+    assert operation_hashes["errors"] == 2
+    assert operation_hashes["max_seconds"] >= operation_hashes["mean_seconds"]
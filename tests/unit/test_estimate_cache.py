@@ -0,0 +1,62 @@
+import json
+import time
+import pytest
+from unittest.mock import patch
+from src.pay.estimate_cache import GasEstimateCache, ESTIMATES_FILE
+
+PROTOCOL = "PtNairobiyssHuh87hEhfVBGCVrK3WnS8Z2FT4ymB5tAa4r1nQf"
+NEXT_PROTOCOL = "ProxfordYmVfjWnRcgjWH36fW6PArwqykTFzotUxRs6gmTcZDuH"
+CONTRACT = "KT1SZrurTqTBWsWsZUVR27GZ8bHK3EhFV62g"
+OTHER_CONTRACT = "KT1P3Y1mkGASzuJqLh7uGuQEvHatztGuQRgC"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GasEstimateCache(str(tmp_path))
+
+
+def test_estimates_are_persisted(cache, tmp_path):
+    cache.put(PROTOCOL, CONTRACT, 1500, 24, 9004)
+
+    reopened = GasEstimateCache(str(tmp_path))
+    estimate = reopened.get(PROTOCOL, CONTRACT)
+    assert (estimate["gas"], estimate["storage"], estimate["fee"]) == (1500, 24, 9004)
+    assert reopened.get(PROTOCOL, OTHER_CONTRACT) is None
+
+
+def test_protocol_change_drops_estimates(cache):
+    cache.put(PROTOCOL, CONTRACT, 1500, 24, 9004)
+    assert cache.get(NEXT_PROTOCOL, CONTRACT) is None
+
+    cache.put(NEXT_PROTOCOL, OTHER_CONTRACT, 1200, 0, 3000)
+    assert cache.get(NEXT_PROTOCOL, CONTRACT) is None
+    assert cache.get(PROTOCOL, CONTRACT) is None
+    assert cache.get(NEXT_PROTOCOL, OTHER_CONTRACT)["gas"] == 1200
+
+
+def test_drop_and_expiry(cache):
+    cache.put(PROTOCOL, CONTRACT, 1500, 24, 9004)
+    cache.put(PROTOCOL, OTHER_CONTRACT, 1200, 0, 3000)
+    cache.drop([CONTRACT, "tz1NRGxXV9h6SdNaZLcgmjuLx3hyy2f8YoGN"])
+    assert cache.get(PROTOCOL, CONTRACT) is None
+
+    later = time.time() + cache.max_age_seconds + 1
+    with patch("src.pay.estimate_cache.time.time", return_value=later):
+        assert cache.get(PROTOCOL, OTHER_CONTRACT) is None
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    (tmp_path / ESTIMATES_FILE).write_text("{not json")
+    cache = GasEstimateCache(str(tmp_path))
+    assert cache.get(PROTOCOL, CONTRACT) is None
+
+    cache.put(PROTOCOL, CONTRACT, 1500, 24, 9004)
+    with open(tmp_path / ESTIMATES_FILE) as f:
+        assert json.load(f)["protocol"] == PROTOCOL
+
+
+def test_peek_ignores_the_protocol(cache):
+    cache.put(PROTOCOL, CONTRACT, 1500, 24, 9004)
+    assert cache.get(NEXT_PROTOCOL, CONTRACT) is None
+    assert cache.peek(CONTRACT)["gas"] == 1500
+    assert cache.peek(OTHER_CONTRACT) is None
@@ -0,0 +1,272 @@
+import json
+import os
+import random
+import base58
+import pytest
+import yaml
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+from src.cli.client_manager import ClientManager
+from src.pay.batch_payer import BatchPayer
+from src.pay.operation_group import OperationGroup, Transaction
+from src.pay.forge import (
+    calculate_operation_hash,
+    forge_nat,
+    forge_operation_group,
+    forged_size,
+    nat_size,
+    BRANCH_PREFIX,
+    ORIGINATED_PREFIX,
+    IMPLICIT_PREFIXES,
+    PUBLIC_KEY_PREFIXES,
+)
+
+CASSETTE = "tests/regression/cassettes/test_batch_payer_total_payout_amount.yaml"
+BRANCH = "BKkgLXYjM3DhdgzUuk2y6wQibYNmTDBZuj8Raa9PYEFvgrBeUhd"
+SOURCE = "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ"
+NUM_GENERATED_OPERATIONS = 5000
+# node forging the generated operations, the comparison is skipped without it
+FORGE_NODE_URL = os.environ.get("TRD_FORGE_NODE_URL")
+
+
+def node_forges():
+    with open(CASSETTE) as f:
+        interactions = yaml.safe_load(f)["interactions"]
+    return [
+        (
+            json.loads(interaction["request"]["body"]),
+            json.loads(interaction["response"]["body"]["string"]),
+        )
+        for interaction in interactions
+        if interaction["request"]["uri"].endswith("/helpers/forge/operations")
+    ]
+
+
+def test_forge_nat():
+    assert forge_nat(0).hex() == "00"
+    assert forge_nat(127).hex() == "7f"
+    assert forge_nat(128).hex() == "8001"
+    assert forge_nat("7117401").hex() == "d9b4b203"
+    with pytest.raises(ValueError):
+        forge_nat(-1)
+    for value in [0, 1, 127, 128, 16383, 16384, 2**63 - 1, 2**63]:
+        assert nat_size(value) == len(forge_nat(value))
+
+
+def test_operation_hash():
+    signed_operation_bytes = (
+        "0f185d8a30061e8134c162dbb7a6c3ab8f5fdb153363ccd6149b49a33481156a6c00b2e1"
+        "9a9e74440d86c59f13dab8a18ff873e889eaa304ab05da13000001f1585a7384f36e45fb"
+        "43dc37e8ce172bced3e05700ff0000000002002110c033f3a990c2e46a3d6054ecc2f740"
+        "72aae7a34b5ac4d9ce9edc11c2410a97695682108951786f05b361da03b97245dc9897e1"
+        "955e08b5b8d9e153b0bdeb0d"
+    )
+    assert (
+        calculate_operation_hash(signed_operation_bytes)
+        == "opapqvVXmebRTCFd2GQFydr4tJj3V5QocQuTmuhbatcHm4Seo2t"
+    )
+
+
+@pytest.mark.parametrize("forge_json, node_bytes", node_forges())
+def test_forge_as_the_node(forge_json, node_bytes):
+    assert forge_operation_group(forge_json["branch"], forge_json["contents"]) == (
+        node_bytes
+    )
+
+
+@pytest.mark.parametrize(
+    "branch, content",
+    [
+        ("hash", {"kind": "transaction"}),
+        (BRANCH, {"kind": "delegation", "source": SOURCE}),
+        (BRANCH, {"kind": "transaction", "source": SOURCE}),
+        (BRANCH, {"kind": "reveal", "source": SOURCE, "public_key": "BLpk1"}),
+        (
+            BRANCH,
+            {
+                "kind": "transaction",
+                "source": "tz1234567890123456789012345678901234",
+                "destination": SOURCE,
+                "fee": "1",
+                "counter": "1",
+                "gas_limit": "1",
+                "storage_limit": "0",
+                "amount": "1",
+            },
+        ),
+        (
+            BRANCH,
+            {
+                "kind": "transaction",
+                "source": SOURCE,
+                "destination": SOURCE,
+                "fee": "1",
+                "counter": "1",
+                "gas_limit": "1",
+                "storage_limit": "0",
+                "amount": "1",
+                "parameters": {"entrypoint": "default", "value": {"prim": "Unit"}},
+            },
+        ),
+    ],
+)
+def test_unsupported_operations(branch, content):
+    with pytest.raises(ValueError):
+        forge_operation_group(branch, [content])
+
+
+def encode(prefix, size, rnd):
+    return base58.b58encode_check(
+        prefix + bytes(rnd.getrandbits(8) for _ in range(size))
+    ).decode()
+
+
+def generate_operation(rnd):
+    implicit_prefix, _ = rnd.choice(list(IMPLICIT_PREFIXES.values()))
+    content = {
+        "source": encode(implicit_prefix, 20, rnd),
+        "fee": str(rnd.randrange(2 ** rnd.randrange(1, 40))),
+        "counter": str(rnd.randrange(2 ** rnd.randrange(1, 64))),
+        "gas_limit": str(rnd.randrange(1_040_001)),
+        "storage_limit": str(rnd.randrange(60_001)),
+    }
+    if rnd.random() < 0.2:
+        key_prefix, _, key_size = rnd.choice(list(PUBLIC_KEY_PREFIXES.values()))
+        content.update(kind="reveal", public_key=encode(key_prefix, key_size, rnd))
+    else:
+        if rnd.random() < 0.5:
+            destination = encode(ORIGINATED_PREFIX, 20, rnd)
+        else:
+            destination_prefix, _ = rnd.choice(list(IMPLICIT_PREFIXES.values()))
+            destination = encode(destination_prefix, 20, rnd)
+        content.update(
+            kind="transaction",
+            amount=str(rnd.randrange(2 ** rnd.randrange(1, 50))),
+            destination=destination,
+        )
+    return content
+
+
+def generate_operation_groups(seed=42):
+    rnd = random.Random(seed)
+    num_operations = 0
+    while num_operations < NUM_GENERATED_OPERATIONS:
+        contents = [generate_operation(rnd) for _ in range(rnd.randrange(1, 50))]
+        num_operations += len(contents)
+        yield encode(BRANCH_PREFIX, 32, rnd), contents
+
+
+def read_nat(forged, pos):
+    value, shift = 0, 0
+    while True:
+        byte = forged[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def read_prefixed(forged, pos, prefixes, size):
+    tag = forged[pos : pos + 1]
+    for name, (prefix, prefix_tag, *_) in prefixes.items():
+        if prefix_tag == tag:
+            payload = forged[pos + 1 : pos + 1 + size]
+            return base58.b58encode_check(prefix + payload).decode(), pos + 1 + size
+    raise AssertionError("Unknown tag {}".format(tag.hex()))
+
+
+def unforge(forged):
+    """Reads the forged bytes back, written independently of the encoder."""
+    forged = bytes.fromhex(forged)
+    branch = base58.b58encode_check(BRANCH_PREFIX + forged[:32]).decode()
+    contents, pos = [], 32
+    while pos < len(forged):
+        tag, pos = forged[pos], pos + 1
+        content = {"kind": {0x6B: "reveal", 0x6C: "transaction"}[tag]}
+        content["source"], pos = read_prefixed(forged, pos, IMPLICIT_PREFIXES, 20)
+        for field in ["fee", "counter", "gas_limit", "storage_limit"]:
+            value, pos = read_nat(forged, pos)
+            content[field] = str(value)
+        if content["kind"] == "reveal":
+            tag = forged[pos : pos + 1]
+            size = 32 if tag == b"\x00" else 33
+            content["public_key"], pos = read_prefixed(
+                forged, pos, PUBLIC_KEY_PREFIXES, size
+            )
+            contents.append(content)
+            continue
+        value, pos = read_nat(forged, pos)
+        content["amount"] = str(value)
+        if forged[pos] == 0x01:
+            payload = forged[pos + 1 : pos + 21]
+            assert forged[pos + 21] == 0x00
+            content["destination"] = base58.b58encode_check(
+                ORIGINATED_PREFIX + payload
+            ).decode()
+            pos += 22
+        else:
+            assert forged[pos] == 0x00
+            content["destination"], pos = read_prefixed(
+                forged, pos + 1, IMPLICIT_PREFIXES, 20
+            )
+        assert forged[pos] == 0x00
+        pos += 1
+        contents.append(content)
+    return branch, contents
+
+
+def test_generated_operations_round_trip():
+    for branch, contents in generate_operation_groups():
+        forged = forge_operation_group(branch, contents)
+        assert unforge(forged) == (branch, contents)
+        assert forged_size(contents) == len(forged) // 2
+
+
+@pytest.mark.skipif(FORGE_NODE_URL is None, reason="TRD_FORGE_NODE_URL is not set")
+def test_generated_operations_forged_as_the_node():
+    client_manager = ClientManager(FORGE_NODE_URL, None)
+    for branch, contents in generate_operation_groups():
+        status, node_bytes = client_manager.request_url_post(
+            "/chains/main/blocks/head/helpers/forge/operations",
+            json.dumps({"branch": branch, "contents": contents}),
+        )
+        assert status == HTTPStatus.OK
+        assert forge_operation_group(branch, contents) == node_bytes
+
+
+def batch_payer(client_manager):
+    return BatchPayer(
+        node_url="node_addr",
+        pymnt_addr=SOURCE,
+        clnt_mngr=client_manager,
+        delegator_pays_ra_fee=True,
+        delegator_pays_xfer_fee=True,
+        network_config={"BLOCK_TIME_IN_SEC": 60, "MINIMAL_BLOCK_DELAY": 30},
+        plugins_manager=MagicMock(),
+        dry_run=False,
+    )
+
+
+@pytest.mark.parametrize("forge_check", [False, True])
+def test_batch_payer_forge(forge_check):
+    forge_json, node_bytes = node_forges()[-1]
+    contents = [Transaction.from_dict(c) for c in forge_json["contents"]]
+    operation_group = OperationGroup(forge_json["branch"], contents)
+    client_manager = MagicMock()
+    client_manager.request_url_post.return_value = (HTTPStatus.OK, node_bytes)
+
+    with patch("src.pay.batch_payer.is_forge_check_enabled", lambda: forge_check):
+        payer = batch_payer(client_manager)
+        assert payer.forge(operation_group) == (HTTPStatus.OK, node_bytes)
+        assert client_manager.request_url_post.call_count == int(forge_check)
+        if forge_check:
+            assert (
+                json.loads(client_manager.request_url_post.call_args[0][1])
+                == forge_json
+            )
+
+        # the bytes of the node win on a mismatch, the node forges what is not supported
+        client_manager.request_url_post.return_value = (HTTPStatus.OK, "00")
+        assert payer.forge(operation_group)[1] == ("00" if forge_check else node_bytes)
+        assert payer.forge(OperationGroup("hash", contents)) == (HTTPStatus.OK, "00")
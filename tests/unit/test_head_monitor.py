@@ -0,0 +1,102 @@
+import json
+import threading
+import requests
+from unittest.mock import patch, MagicMock
+from src.cli.head_monitor import HeadMonitor, HEAD_EVENT_LEVEL, HEAD_EVENT_CYCLE
+from src.pay.payment_producer import PaymentProducer
+
+BLOCKS_PER_CYCLE = 10
+
+
+def stream(levels):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = iter(
+        [json.dumps({"hash": f"B{level}", "level": level}).encode() for level in levels]
+    )
+    return response
+
+
+@patch("src.cli.head_monitor.uniform", MagicMock(return_value=0))
+def test_heads_are_published_across_reconnects():
+    monitor = HeadMonitor(
+        "http://node", level_in_cycle=lambda level: level % BLOCKS_PER_CYCLE
+    )
+    stopped = threading.Event()
+    responses = [
+        requests.exceptions.ConnectionError(),
+        stream([18, 19]),
+        stream([19, 20, 21, 33]),
+    ]
+
+    def get(*args, **kwargs):
+        if not responses:
+            stopped.wait(5)
+            raise requests.exceptions.ConnectionError()
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monitor.session.get = MagicMock(side_effect=get)
+    events = []
+    monitor.subscribe(lambda event, level: events.append((event, level)))
+
+    monitor.start()
+    assert monitor.wait_for_level(21, timeout=5)
+    assert monitor.wait_for_level(33, timeout=5)
+    assert not monitor.wait_for_level(34, timeout=0.01)
+    stopped.set()
+    monitor.stop()
+    monitor.join(5)
+
+    assert [level for event, level in events if event == HEAD_EVENT_LEVEL] == [
+        18,
+        19,
+        20,
+        21,
+        33,
+    ]
+    assert [level for event, level in events if event == HEAD_EVENT_CYCLE] == [20, 33]
+    assert monitor.session.get.call_count == 4
+
+
+def test_stop_wakes_up_waiters():
+    monitor = HeadMonitor("http://node")
+    threading.Timer(0.05, monitor.stop).start()
+    assert not monitor.wait_for_level(100, timeout=5)
+
+
+def producer(head_monitor):
+    pp = MagicMock()
+    pp.nw_config = {"MINIMAL_BLOCK_DELAY": 8}
+    pp.get_head_monitor.return_value = head_monitor
+    return pp
+
+
+@patch("src.pay.payment_producer.sleep")
+def test_wait_for_blocks_wakes_at_target_level(sleep):
+    head_monitor = MagicMock()
+    head_monitor.is_streaming.return_value = True
+    head_monitor.wait_for_level.side_effect = [False, False, True]
+    pp = producer(head_monitor)
+
+    PaymentProducer.wait_for_blocks(pp, 3000, current_level=1000)
+
+    assert head_monitor.wait_for_level.call_args[0][0] == 4000
+    assert head_monitor.wait_for_level.call_count == 3
+    sleep.assert_not_called()
+
+
+@patch("src.pay.payment_producer.sleep")
+def test_wait_for_blocks_without_head_stream(sleep):
+    head_monitor = MagicMock()
+    head_monitor.is_streaming.return_value = False
+    pp = producer(head_monitor)
+    clock = iter([0, 0, 8, 16, 24])
+
+    with patch("src.pay.payment_producer.monotonic", lambda: next(clock)):
+        PaymentProducer.wait_for_blocks(pp, 3, current_level=1000)
+
+    assert sleep.call_count == 3
+    head_monitor.wait_for_level.assert_not_called()
@@ -0,0 +1,90 @@
+import threading
+from http import HTTPStatus
+from unittest.mock import MagicMock
+from src.cli.head_monitor import HEAD_EVENT_LEVEL
+from src.cli.inclusion_tracker import InclusionTracker, InclusionStatus
+
+
+class FakeNode:
+    """Answers the RPCs of the tracker from a map of level to operation hashes."""
+
+    def __init__(self, head_level, blocks, mempool=None):
+        self.head_level = head_level
+        self.blocks = blocks
+        self.mempool = mempool or {}
+        self.requested = []
+
+    def request_url(self, cmd, timeout=None):
+        self.requested.append(cmd)
+        if cmd == "/chains/main/blocks/head/header":
+            return HTTPStatus.OK, {"level": self.head_level}
+        if cmd == "/chains/main/mempool/pending_operations":
+            return HTTPStatus.OK, self.mempool
+        level = int(cmd.split("/")[4])
+        if level > self.head_level:
+            return HTTPStatus.NOT_FOUND, "Code404"
+        return HTTPStatus.OK, [[], [], [], self.blocks.get(level, [])]
+
+
+def test_many_operations_are_resolved():
+    node = FakeNode(
+        head_level=102,
+        blocks={101: ["oo1"], 102: ["oo2", "other"]},
+        mempool={
+            "validated": [{"hash": "oo5"}],
+            "refused": [{"hash": "oo3", "error": [{"id": "counter_in_the_past"}]}],
+            "branch_delayed": [["oo4", {"error": [{"id": "counter_in_the_future"}]}]],
+            "branch_refused": [{"hash": "oo6", "error": [{"id": "branch_refused"}]}],
+        },
+    )
+    tracker = InclusionTracker(node)
+    for operation_hash in ["oo1", "oo2", "oo3", "oo4", "oo5", "oo6"]:
+        tracker.track(operation_hash, 100)
+
+    assert tracker.check()
+
+    assert tracker.get_status("oo1") == InclusionStatus.INCLUDED
+    assert tracker.get_level("oo1") == 101
+    assert tracker.get_status("oo2") == InclusionStatus.INCLUDED
+    assert tracker.get_status("oo3") == InclusionStatus.REFUSED
+    assert tracker.get_errors("oo3") == [{"id": "counter_in_the_past"}]
+    assert tracker.get_status("oo4") == InclusionStatus.BRANCH_DELAYED
+    assert tracker.get_status("oo5") == InclusionStatus.PENDING
+    # an operation refused on the branch may still be included, it is not refused
+    assert tracker.get_status("oo6") == InclusionStatus.BRANCH_DELAYED
+
+    # every level is requested once for all the operations
+    assert node.requested.count("/chains/main/blocks/101/operation_hashes") == 1
+    assert tracker.check()
+    assert node.requested.count("/chains/main/blocks/101/operation_hashes") == 1
+
+
+def test_operation_times_out():
+    node = FakeNode(head_level=103, blocks={})
+    tracker = InclusionTracker(node, max_blocks=5)
+    tracker.track("oo1", 100)
+
+    assert tracker.check()
+    assert tracker.get_status("oo1") == InclusionStatus.PENDING
+
+    node.head_level = 105
+    assert tracker.check()
+    assert tracker.get_status("oo1") == InclusionStatus.TIMED_OUT
+
+    tracker.forget("oo1")
+    tracker.track("oo2", 110)
+    assert not tracker.check(111)
+
+
+def test_heads_drive_the_checks():
+    node = FakeNode(head_level=100, blocks={101: ["oo1"]})
+    head_monitor = MagicMock()
+    tracker = InclusionTracker(node, head_monitor)
+    on_head_event = head_monitor.subscribe.call_args[0][0]
+    tracker.track("oo1", 100)
+
+    node.head_level = 101
+    threading.Timer(0.05, on_head_event, args=(HEAD_EVENT_LEVEL, 101)).start()
+
+    assert tracker.wait("oo1", timeout=5) == InclusionStatus.INCLUDED
+    assert "/chains/main/blocks/head/header" not in node.requested
@@ -0,0 +1,65 @@
+import logging
+from src.util.lazy_logging import (
+    is_logging_enabled,
+    truncate,
+    LazyPayload,
+    LogSampler,
+    LOG_MAX_PAYLOAD_ITEMS,
+)
+
+
+class CountingPayload:
+    def __init__(self):
+        self.num_formatted = 0
+
+    def __repr__(self):
+        self.num_formatted += 1
+        return "payload"
+
+
+def make_logger(name, handler):
+    test_logger = logging.getLogger(name)
+    test_logger.setLevel(logging.DEBUG)
+    test_logger.propagate = False
+    test_logger.handlers = [handler]
+    return test_logger
+
+
+def test_null_handler_is_not_enabled():
+    test_logger = make_logger("test_lazy_logging.null", logging.NullHandler())
+    assert test_logger.isEnabledFor(logging.DEBUG)
+    assert not is_logging_enabled(test_logger, logging.DEBUG)
+
+    payload = CountingPayload()
+    test_logger.debug("Answer is |%s|", LazyPayload(payload))
+    assert payload.num_formatted == 0
+
+
+def test_handler_level_is_respected():
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.INFO)
+    test_logger = make_logger("test_lazy_logging.info", handler)
+    assert not is_logging_enabled(test_logger, logging.DEBUG)
+    assert is_logging_enabled(test_logger, logging.INFO)
+
+    child = test_logger.getChild("child")
+    assert is_logging_enabled(child, logging.INFO)
+
+
+def test_payload_is_capped():
+    assert truncate("a" * 10, max_chars=10) == "a" * 10
+    assert truncate("a" * 15, max_chars=10) == "a" * 10 + "... (5 more characters)"
+
+    payload = {"delegators": [{"address": f"tz1{i}"} for i in range(10000)]}
+    text = str(LazyPayload(payload))
+    assert "'tz1{}'".format(LOG_MAX_PAYLOAD_ITEMS - 1) in text
+    assert "'tz1{}'".format(LOG_MAX_PAYLOAD_ITEMS) not in text
+    assert len(str(LazyPayload(payload, max_chars=100))) < 130
+    assert str(LazyPayload("abc")) == "abc"
+
+
+def test_sampler():
+    sampler = LogSampler(first=3, every=10)
+    sampled = [index for index in range(50) if sampler.sample()]
+    assert sampled == [0, 1, 2, 12, 22, 32, 42]
+    assert sampler.num_skipped == 43
@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock, patch
+from src.Constants import PaymentStatus
+from src.model.reward_log import RewardLog, TYPE_DELEGATOR
+from src.pay.multi_source_payer import MultiSourcePayer, split_payment_items
+from src.util.exit_program import ExitCode
+
+SOURCES = [
+    "tz1gtHbmBF3TSebsgJfJPvUB2e9x8EDeNm6V",
+    "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ",
+]
+
+
+def reward_log(index, amount):
+    payment_item = RewardLog("tz1address{}".format(index), TYPE_DELEGATOR, 0, 0)
+    payment_item.adjusted_amount = amount
+    return payment_item
+
+
+def test_split_payment_items():
+    payment_items = [reward_log(i, amount) for i, amount in enumerate([5, 40, 30, 20])]
+    payment_items[0].payable = False
+
+    shares = split_payment_items(payment_items, [50, None])
+
+    # the largest payouts go first to the source with the most balance left
+    assert [[pi.adjusted_amount for pi in share] for share in shares] == [
+        [5, 40, 30],
+        [20],
+    ]
+    assert split_payment_items(payment_items, [0, 100])[1] == payment_items[1:]
+
+
+class FakeBatchPayer:
+    def __init__(self, node_url, pymnt_addr, *args, plans_dir=None):
+        self.source = pymnt_addr
+
+    def get_payment_address_balance(self):
+        return {SOURCES[0]: 100, SOURCES[1]: 60}[self.source]
+
+    def pay(self, payment_items, dry_run=None, payment_cycle=None):
+        for payment_item in payment_items:
+            payment_item.paid = PaymentStatus.PAID
+            payment_item.source = self.source
+        if self.source == SOURCES[0]:
+            return payment_items, 1, 70, 3, None
+        return payment_items, 2, 50, 1, ExitCode.INSUFFICIENT_FUNDS
+
+
+@patch("src.pay.multi_source_payer.BatchPayer", FakeBatchPayer)
+def test_multi_source_pay():
+    payer = MultiSourcePayer(
+        "node_addr", SOURCES, MagicMock(), True, True, {}, MagicMock(), False
+    )
+    payment_items = [reward_log(i, amount) for i, amount in enumerate([50, 30, 40])]
+
+    payment_logs, attempts, amount, future_cycles, exit_code = payer.pay(payment_items)
+
+    assert {pi.address: pi.source for pi in payment_logs} == {
+        "tz1address0": SOURCES[0],
+        "tz1address1": SOURCES[0],
+        "tz1address2": SOURCES[1],
+    }
+    assert (attempts, amount, future_cycles) == (3, 120, 1)
+    assert exit_code == ExitCode.INSUFFICIENT_FUNDS
+
+
+class DryRunBatchPayer(FakeBatchPayer):
+    balances = {SOURCES[0]: 100, SOURCES[1]: None}
+
+    def get_payment_address_balance(self):
+        return self.balances[self.source]
+
+    def pay(self, payment_items, dry_run=None, payment_cycle=None):
+        for payment_item in payment_items:
+            payment_item.paid = PaymentStatus.DONE
+        payable_cycles = None if self.balances[self.source] is None else 4
+        return payment_items, 0, 0, payable_cycles, None
+
+
+@patch("src.pay.multi_source_payer.BatchPayer", DryRunBatchPayer)
+def test_multi_source_dry_run_payable_cycles():
+    payer = MultiSourcePayer(
+        "node_addr", SOURCES, MagicMock(), True, True, {}, MagicMock(), True
+    )
+    payment_items = [reward_log(i, amount) for i, amount in enumerate([50, 30, 40])]
+
+    # no attempts are made, sources with an unknown balance are left out
+    _, attempts, _, future_cycles, _ = payer.pay(payment_items, dry_run=True)
+    assert (attempts, future_cycles) == (0, 4)
+
+    with patch.dict(DryRunBatchPayer.balances, {SOURCES[0]: None}):
+        _, _, _, future_cycles, _ = payer.pay(payment_items, dry_run=True)
+    assert future_cycles is None
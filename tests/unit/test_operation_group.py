@@ -0,0 +1,69 @@
+import json
+from src.pay.operation_group import (
+    OperationGroup,
+    Transaction,
+    RUN_OPERATION_SIGNATURE,
+)
+from src.pay.forge import forge_operation_group
+
+BRANCH = "BKkgLXYjM3DhdgzUuk2y6wQibYNmTDBZuj8Raa9PYEFvgrBeUhd"
+SOURCE = "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ"
+DESTINATION = "tz1Y1MhPRqRbLjvJRoguQXCe5bUKp43vvqgN"
+
+
+def transaction(amount, counter=None):
+    return Transaction(SOURCE, DESTINATION, amount, 298, 1400, 0, counter)
+
+
+def test_transaction_encoding():
+    content = transaction(1291324, 7117401)
+    content_dict = {
+        "kind": "transaction",
+        "source": SOURCE,
+        "destination": DESTINATION,
+        "fee": "298",
+        "counter": "7117401",
+        "gas_limit": "1400",
+        "storage_limit": "0",
+        "amount": "1291324",
+    }
+    assert content.to_dict() == content_dict
+    assert json.loads(content.encode()) == content_dict
+    assert Transaction.from_dict(content_dict).encode() == content.encode()
+
+    # the encoding is kept until the fee or the counter changes
+    encoded = content.encode()
+    content.set_counter(7117401)
+    assert content.encode() is encoded
+    content.set_fee(300)
+    assert json.loads(content.encode())["fee"] == "300"
+    content.set_counter(7117402)
+    assert json.loads(content.encode())["counter"] == "7117402"
+
+
+def test_operation_group_requests():
+    contents = [transaction(1000, 1), transaction(2000, 2)]
+    content_dicts = [content.to_dict() for content in contents]
+    group = OperationGroup(BRANCH, contents)
+
+    assert json.loads(group.run_operation_json("NetXdQprcVkpaWU")) == {
+        "operation": {
+            "branch": BRANCH,
+            "contents": content_dicts,
+            "signature": RUN_OPERATION_SIGNATURE,
+        },
+        "chain_id": "NetXdQprcVkpaWU",
+    }
+    assert json.loads(group.forge_json()) == {
+        "branch": BRANCH,
+        "contents": content_dicts,
+    }
+    assert json.loads(group.preapply_json("Proto", "edsig")) == [
+        {
+            "protocol": "Proto",
+            "branch": BRANCH,
+            "contents": content_dicts,
+            "signature": "edsig",
+        }
+    ]
+    assert group.forge() == forge_operation_group(BRANCH, content_dicts)
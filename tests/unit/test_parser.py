@@ -8,7 +8,9 @@ from src.util.parser import (
     add_argument_log_file,
     add_argument_syslog,
     add_argument_retry_injected,
+    add_argument_forge_check,
     add_argument_api_base_url,
+    add_argument_api_hedge_percentile,
     add_argument_cycle,
     add_argument_stats,
     add_argument_docker,
@@ -53,7 +55,12 @@ from src.util.parser import (
         (add_argument_stats, argparse.Namespace(do_not_publish_stats=False)),
         (add_argument_verbose, argparse.Namespace(verbose="on")),
         (add_argument_api_base_url, argparse.Namespace(api_base_url=None)),
+        (
+            add_argument_api_hedge_percentile,
+            argparse.Namespace(api_hedge_percentile=None),
+        ),
         (add_argument_retry_injected, argparse.Namespace(retry_injected=False)),
+        (add_argument_forge_check, argparse.Namespace(forge_check=False)),
         (add_argument_syslog, argparse.Namespace(syslog=False)),
         (
             add_argument_log_file,
@@ -86,7 +93,20 @@ def test_build_parser():
         do_not_publish_stats=False,
         verbose="on",
         api_base_url=None,
+        api_hedge_percentile=None,
         retry_injected=False,
+        forge_check=False,
         syslog=False,
         log_file=os.path.normpath("~/pymnt/logs/app.log"),
     )
+
+
+@pytest.mark.parametrize("value", ["0", "100", "-5", "150", "p95"])
+def test_api_hedge_percentile_out_of_range(value):
+    argparser = argparse.ArgumentParser(prog="TRD")
+    add_argument_api_hedge_percentile(argparser)
+    assert argparser.parse_args(["--api_hedge_percentile", "95"]) == argparse.Namespace(
+        api_hedge_percentile=95.0
+    )
+    with pytest.raises(SystemExit):
+        argparser.parse_args(["--api_hedge_percentile", value])
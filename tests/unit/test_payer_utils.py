@@ -1,9 +1,13 @@
+from src.pay.forge import nat_size
 from src.pay.utils import (
     calculate_required_fee,
+    calculate_minimal_fee,
     calculate_tx_fee,
     calculate_consumed_gas,
     calculate_consumed_storage,
+    sort_and_chunk_payment_items,
 )
+from unittest.mock import MagicMock
 import pytest
 
 
@@ -20,6 +24,30 @@ def test_calculate_required_fee(consumed_gas, size, expected):
     assert SUT == expected
 
 
+@pytest.mark.parametrize(
+    "consumed_gas, size_without_fee, other_fees, fee, expected",
+    [
+        (1000, 100, 0, 0, 302),
+        (1000, 100, 0, 500, 500),
+        (1000, 100, 250, 0, 51),
+        (0, 16282, 0, 0, 16385),
+        (0, 16281, 0, 0, 16383),
+    ],
+)
+def test_calculate_minimal_fee(
+    consumed_gas, size_without_fee, other_fees, fee, expected
+):
+    SUT = calculate_minimal_fee(consumed_gas, size_without_fee, other_fees, fee)
+    assert SUT == expected
+    # same as raising the fee until it covers its own size
+    minimal_fee = fee
+    while other_fees + minimal_fee < calculate_required_fee(
+        consumed_gas, size_without_fee + nat_size(minimal_fee)
+    ):
+        minimal_fee += 1
+    assert SUT == minimal_fee
+
+
 @pytest.mark.parametrize(
     "fee, expected",
     [
@@ -81,3 +109,35 @@ def test_calculate_consumed_gas(consumed_gas, size, expected):
 def test_calculate_consumed_storage(metadata, expected):
     SUT = calculate_consumed_storage(metadata)
     assert SUT == expected
+
+
+@pytest.mark.parametrize(
+    "num_tz, num_kt, tz_size, expected",
+    [
+        # bounded by the gas of the batch
+        (500, 0, 60, [382, 118]),
+        # bounded by the size of the batch
+        (50, 0, 1000, [24, 24, 2]),
+        # contracts of unknown gas, 25 in a batch at most
+        (0, 30, 60, [25, 5]),
+        # contracts fill up the last batch of implicit accounts
+        (10, 30, 60, [34, 6]),
+    ],
+)
+def test_sort_and_chunk_payment_items(num_tz, num_kt, tz_size, expected):
+    payment_items = [
+        MagicMock(paymentaddress="KT1{}".format(i)) for i in range(num_kt)
+    ] + [MagicMock(paymentaddress="tz1{}".format(i)) for i in range(num_tz)]
+
+    def estimate_limits(payment_item):
+        if payment_item.paymentaddress.startswith("KT"):
+            return None, 60
+        return 3400, tz_size
+
+    chunks = sort_and_chunk_payment_items(payment_items, estimate_limits)
+
+    assert [len(chunk) for chunk in chunks] == expected
+    addresses = [item.paymentaddress for chunk in chunks for item in chunk]
+    assert addresses == [item.paymentaddress for item in payment_items[num_kt:]] + [
+        item.paymentaddress for item in payment_items[:num_kt]
+    ]
@@ -0,0 +1,74 @@
+from src.Constants import PaymentStatus
+from src.model.reward_log import RewardLog, TYPE_DELEGATOR
+from src.pay.payment_plan import PaymentPlan, PlannedBatch
+from src.pay.utils import FeeBreakdown
+
+SOURCE = "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ"
+
+
+def reward_logs(amounts):
+    payment_items = []
+    for amount in amounts:
+        payment_item = RewardLog("tz1address", TYPE_DELEGATOR, 0, 0)
+        payment_item.adjusted_amount = amount
+        payment_items.append(payment_item)
+    return payment_items
+
+
+def test_plan_is_restored(tmp_path):
+    path = str(tmp_path / "plans" / "10.json")
+    payment_items = reward_logs([10, 20])
+    payment_items[0].paid = PaymentStatus.PAID
+    payment_items[0].hash = "oo1"
+    payment_items[0].delegator_transaction_fee = 300
+    payment_items[0].fee_breakdown = FeeBreakdown(300, 100, 50, 150)
+    batch = PlannedBatch([1, 0], [{"kind": "transaction"}], 3400, 300, 5)
+    PaymentPlan(SOURCE, "Proto", payment_items, [batch]).save(path)
+
+    # the items are matched by address and amount
+    restored_items = reward_logs([20, 10])
+    plan = PaymentPlan.load(path, SOURCE, restored_items)
+
+    assert plan.protocol == "Proto"
+    assert plan.get_batch_items(plan.batches[0]) == restored_items
+    assert plan.batches[0].submission_counter == 5
+    assert plan.batches[0].status.is_undefined()
+    assert restored_items[1].paid.is_paid()
+    assert restored_items[1].hash == "oo1"
+    assert restored_items[1].delegator_transaction_fee == 300
+    assert restored_items[1].fee_breakdown.base_fee == 150
+    assert restored_items[0].paid.is_undefined()
+
+
+def test_plan_of_other_items_is_ignored(tmp_path):
+    path = str(tmp_path / "10.json")
+    PaymentPlan(SOURCE, "Proto", reward_logs([10, 20]), []).save(path)
+
+    assert PaymentPlan.load(path, SOURCE, reward_logs([10])) is None
+    assert PaymentPlan.load(path, SOURCE, reward_logs([10, 20, 30])) is None
+    assert PaymentPlan.load(path, SOURCE, reward_logs([10, 21])) is None
+    assert PaymentPlan.load(path, "tz1other", reward_logs([10, 20])) is None
+    assert PaymentPlan.load(str(tmp_path / "11.json"), SOURCE, []) is None
+
+    with open(path, "w") as f:
+        f.write("{")
+    assert PaymentPlan.load(path, SOURCE, reward_logs([10, 20])) is None
+
+
+def test_failed_batches_are_planned_again(tmp_path):
+    path = str(tmp_path / "10.json")
+    payment_items = reward_logs([10, 20])
+    for payment_item in payment_items:
+        payment_item.paid = PaymentStatus.FAIL
+        payment_item.desc = "Error in preapply operation"
+    batch = PlannedBatch([0, 1], [], 3400, 300, 5, PaymentStatus.FAIL, "oo1")
+    PaymentPlan(SOURCE, "Proto", payment_items, [batch]).save(path)
+
+    restored_items = reward_logs([10, 20])
+    plan = PaymentPlan.load(path, SOURCE, restored_items)
+
+    assert plan.batches[0].status.is_undefined()
+    assert plan.batches[0].submission_counter is None
+    assert plan.batches[0].operation_hash is None
+    assert [pi.paid.name for pi in restored_items] == ["UNDEFINED", "UNDEFINED"]
+    assert [pi.desc for pi in restored_items] == ["", ""]
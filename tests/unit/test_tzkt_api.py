@@ -0,0 +1,183 @@
+import pytest
+import threading
+from unittest.mock import patch, MagicMock
+from src.Constants import MAX_SEQUENT_CALLS
+from src.tzkt.tzkt_api import TzKTApi, TzKTApiError
+
+BAKER_ADDRESS = "tz1NRGxXV9h6SdNaZLcgmjuLx3hyy2f8YoGN"
+PAGE_SIZE = 10
+
+
+class SplitPages:
+    """Serves a reward split of num_delegators delegators page by page."""
+
+    def __init__(self, num_delegators, empty_responses=0):
+        self.num_delegators = num_delegators
+        self.empty_responses = empty_responses
+        self.requested_offsets = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path, offset, limit, decode=None):
+        with self.lock:
+            self.requested_offsets.append(offset)
+            if self.empty_responses > 0:
+                self.empty_responses -= 1
+                return None
+        end = min(offset + limit, self.num_delegators)
+        return {
+            "cycle": 500,
+            "delegatorsCount": self.num_delegators,
+            "delegators": [
+                {"address": f"tz1{index}", "balance": index}
+                for index in range(offset, end)
+            ],
+        }
+
+
+@pytest.fixture
+def tzkt():
+    api = TzKTApi("http://localhost", timeout=30)
+    api.max_page_size = PAGE_SIZE
+    return api
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_get_reward_split_merges_pages_in_order(tzkt, max_workers):
+    pages = SplitPages(num_delegators=95)
+    with patch.object(tzkt, "_request", side_effect=pages):
+        split = tzkt.get_reward_split(BAKER_ADDRESS, 500, max_workers=max_workers)
+
+    assert [d["balance"] for d in split["delegators"]] == list(range(95))
+    assert sorted(pages.requested_offsets) == list(range(0, 100, PAGE_SIZE))
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+def test_get_reward_split_full_last_page(tzkt):
+    pages = SplitPages(num_delegators=40)
+    with patch.object(tzkt, "_request", side_effect=pages):
+        split = tzkt.get_reward_split(BAKER_ADDRESS, 500, max_workers=4)
+
+    assert len(split["delegators"]) == 40
+    assert sorted(pages.requested_offsets) == [0, 10, 20, 30, 40]
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+def test_get_reward_split_retries_empty_pages(tzkt):
+    pages = SplitPages(num_delegators=25, empty_responses=2)
+    with patch.object(tzkt, "_request", side_effect=pages):
+        split = tzkt.get_reward_split(BAKER_ADDRESS, 500, max_workers=4)
+
+    assert len(split["delegators"]) == 25
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+def test_get_reward_split_keeps_max_sequent_calls_guard(tzkt):
+    pages = SplitPages(num_delegators=25, empty_responses=MAX_SEQUENT_CALLS)
+    with patch.object(tzkt, "_request", side_effect=pages):
+        with pytest.raises(
+            TzKTApiError,
+            match=r"Max sequent calls number exceeded \({}\)".format(MAX_SEQUENT_CALLS),
+        ):
+            tzkt.get_reward_split(BAKER_ADDRESS, 500, max_workers=4)
+
+    assert len(pages.requested_offsets) == MAX_SEQUENT_CALLS
+
+
+class BulkAccounts:
+    """Serves account balances for the accounts?address.in= query."""
+
+    def __init__(self, balances, delegates=None):
+        self.balances = balances
+        self.delegates = delegates or {}
+        self.requested_chunks = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path, **params):
+        assert path == "accounts"
+        assert params["select"] == "address,balance"
+        chunk = params["address.in"].split(",")
+        assert params["limit"] == len(chunk)
+        with self.lock:
+            self.requested_chunks.append(chunk)
+        return [
+            {"address": address, "balance": self.balances[address]}
+            for address in chunk
+            if address in self.balances
+            and params.get("delegate") in (None, self.delegates.get(address))
+        ]
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_get_balances_by_addresses_in_chunks(tzkt, max_workers):
+    tzkt.max_addresses_per_request = 10
+    balances = {f"tz1{index}": index for index in range(95)}
+    accounts = BulkAccounts(balances)
+    get_account = MagicMock()
+    with patch.object(tzkt, "_request", side_effect=accounts), patch.object(
+        tzkt, "get_account_by_address", get_account
+    ):
+        result = tzkt.get_balances_by_addresses(
+            list(balances) + ["tz10"], max_workers=max_workers
+        )
+
+    assert result == balances
+    assert len(accounts.requested_chunks) == 10
+    assert sorted(sum(accounts.requested_chunks, [])) == sorted(balances)
+    get_account.assert_not_called()
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+def test_get_balances_by_addresses_looks_up_missing_addresses(tzkt):
+    accounts = BulkAccounts({"tz1a": 1, "tz1b": 2})
+    get_account = MagicMock(return_value={"address": "tz1c", "balance": 3})
+    with patch.object(tzkt, "_request", side_effect=accounts), patch.object(
+        tzkt, "get_account_by_address", get_account
+    ):
+        result = tzkt.get_balances_by_addresses(["tz1a", "tz1b", "tz1c"])
+
+    assert result == {"tz1a": 1, "tz1b": 2, "tz1c": 3}
+    get_account.assert_called_once_with("tz1c")
+
+    # an address without account has no balance
+    get_account.return_value = None
+    with patch.object(tzkt, "_request", side_effect=accounts), patch.object(
+        tzkt, "get_account_by_address", get_account
+    ):
+        assert tzkt.get_balances_by_addresses(["tz1a", "tz1d"]) == {
+            "tz1a": 1,
+            "tz1d": 0,
+        }
+
+
+@patch("src.tzkt.tzkt_api.sleep", MagicMock())
+def test_get_delegated_balances_leaves_out_other_delegates(tzkt):
+    accounts = BulkAccounts(
+        {"tz1a": 1, "tz1b": 2, "tz1c": 3},
+        delegates={"tz1a": BAKER_ADDRESS, "tz1b": "tz1other"},
+    )
+    get_account = MagicMock()
+    with patch.object(tzkt, "_request", side_effect=accounts), patch.object(
+        tzkt, "get_account_by_address", get_account
+    ):
+        result = tzkt.get_delegated_balances(BAKER_ADDRESS, ["tz1a", "tz1b", "tz1c"])
+
+    # like currentDelegatedBalance, only the balance still delegated counts
+    assert result == {"tz1a": 1}
+    get_account.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "statuses, expected",
+    [
+        (["applied", "applied"], "applied"),
+        (["applied", "backtracked", "failed"], "backtracked"),
+        ([], None),
+        (None, None),
+    ],
+)
+def test_get_operation_status(tzkt, statuses, expected):
+    with patch.object(tzkt, "_request", return_value=statuses) as request:
+        assert tzkt.get_operation_status("oo1") == expected
+    request.assert_called_once_with("operations/oo1", select="status")
@@ -0,0 +1,139 @@
+import os
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from src.tzkt.tzkt_api import TzKTApi
+from src.tzkt.tzkt_cache import RewardSplitCache
+
+NETWORK = "MAINNET"
+BAKER_ADDRESS = "tz1NRGxXV9h6SdNaZLcgmjuLx3hyy2f8YoGN"
+PROVIDER = "tzkt"
+
+
+def make_split(cycle, num_delegators=3):
+    return {
+        "cycle": cycle,
+        "futureBlocks": 0,
+        "futureEndorsements": 0,
+        "delegatorsCount": num_delegators,
+        "delegators": [
+            {"address": f"tz1{index}", "delegatedBalance": index * 1000}
+            for index in range(num_delegators)
+        ],
+    }
+
+
+def object_files(cache):
+    return [
+        os.path.join(cache.objects_dir, name) for name in os.listdir(cache.objects_dir)
+    ]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RewardSplitCache(str(tmp_path))
+
+
+def test_put_and_get(cache):
+    split = make_split(700)
+    cache.put(NETWORK, BAKER_ADDRESS, 700, PROVIDER, split)
+
+    assert cache.get(NETWORK, BAKER_ADDRESS, 700, PROVIDER) == split
+    assert cache.get(NETWORK, BAKER_ADDRESS, 701, PROVIDER) is None
+    assert cache.get("GHOSTNET", BAKER_ADDRESS, 700, PROVIDER) is None
+
+
+def test_corrupted_entry_is_dropped(cache):
+    cache.put(NETWORK, BAKER_ADDRESS, 700, PROVIDER, make_split(700))
+    (path,) = object_files(cache)
+    with open(path, "wb") as f:
+        f.write(b"garbage")
+
+    assert cache.get(NETWORK, BAKER_ADDRESS, 700, PROVIDER) is None
+    assert object_files(cache) == []
+
+
+def test_evict_by_age(tmp_path):
+    cache = RewardSplitCache(str(tmp_path), max_age_days=1)
+    cache.put(NETWORK, BAKER_ADDRESS, 700, PROVIDER, make_split(700))
+    (path,) = object_files(cache)
+    two_days_ago = time.time() - 2 * 24 * 60 * 60
+    os.utime(path, (two_days_ago, two_days_ago))
+
+    cache.evict()
+
+    assert cache.get(NETWORK, BAKER_ADDRESS, 700, PROVIDER) is None
+    assert os.listdir(cache.refs_dir) == []
+
+
+def test_evict_by_size_keeps_recent_entries(tmp_path):
+    cache = RewardSplitCache(str(tmp_path), max_size_bytes=10**9)
+    for age, cycle in enumerate([702, 701, 700]):
+        cache.put(NETWORK, BAKER_ADDRESS, cycle, PROVIDER, make_split(cycle, 50))
+        path = cache._object_path(
+            open(
+                os.path.join(
+                    cache.refs_dir,
+                    cache.key_digest(NETWORK, BAKER_ADDRESS, cycle, PROVIDER),
+                )
+            ).read()
+        )
+        timestamp = time.time() - age * 60
+        os.utime(path, (timestamp, timestamp))
+
+    entry_size = max(os.path.getsize(path) for path in object_files(cache))
+    cache.max_size_bytes = 2 * entry_size
+    cache.evict()
+
+    assert cache.get(NETWORK, BAKER_ADDRESS, 700, PROVIDER) is None
+    assert cache.get(NETWORK, BAKER_ADDRESS, 701, PROVIDER) is not None
+    assert cache.get(NETWORK, BAKER_ADDRESS, 702, PROVIDER) is not None
+
+
+def test_tzkt_api_serves_finalized_split_from_cache(cache):
+    tzkt = TzKTApi("http://localhost", timeout=30, network=NETWORK, split_cache=cache)
+    split = make_split(700)
+    for index, delegator in enumerate(split["delegators"]):
+        delegator["currentDelegatedBalance"] = 10
+        delegator["balance"] = index * 1000
+    fetch = MagicMock(return_value=split)
+    get_balances = MagicMock(return_value={"tz11": 15})
+    with patch.object(tzkt, "_fetch_reward_split", fetch), patch.object(
+        tzkt, "get_current_cycle", MagicMock(return_value=702)
+    ), patch.object(tzkt, "get_delegated_balances", get_balances):
+        first = tzkt.get_reward_split(BAKER_ADDRESS, 700)
+        second = tzkt.get_reward_split(BAKER_ADDRESS, 700)
+
+    assert fetch.call_count == 1
+    assert list(first["delegators"].rows()) == [
+        ("tz10", 0, 10, 0),
+        ("tz11", 1000, 10, 1000),
+        ("tz12", 2000, 10, 2000),
+    ]
+    # the current balances are not cached, on a cache hit they are requested
+    # for the accounts still delegating to the baker like in the split
+    assert (
+        "currentDelegatedBalance"
+        not in cache.get(NETWORK, BAKER_ADDRESS, 700, PROVIDER)["delegators"]
+    )
+    get_balances.assert_called_once_with(BAKER_ADDRESS, ["tz11", "tz12"])
+    assert list(second["delegators"].rows()) == [
+        ("tz10", 0, 0, 0),
+        ("tz11", 1000, 15, 1000),
+        ("tz12", 2000, 0, 2000),
+    ]
+
+
+def test_tzkt_api_does_not_cache_running_cycle(cache):
+    tzkt = TzKTApi("http://localhost", timeout=30, network=NETWORK, split_cache=cache)
+    split = make_split(702)
+    split["futureBlocks"] = 3
+    fetch = MagicMock(return_value=split)
+    with patch.object(tzkt, "_fetch_reward_split", fetch), patch.object(
+        tzkt, "get_current_cycle", MagicMock(return_value=702)
+    ):
+        tzkt.get_reward_split(BAKER_ADDRESS, 702)
+        tzkt.get_reward_split(BAKER_ADDRESS, 702)
+
+    assert fetch.call_count == 2
+    assert object_files(cache) == []
@@ -0,0 +1,131 @@
+import pytest
+from http import HTTPStatus
+from unittest.mock import MagicMock
+from src.tzkt.tzkt_api import TzKTApi, TzKTApiError
+from src.tzkt.tzkt_endpoints import (
+    TzKTEndpointPool,
+    parse_endpoint_urls,
+    TZKT_HEDGE_MIN_SAMPLES,
+)
+from src.tzkt.tzkt_head_state import TzKTHeadState
+from src.tzkt.tzkt_rate_limiter import TzKTRateLimiter
+from tests.utils import LocalHttpServer
+
+
+def ok_route(name):
+    return lambda path: (HTTPStatus.OK, {"server": name})
+
+
+def error_route(path):
+    return HTTPStatus.INTERNAL_SERVER_ERROR, {}
+
+
+def make_api(urls, **kwargs):
+    api = TzKTApi(",".join(urls), timeout=5, head_state=TzKTHeadState(), **kwargs)
+    for endpoint in api.endpoints.endpoints:
+        endpoint.rate_limiter = TzKTRateLimiter(rate=10000, max_rate=10000)
+    return api
+
+
+def response(status_code, level, body):
+    return MagicMock(
+        status_code=status_code,
+        headers={"Tzkt-Level": str(level)},
+        json=MagicMock(return_value=body),
+    )
+
+
+def test_parse_endpoint_urls():
+    assert parse_endpoint_urls("http://a/v1/, https://b/v1") == [
+        "http://a/v1",
+        "https://b/v1",
+    ]
+    assert parse_endpoint_urls(["http://a/v1"]) == ["http://a/v1"]
+    assert parse_endpoint_urls("") == [""]
+
+
+def test_failover_on_server_error():
+    with LocalHttpServer(error_route) as primary, LocalHttpServer(
+        ok_route("public")
+    ) as public:
+        api = make_api([primary.url, public.url])
+
+        assert api._request("head") == {"server": "public"}
+        assert api._request("head") == {"server": "public"}
+
+        # the failing endpoint is now tried after the healthy one
+        assert primary.num_requests == 2
+        assert api._request("head") == {"server": "public"}
+        assert primary.num_requests == 2
+        api.close()
+
+    stats = api.get_endpoint_stats()
+    assert stats[0]["health"] < 0.5 < stats[1]["health"]
+
+
+def test_failover_on_connection_error():
+    with LocalHttpServer(ok_route("public")) as public:
+        api = make_api(["http://127.0.0.1:1", public.url])
+        assert api._request("head") == {"server": "public"}
+        api.close()
+
+
+def test_all_endpoints_failing():
+    with LocalHttpServer(error_route) as first, LocalHttpServer(error_route) as second:
+        api = make_api([first.url, second.url])
+        assert api._request("head") is None
+        api.close()
+
+    api = make_api(["http://127.0.0.1:1", "http://127.0.0.1:2"])
+    with pytest.raises(TzKTApiError, match="DNS lookup failed"):
+        api._request("head")
+
+
+def test_lagging_endpoint_is_skipped():
+    api = make_api(["http://self-hosted/v1", "http://public/v1"])
+    responses = {
+        "http://self-hosted/v1/head": [
+            response(200, 1000, {"level": 1000}),
+            response(200, 1000, {"level": 1000}),
+        ],
+        "http://public/v1/head": [
+            response(200, 1010, {"level": 1010}),
+            response(200, 1011, {"level": 1011}),
+        ],
+    }
+    api.session = MagicMock()
+    api.session.get.side_effect = lambda url, **kwargs: responses[url].pop(0)
+
+    # the self-hosted indexer is preferred until it is seen behind
+    assert api._request("head") == {"level": 1000}
+    api.endpoints.record_level(api.endpoints.endpoints[1], 1010)
+    assert api._request("head") == {"level": 1010}
+    assert api._request("head") == {"level": 1011}
+    assert api.endpoints.is_lagging(api.endpoints.endpoints[0])
+
+
+def test_hedged_request():
+    with LocalHttpServer(ok_route("primary")) as primary, LocalHttpServer(
+        ok_route("public")
+    ) as public:
+        api = make_api([primary.url, public.url], hedge_percentile=90)
+        for _ in range(TZKT_HEDGE_MIN_SAMPLES):
+            assert api._request("head") == {"server": "primary"}
+        assert public.num_requests == 0
+
+        primary.delay = 1.0
+        assert api._request("head") == {"server": "public"}
+        assert api._num_hedged_requests == 1
+        api.close()
+
+
+def test_endpoint_pool_order():
+    pool = TzKTEndpointPool(["http://a", "http://b", "http://c"])
+    a, b, c = pool.endpoints
+    assert pool.ordered() == [a, b, c]
+
+    for _ in range(3):
+        a.record_failure()
+    pool.record_level(b, 100)
+    pool.record_level(c, 110)
+    assert pool.ordered() == [c, b, a]
@@ -0,0 +1,82 @@
+import threading
+from time import sleep
+from unittest.mock import MagicMock
+from src.Constants import DEFAULT_NETWORK_CONFIG_MAP
+from src.tzkt.tzkt_block_api import TzKTBlockApiImpl
+from src.tzkt.tzkt_reward_api import TzKTRewardApiImpl
+from src.tzkt.tzkt_head_state import TzKTHeadState
+
+HEAD = {"level": 100, "cycle": 7, "synced": True, "timestamp": "2024-06-30T14:33:31Z"}
+
+
+def test_head_is_served_from_cache_until_ttl():
+    head_state = TzKTHeadState(ttl=0.2)
+    fetch = MagicMock(return_value=HEAD)
+
+    assert head_state.get(fetch) == HEAD
+    assert head_state.get(fetch) == HEAD
+    assert fetch.call_count == 1
+
+    sleep(0.25)
+    head_state.get(fetch)
+    assert fetch.call_count == 2
+
+
+def test_concurrent_refreshes_are_deduplicated():
+    head_state = TzKTHeadState()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        sleep(0.1)
+        return HEAD
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(head_state.get(slow_fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [HEAD] * 5
+
+
+def test_pushed_heads():
+    head_state = TzKTHeadState()
+    fetch = MagicMock()
+
+    head_state.push(HEAD)
+    assert head_state.get(fetch) == HEAD
+
+    head_state.push(dict(HEAD, level=99))
+    assert head_state.get(fetch)["level"] == 100
+
+    head_state.push(dict(HEAD, level=101))
+    assert head_state.get(fetch)["level"] == 101
+    fetch.assert_not_called()
+
+
+def test_missing_head_is_not_cached():
+    head_state = TzKTHeadState()
+    fetch = MagicMock(side_effect=[None, HEAD])
+
+    assert head_state.get(fetch) is None
+    assert head_state.get(fetch) == HEAD
+
+
+def test_block_and_reward_api_share_the_head():
+    nw = DEFAULT_NETWORK_CONFIG_MAP["MAINNET"]
+    base_url = "http://localhost:5000/v1"
+    block_api = TzKTBlockApiImpl(nw, base_url=base_url)
+    reward_api = TzKTRewardApiImpl(nw, "tz1Baker", base_url=base_url)
+    block_api.api.head_state.invalidate()
+    block_api.api._request = MagicMock(return_value=HEAD)
+    reward_api.api._request = MagicMock()
+
+    assert block_api.get_current_cycle_and_level() == (7, 100)
+    assert reward_api.api.get_current_cycle() == 7
+    reward_api.api._request.assert_not_called()
@@ -0,0 +1,113 @@
+import threading
+import pytest
+from email.utils import formatdate
+from time import monotonic, sleep, time
+from unittest.mock import MagicMock
+from src.tzkt.tzkt_api import TzKTApi, TzKTApiError, TZKT_MAX_RATE_LIMITED_RETRIES
+from src.tzkt.tzkt_rate_limiter import (
+    TzKTRateLimiter,
+    parse_retry_after,
+)
+
+
+def response(status_code, headers=None, body=None):
+    return MagicMock(
+        status_code=status_code,
+        headers=headers or {},
+        text="",
+        json=MagicMock(return_value=body),
+    )
+
+
+def test_acquire_respects_rate():
+    limiter = TzKTRateLimiter(rate=20, max_rate=20, burst=1)
+    start = monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # the first token is available right away
+    assert monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_rate_adapts_to_responses():
+    limiter = TzKTRateLimiter(rate=10, min_rate=1, max_rate=11)
+    limiter.on_response(200, {})
+    assert limiter.get_rate() == pytest.approx(10.1)
+
+    limiter.on_response(500, {})
+    assert limiter.get_rate() == pytest.approx(10.1)
+
+    limiter.on_response(429, {"Retry-After": "2"})
+    stats = limiter.get_stats()
+    assert stats["rate"] == pytest.approx(5.05)
+    assert 1.5 < stats["paused_for"] <= 2
+
+    for _ in range(100):
+        limiter.on_response(200, {})
+    assert limiter.get_rate() == 11
+
+
+def test_rate_limit_headers():
+    limiter = TzKTRateLimiter(rate=10)
+    limiter.on_response(200, {"X-RateLimit-Remaining": "30", "X-RateLimit-Reset": "10"})
+    assert limiter.get_rate() == pytest.approx(3)
+
+    limiter.on_response(
+        200, {"RateLimit-Remaining": "0", "RateLimit-Reset": str(int(time()) + 5)}
+    )
+    assert limiter.get_stats()["paused_for"] > 3
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after("garbage") is None
+    assert 8 < parse_retry_after(formatdate(time() + 10, usegmt=True)) <= 10
+
+
+def test_queue_depth_while_paused():
+    limiter = TzKTRateLimiter(rate=50, max_rate=50)
+    limiter.on_response(429, {"Retry-After": "0.3"})
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    sleep(0.1)
+
+    assert limiter.get_queue_depth() == 3
+
+    for thread in threads:
+        thread.join()
+    assert limiter.get_queue_depth() == 0
+
+
+def test_limiter_is_shared_per_host():
+    first = TzKTApi("https://api.example.com/v1", timeout=30)
+    second = TzKTApi("https://api.example.com/v1", timeout=30)
+    other = TzKTApi("http://localhost:5000/v1", timeout=30)
+
+    assert first.rate_limiter is second.rate_limiter
+    assert other.rate_limiter is not first.rate_limiter
+
+
+def test_request_retries_after_429():
+    tzkt = TzKTApi("http://localhost", timeout=30, rate_limiter=TzKTRateLimiter())
+    tzkt.session = MagicMock()
+    tzkt.session.get.side_effect = [
+        response(429, {"Retry-After": "0"}),
+        response(200, body={"level": 1}),
+    ]
+
+    assert tzkt._request("head") == {"level": 1}
+    assert tzkt.session.get.call_count == 2
+    assert tzkt.rate_limiter.get_rate() < 10
+
+
+def test_request_gives_up_after_repeated_429():
+    tzkt = TzKTApi(
+        "http://localhost", timeout=30, rate_limiter=TzKTRateLimiter(min_rate=100)
+    )
+    tzkt.session = MagicMock()
+    tzkt.session.get.return_value = response(429, {"Retry-After": "0"})
+
+    with pytest.raises(TzKTApiError, match="TzKT returned 429 error"):
+        tzkt._request("head")
+    assert tzkt.session.get.call_count == TZKT_MAX_RATE_LIMITED_RETRIES + 1
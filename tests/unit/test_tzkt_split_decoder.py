@@ -0,0 +1,82 @@
+import json
+import pytest
+from src.tzkt.tzkt_split_decoder import (
+    DelegatorColumns,
+    SplitPageDecoder,
+    decode_split_page,
+)
+
+SPLIT = {
+    "cycle": 500,
+    "alias": 'a "quoted" baker, with [brackets]',
+    "extra": {"delegators": [1, 2], "nested": [{"delegators": []}]},
+    "delegators": [
+        {
+            "address": "tz1first",
+            "delegatedBalance": 10,
+            "currentDelegatedBalance": 11,
+            "balance": 12,
+            "emptied": False,
+            "stakedBalance": 13,
+        },
+        {
+            "address": "tz1secondé",
+            "delegatedBalance": 20,
+            "currentDelegatedBalance": 21,
+            "balance": 0,
+            "emptied": True,
+        },
+    ],
+    "delegatorsCount": 2,
+}
+
+
+def chunked(payload, size):
+    return [payload[i : i + size] for i in range(0, len(payload), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 100000])
+def test_decode_split_page_in_chunks(chunk_size):
+    payload = json.dumps(SPLIT, indent=1).encode()
+    page = decode_split_page(chunked(payload, chunk_size))
+
+    assert page["cycle"] == 500
+    assert page["alias"] == SPLIT["alias"]
+    assert page["extra"] == SPLIT["extra"]
+    assert page["delegatorsCount"] == 2
+    assert isinstance(page["delegators"], DelegatorColumns)
+    assert list(page["delegators"].rows()) == [
+        ("tz1first", 10, 11, 12),
+        ("tz1secondé", 20, 21, 0),
+    ]
+
+
+def test_decode_page_without_delegators():
+    assert decode_split_page([b'{"cycle": 500, ', b'"delegators": []}']) == {
+        "cycle": 500,
+        "delegators": DelegatorColumns(),
+    }
+    assert decode_split_page([b'{"cycle": 500}']) == {"cycle": 500}
+
+
+def test_truncated_page_raises():
+    payload = json.dumps(SPLIT).encode()
+    decoder = SplitPageDecoder()
+    decoder.feed(payload[: payload.index(b"tz1second")])
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+def test_columns_json_round_trip():
+    columns = DelegatorColumns.from_json(SPLIT["delegators"])
+
+    assert len(columns) == 2
+    assert DelegatorColumns.from_json(json.loads(json.dumps(columns.to_json()))) == (
+        columns
+    )
+    assert list(columns)[1] == {
+        "address": "tz1secondé",
+        "delegatedBalance": 20,
+        "currentDelegatedBalance": 21,
+        "balance": 0,
+    }
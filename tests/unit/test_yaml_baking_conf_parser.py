@@ -7,7 +7,7 @@ from src.api.provider_factory import ProviderFactory
 from tests.utils import make_config
 from src.Constants import DryRun
 from src.util.address_validator import AddressValidator
-from src.model.baking_conf import BAKING_ADDRESS
+from src.model.baking_conf import BAKING_ADDRESS, PAYMENT_ADDRESS, PAYMENT_ADDRESSES
 
 
 class TestYamlBakingConfigParser(unittest.TestCase):
@@ -56,3 +56,31 @@ class TestYamlBakingConfigParser(unittest.TestCase):
             str(exception.exception),
             "Baking address must be a valid tz address of length 36",
         )
+
+    def test_payment_addresses(self):
+        conf_obj = {PAYMENT_ADDRESS: "tz1gtHbmBF3TSebsgJfJPvUB2e9x8EDeNm6V"}
+        self.baking_conf_parser.validate_payment_addresses(conf_obj)
+        self.assertEqual(
+            conf_obj[PAYMENT_ADDRESSES], ["tz1gtHbmBF3TSebsgJfJPvUB2e9x8EDeNm6V"]
+        )
+
+        conf_obj[PAYMENT_ADDRESSES] = [
+            "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ",
+            "tz1gtHbmBF3TSebsgJfJPvUB2e9x8EDeNm6V",
+        ]
+        self.baking_conf_parser.validate_payment_addresses(conf_obj)
+        self.assertEqual(
+            conf_obj[PAYMENT_ADDRESSES],
+            [
+                "tz1gtHbmBF3TSebsgJfJPvUB2e9x8EDeNm6V",
+                "tz1N4UfQCahHkRShBanv9QP9TnmXNgCaqCyZ",
+            ],
+        )
+
+    def test_invalid_payment_addresses(self):
+        conf_obj = {
+            PAYMENT_ADDRESS: "tz1gtHbmBF3TSebsgJfJPvUB2e9x8EDeNm6V",
+            PAYMENT_ADDRESSES: ["KT1Ap13mFi4ZWd3rNiEKk3hG5Yp8wx9kMhnN"],
+        }
+        with self.assertRaises(ConfigurationException):
+            self.baking_conf_parser.validate_payment_addresses(conf_obj)
@@ -1,5 +1,8 @@
 import json
 import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from os.path import dirname, join, normpath
 from urllib.parse import urlparse
 from unittest.mock import MagicMock
@@ -357,3 +360,73 @@ class Constants:
     MAINNET_ADDRESS_BAKEXTZ4ME_BAKER = "tz1NRGxXV9h6SdNaZLcgmjuLx3hyy2f8YoGN"
     GHOSTNET_ADDRESS_STAKENOW_BAKER = "tz1iZ9LkpAhN8X1L6RpBtfy3wxpEWzFrXz8j"
     MAINNET_ADDRESS_BAKEXTZ4ME_PAYOUT = "tz1PayTZoKjNyofxFQxkzhcv9RCdyW7Q64Wc"
+
+
+class LocalHttpServer:
+    """A local HTTP/1.1 stand-in for remote APIs, used by benchmarks and tests
+    which need real sockets instead of mocks.
+
+    Args:
+        routes (callable): Called with the request path (including the query),
+            returns a tuple of (status code, JSON serializable body).
+        delay (float): Seconds to wait before answering every request.
+    """
+
+    def __init__(self, routes, delay=0.0):
+        self.routes = routes
+        self.delay = delay
+        self.num_connections = 0
+        self.num_requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return "http://{}:{}".format(host, port)
+
+    def __enter__(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # answer without waiting for delayed ACKs like real API servers do
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with owner._lock:
+                    owner.num_connections += 1
+
+            def do_GET(self):
+                with owner._lock:
+                    owner.num_requests += 1
+                if owner.delay:
+                    threading.Event().wait(owner.delay)
+                status, body = owner.routes(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.do_GET()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()